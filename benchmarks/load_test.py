@@ -0,0 +1,515 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+import aiohttp
+import paramiko
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - the collector then compresses with gzip
+    zstandard = None
+
+ROOT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+HTTP_PATHS = ("/", "/wp-login.php", "/.env", "/admin/config.php", "/cgi-bin/luci")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q):
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": at(0.5),
+        "p90_ms": at(0.9),
+        "p99_ms": at(0.99),
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubAPI:
+    # Stands in for the BreachHarbor ingest API: accepts single incidents and
+    # NDJSON batches and measures how long each incident took to get here
+    def __init__(self):
+        self.requests = 0
+        self.incidents = 0
+        self.incident_types: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.last_received = None
+
+    def decode(self, request, body: bytes) -> bytes:
+        # aiohttp already inflates gzip and deflate request bodies
+        encoding = request.headers.get("content-encoding")
+        if encoding == "zstd" and zstandard is not None and body.startswith(ZSTD_MAGIC):
+            return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        return body
+
+    async def receive(self, request):
+        body = self.decode(request, await request.read())
+        now = datetime.now()
+        self.requests += 1
+        for line in body.splitlines():
+            if not line:
+                continue
+            incident = json.loads(line)
+            happened_at = datetime.fromisoformat(incident["happened_at"])
+            self.latencies.append((now - happened_at).total_seconds())
+            incident_type = incident["incident_type"]
+            self.incident_types[incident_type] = self.incident_types.get(incident_type, 0) + 1
+            self.incidents += 1
+        self.last_received = time.perf_counter()
+        return web.Response(status=201)
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/{tail:.*}", self.receive)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+class ResourceSampler:
+    # Samples RSS and thread count of the collector process tree from /proc
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak_rss_bytes = 0
+        self.peak_threads = 0
+        self.processes: Dict[int, Dict[str, int]] = {}
+
+    def process_tree(self) -> List[int]:
+        parents: Dict[int, List[int]] = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", "r", encoding="utf-8") as file:
+                    ppid = int(file.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            parents.setdefault(ppid, []).append(int(name))
+
+        tree, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            tree.append(pid)
+            pending.extend(parents.get(pid, []))
+        return tree
+
+    def read_status(self, pid: int) -> Optional[Dict[str, int]]:
+        status = {}
+        try:
+            with open(f"/proc/{pid}/status", "r", encoding="utf-8") as file:
+                for line in file:
+                    key, _, value = line.partition(":")
+                    if key == "VmRSS":
+                        status["rss_bytes"] = int(value.split()[0]) * 1024
+                    elif key == "Threads":
+                        status["threads"] = int(value)
+        except OSError:
+            return None
+        return status
+
+    def sample(self):
+        rss = threads = 0
+        for pid in self.process_tree():
+            status = self.read_status(pid)
+            if not status:
+                continue
+            self.processes[pid] = status
+            rss += status.get("rss_bytes", 0)
+            threads += status.get("threads", 0)
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        self.peak_threads = max(self.peak_threads, threads)
+
+    async def run(self, interval: float = 0.25):
+        if not os.path.isdir("/proc"):
+            return
+        while True:
+            self.sample()
+            await asyncio.sleep(interval)
+
+    def results(self) -> Dict[str, Any]:
+        return {
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "peak_threads": self.peak_threads,
+            "processes": self.processes,
+        }
+
+
+async def http_flood(port: int, requests: int, concurrency: int, keepalive: bool) -> Dict[str, Any]:
+    # Scanners rarely reuse connections, so by default every request opens one
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    remaining = iter(range(requests))
+
+    connector = aiohttp.TCPConnector(limit=concurrency, force_close=not keepalive)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+        async def worker():
+            nonlocal errors
+            for index in remaining:
+                path = HTTP_PATHS[index % len(HTTP_PATHS)]
+                started = time.perf_counter()
+                try:
+                    async with session.get(f"http://127.0.0.1:{port}{path}") as response:
+                        await response.read()
+                        status = str(response.status)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "responses": statuses,
+        "errors": errors,
+        "duration_s": elapsed,
+        "connections_per_second": (requests - errors) / elapsed if elapsed else 0.0,
+        "latency": percentiles(latencies),
+    }
+
+
+def ssh_client(port: int, index: int, attempts: int) -> Dict[str, Any]:
+    # One connection guessing a few passwords, like a credential stuffing bot
+    started = time.perf_counter()
+    answered = 0
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=30) as sock:
+            transport = paramiko.Transport(sock)
+            try:
+                transport.start_client(timeout=30)
+                for attempt in range(attempts):
+                    try:
+                        transport.auth_password(f"bench{index}", f"password{attempt}")
+                    except paramiko.AuthenticationException:
+                        answered += 1
+            finally:
+                transport.close()
+    except (OSError, paramiko.SSHException):
+        return {"error": True, "attempts": answered, "duration": None}
+    return {"error": False, "attempts": answered, "duration": time.perf_counter() - started}
+
+
+async def ssh_clients(port: int, clients: int, concurrency: int, attempts: int) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, ssh_client, port, index, attempts)
+                for index in range(clients)
+            )
+        )
+    elapsed = time.perf_counter() - started
+
+    errors = sum(1 for result in results if result["error"])
+    return {
+        "clients": clients,
+        "errors": errors,
+        "attempts": sum(result["attempts"] for result in results),
+        "duration_s": elapsed,
+        "connections_per_second": (clients - errors) / elapsed if elapsed else 0.0,
+        "session_latency": percentiles(
+            [result["duration"] for result in results if result["duration"] is not None]
+        ),
+    }
+
+
+def write_env(directory: str, overrides: Dict[str, str]):
+    # Everything not overridden comes from .env.example
+    settings: Dict[str, str] = {}
+    with open(os.path.join(ROOT_DIRECTORY, ".env.example"), "r", encoding="utf-8") as file:
+        for line in file:
+            key, _, value = line.strip().partition("=")
+            if key:
+                settings[key] = value
+    settings.update(overrides)
+
+    with open(os.path.join(directory, ".env"), "w", encoding="utf-8") as file:
+        file.write("\n".join(f"{key}={value}" for key, value in settings.items()))
+
+
+async def wait_for_port(port: int, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Collector did not listen on port {port} in time")
+            await asyncio.sleep(0.1)
+            continue
+        writer.close()
+        await writer.wait_closed()
+        return
+
+
+async def wait_for_delivery(stub: StubAPI, expected: Optional[int], idle_timeout: float):
+    # Done once everything expected arrived, or nothing arrived for a while
+    last_count, last_change = -1, time.perf_counter()
+    while expected is None or stub.incidents < expected:
+        if stub.incidents != last_count:
+            last_count, last_change = stub.incidents, time.perf_counter()
+        elif time.perf_counter() - last_change > idle_timeout:
+            return
+        await asyncio.sleep(0.1)
+
+
+def start_collector(directory: str, log_file) -> subprocess.Popen:
+    # The collector's processes handle SIGINT to flush before exiting, so it
+    # is started in its own process group with SIGINT restored
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIRECTORY, "start.py")],
+        cwd=directory,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+        preexec_fn=lambda: (os.setpgrp(), signal.signal(signal.SIGINT, signal.SIG_DFL)),
+    )
+
+
+def stop_collector(collector: subprocess.Popen, timeout: float = 30):
+    try:
+        os.killpg(collector.pid, signal.SIGINT)
+        collector.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(collector.pid, signal.SIGKILL)
+        collector.wait()
+    except ProcessLookupError:
+        pass
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT_DIRECTORY,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    api_port = args.api_port or free_port()
+    http_port = args.http_port or free_port()
+    ssh_port = args.ssh_port or free_port()
+
+    overrides = {
+        "API_ENABLED": "true",
+        "API_POST_URL": f"http://127.0.0.1:{api_port}/api/incidents",
+        "LOGGING_LEVEL": "WARNING",
+        "SERVICE_HTTP_ENABLED": "true" if args.http_requests else "false",
+        "SERVICE_HTTP_PORT": str(http_port),
+        "SERVICE_HTTP_WORKERS": str(args.http_workers),
+        "SERVICE_SSH_ENABLED": "true" if args.ssh_clients else "false",
+        "SERVICE_SSH_PORT": str(ssh_port),
+        "SSH_AGGREGATION_ENABLED": "true" if args.ssh_aggregation else "false",
+        # The collector runs from a temporary directory
+        "HTTP_DECOY_DIR": os.path.join(ROOT_DIRECTORY, "decoys"),
+    }
+    if not args.rate_limit:
+        # All load comes from 127.0.0.1, which would be throttled right away
+        overrides["HTTP_RATE_LIMIT_RATE"] = "1000000"
+        overrides["HTTP_RATE_LIMIT_BURST"] = "1000000"
+        overrides["SSH_MAX_CONNECTIONS_PER_IP"] = "1000000"
+    for setting in args.set:
+        key, _, value = setting.partition("=")
+        overrides[key] = value
+
+    stub = StubAPI()
+    runner = await stub.start(api_port)
+
+    with tempfile.TemporaryDirectory(prefix="collector-load-test-") as directory:
+        write_env(directory, overrides)
+        with open(os.path.join(directory, "collector.log"), "wb") as log_file:
+            collector = start_collector(directory, log_file)
+            sampler = ResourceSampler(collector.pid)
+            sampler_task = asyncio.create_task(sampler.run())
+            try:
+                if args.http_requests:
+                    await wait_for_port(http_port, args.startup_timeout)
+                if args.ssh_clients:
+                    await wait_for_port(ssh_port, args.startup_timeout)
+                sampler.sample()
+                idle_rss_bytes = sampler.peak_rss_bytes
+
+                load = []
+                if args.http_requests:
+                    load.append(
+                        http_flood(http_port, args.http_requests, args.http_concurrency, args.keepalive)
+                    )
+                if args.ssh_clients:
+                    load.append(
+                        ssh_clients(ssh_port, args.ssh_clients, args.ssh_concurrency, args.ssh_attempts)
+                    )
+
+                started = time.perf_counter()
+                results = await asyncio.gather(*load)
+                load_duration = time.perf_counter() - started
+                http = results.pop(0) if args.http_requests else None
+                ssh = results.pop(0) if args.ssh_clients else None
+
+                # Every answered request or password attempt is one incident,
+                # unless attempts are aggregated
+                expected = 0
+                if http is not None:
+                    # Decoys answer with other statuses, only 429s skip the incident
+                    expected += sum(
+                        count for status, count in http["responses"].items() if status != "429"
+                    )
+                if ssh is not None:
+                    expected = None if args.ssh_aggregation else expected + ssh["attempts"]
+                await wait_for_delivery(stub, expected, args.drain_timeout)
+                delivered = stub.incidents
+                delivery_duration = (stub.last_received or started) - started
+            finally:
+                sampler_task.cancel()
+                stop_collector(collector)
+
+        if collector.returncode not in (0, -signal.SIGINT):
+            with open(os.path.join(directory, "collector.log"), "r", errors="replace") as file:
+                print(file.read(), file=sys.stderr)
+
+    # Give the collector's shutdown flush a moment to land
+    await asyncio.sleep(0.5)
+    await runner.cleanup()
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "collector_overrides": overrides,
+        "load_duration_s": load_duration,
+        "http": http,
+        "ssh": ssh,
+        "delivery": {
+            "expected_incidents": expected,
+            "delivered_incidents": delivered,
+            "delivered_after_shutdown": stub.incidents - delivered,
+            "api_requests": stub.requests,
+            "incident_types": stub.incident_types,
+            "incidents_per_second": delivered / delivery_duration if delivery_duration > 0 else 0.0,
+            "latency": percentiles(stub.latencies),
+        },
+        "resources": {"idle_rss_bytes": idle_rss_bytes, **sampler.results()},
+    }
+
+
+def headline(results: Dict[str, Any]) -> Dict[str, float]:
+    metrics = {
+        "incidents_per_second": results["delivery"]["incidents_per_second"],
+        "delivery_p99_ms": results["delivery"]["latency"].get("p99_ms", 0.0),
+        "peak_rss_bytes": results["resources"]["peak_rss_bytes"],
+        "peak_threads": results["resources"]["peak_threads"],
+    }
+    for service in ("http", "ssh"):
+        if results.get(service):
+            metrics[f"{service}_connections_per_second"] = results[service]["connections_per_second"]
+    return metrics
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]):
+    current, previous = headline(results), headline(baseline)
+    for key, value in current.items():
+        if key not in previous:
+            continue
+        before = previous[key]
+        change = (value - before) / before * 100 if before else 0.0
+        print(f"  {key:>32}: {before:>14.1f} -> {value:>14.1f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the collector end to end against a local stub API"
+    )
+    parser.add_argument("--http-requests", type=int, default=5000)
+    parser.add_argument("--http-concurrency", type=int, default=64)
+    parser.add_argument("--http-workers", type=int, default=1)
+    parser.add_argument("--keepalive", action="store_true", help="Reuse HTTP connections")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the HTTP rate limits")
+    parser.add_argument("--ssh-clients", type=int, default=200)
+    parser.add_argument("--ssh-concurrency", type=int, default=16)
+    parser.add_argument("--ssh-attempts", type=int, default=3)
+    parser.add_argument("--ssh-aggregation", action="store_true")
+    parser.add_argument("--api-port", type=int, default=0)
+    parser.add_argument("--http-port", type=int, default=0)
+    parser.add_argument("--ssh-port", type=int, default=0)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--drain-timeout", type=float, default=10)
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="KEY=VALUE",
+        help="Override a collector setting, may be repeated",
+    )
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Results of a previous run to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        ROOT_DIRECTORY,
+        "benchmarks",
+        "results",
+        f"load_test_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    for service in ("http", "ssh"):
+        if results[service]:
+            print(f"{service}: {results[service]['connections_per_second']:.1f} connections/s, "
+                  f"{results[service]['errors']} errors")
+    delivery = results["delivery"]
+    latency = delivery["latency"]
+    print(f"delivered {delivery['delivered_incidents']}/{delivery['expected_incidents']} incidents, "
+          f"{delivery['incidents_per_second']:.1f}/s")
+    if latency:
+        print(f"end-to-end latency p50={latency['p50_ms']:.1f}ms p90={latency['p90_ms']:.1f}ms "
+              f"p99={latency['p99_ms']:.1f}ms max={latency['max_ms']:.1f}ms")
+    print(f"peak RSS {results['resources']['peak_rss_bytes'] / 1024 / 1024:.1f} MiB, "
+          f"peak threads {results['resources']['peak_threads']}")
+    print(f"results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            print("compared to", args.baseline)
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import paramiko
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.helpers.metrics.latency_histogram import LatencyHistogram  # noqa: E402
+
+
+def connect(host, port, index):
+    # Time from TCP connect until the (always failing) password auth returns
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    started = time.perf_counter()
+    try:
+        client.connect(
+            host,
+            port,
+            username=f"bench{index}",
+            password="bench",
+            look_for_keys=False,
+            allow_agent=False,
+            timeout=30,
+        )
+    except paramiko.AuthenticationException:
+        pass
+    finally:
+        client.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SSH pot handshake latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    histogram = LatencyHistogram()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for duration in executor.map(
+            lambda index: connect(args.host, args.port, index), range(args.connections)
+        ):
+            histogram.observe(duration)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.connections} handshakes in {elapsed:.2f}s "
+          f"({args.connections / elapsed:.1f}/s)")
+    print(histogram.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+from datetime import date, datetime
+import json
+import os
+import sys
+from typing import Any, Dict, List, Sequence
+from src.helpers.configuration.configuration import Configuration
+from src.incidents.incident_store import IncidentDatabase
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+
+def day(value: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid day {value!r}, expected YYYY-MM-DD")
+
+
+def timestamp(value: str) -> str:
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid timestamp {value!r}, expected an ISO timestamp")
+
+
+def print_rows(headers: Sequence[str], rows: List[Sequence[Any]], as_json: bool):
+    if as_json:
+        for row in rows:
+            print(json.dumps(dict(zip(headers, row))))
+        return
+
+    table = [[str(value) for value in headers]] + [[str(value) for value in row] for row in rows]
+    widths = [max(len(row[index]) for row in table) for index in range(len(headers))]
+    for row in table:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Query the incidents kept in the local store (STORE_ENABLED)"
+    )
+    parser.add_argument("--db", default=CONFIG.get("STORE_PATH"), help="Path of the database")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per row")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    top_ips = commands.add_parser("top-ips", help="Source IPs with the most incidents")
+    top_ips.add_argument("--type", dest="incident_type", help="Only incidents of this type")
+
+    credentials = commands.add_parser("credentials", help="Most tried usernames and passwords")
+
+    daily = commands.add_parser("daily", help="Incidents and distinct sources per day and type")
+
+    for command in (top_ips, credentials, daily):
+        command.add_argument("--since", type=day, help="First day included, YYYY-MM-DD")
+        command.add_argument("--until", type=day, help="Last day included, YYYY-MM-DD")
+    for command in (top_ips, credentials):
+        command.add_argument("--limit", type=int, default=10)
+
+    incidents = commands.add_parser("incidents", help="Latest incidents, newest first")
+    incidents.add_argument("--since", type=timestamp, help="ISO timestamp, included")
+    incidents.add_argument("--until", type=timestamp, help="ISO timestamp, excluded")
+    incidents.add_argument("--ip", dest="ip_address")
+    incidents.add_argument("--type", dest="incident_type")
+    incidents.add_argument("--limit", type=int, default=100)
+
+    compact = commands.add_parser("compact", help="Delete incidents past the retention")
+    compact.add_argument(
+        "--retention-days", type=int, default=CONFIG.get("STORE_RETENTION_DAYS")
+    )
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"no incident store at {args.db}")
+
+    database = IncidentDatabase(args.db)
+    try:
+        if args.command == "top-ips":
+            rows = database.top_ips(args.limit, args.since, args.until, args.incident_type)
+            print_rows(("ip_address", "incidents"), rows, args.json)
+        elif args.command == "credentials":
+            rows = database.top_credentials(args.limit, args.since, args.until)
+            print_rows(("username", "password", "attempts"), rows, args.json)
+        elif args.command == "daily":
+            rows = database.daily_counts(args.since, args.until)
+            print_rows(("day", "incident_type", "incidents", "sources"), rows, args.json)
+        elif args.command == "incidents":
+            rows = database.incidents(
+                args.limit, args.since, args.until, args.ip_address, args.incident_type
+            )
+            if not args.json:
+                rows = [(*row[:3], json.dumps(row[3])) for row in rows]
+            print_rows(("happened_at", "ip_address", "incident_type", "metadata"), rows, args.json)
+        elif args.command == "compact":
+            if args.retention_days < 1:
+                parser.error("--retention-days should be a positive integer")
+            print(f"Deleted {database.compact(args.retention_days)} incidents")
+    finally:
+        database.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from typing import Any, Dict
 import os
+import sys
 
 class Configuration:
     _instance = None
@@ -32,7 +33,8 @@ class Configuration:
     def load_config(cls) -> Dict[str, Any]:
         config: Dict[str, Any] = cls.read_config()
         cls.validate_config(config)
-        print("Configuration is valid.")
+        # stderr keeps the output of the command line tools clean
+        print("Configuration is valid.", file=sys.stderr)
         return config
 
     @classmethod
@@ -62,8 +64,229 @@ class Configuration:
         except ValueError:
             config["SERVICE_SSH_PORT"] = None
 
+        config["LOGGING_ASYNC"] = env_vars.get("LOGGING_ASYNC", "true") == "true"
+        config["LOGGING_FORMAT"] = env_vars.get("LOGGING_FORMAT", "text")
+        config["LOGGING_QUEUE_SIZE"] = cls.parse_integer(
+            env_vars.get("LOGGING_QUEUE_SIZE"), 10000
+        )
+        config["LOGGING_RATE_LIMIT"] = cls.parse_integer(env_vars.get("LOGGING_RATE_LIMIT"), 20)
+
+        config["API_BATCH_SIZE"] = cls.parse_integer(env_vars.get("API_BATCH_SIZE"), 100)
+        config["API_FLUSH_INTERVAL_MS"] = cls.parse_integer(
+            env_vars.get("API_FLUSH_INTERVAL_MS"), 1000
+        )
+        config["API_POOL_SIZE"] = cls.parse_integer(env_vars.get("API_POOL_SIZE"), 10)
+
+        config["API_BATCH_FORMAT"] = env_vars.get("API_BATCH_FORMAT", "ndjson")
+        config["API_BATCH_RETRY_INTERVAL"] = cls.parse_integer(
+            env_vars.get("API_BATCH_RETRY_INTERVAL"), 3600
+        )
+        config["API_COMPRESSION"] = env_vars.get("API_COMPRESSION", "gzip")
+        config["API_COMPRESSION_LEVEL"] = cls.parse_integer(
+            env_vars.get("API_COMPRESSION_LEVEL"), 6
+        )
+        config["API_TIMEOUT_MS"] = cls.parse_integer(env_vars.get("API_TIMEOUT_MS"), 5000)
+        config["API_RETRIES"] = cls.parse_integer(env_vars.get("API_RETRIES"), 2)
+        config["API_RETRY_BACKOFF_MS"] = cls.parse_integer(env_vars.get("API_RETRY_BACKOFF_MS"), 200)
+        config["API_LATENCY_TARGET_MS"] = cls.parse_integer(
+            env_vars.get("API_LATENCY_TARGET_MS"), 1000
+        )
+        config["API_BREAKER_FAILURES"] = cls.parse_integer(env_vars.get("API_BREAKER_FAILURES"), 5)
+        config["API_BREAKER_COOLDOWN_MS"] = cls.parse_integer(
+            env_vars.get("API_BREAKER_COOLDOWN_MS"), 1000
+        )
+        config["API_BREAKER_MAX_COOLDOWN_MS"] = cls.parse_integer(
+            env_vars.get("API_BREAKER_MAX_COOLDOWN_MS"), 60000
+        )
+
+        config["INCIDENT_QUEUE_SIZE"] = cls.parse_integer(
+            env_vars.get("INCIDENT_QUEUE_SIZE"), 10000
+        )
+        config["INCIDENT_QUEUE_WORKERS"] = cls.parse_integer(
+            env_vars.get("INCIDENT_QUEUE_WORKERS"), 100
+        )
+        config["INCIDENT_QUEUE_POLICY"] = env_vars.get("INCIDENT_QUEUE_POLICY", "fair_share")
+
+        config["ENRICHMENT_ENABLED"] = env_vars.get("ENRICHMENT_ENABLED") == "true"
+        config["ENRICHMENT_DATABASES"] = [
+            path.strip()
+            for path in env_vars.get("ENRICHMENT_DATABASES", "").split(",")
+            if path.strip()
+        ]
+        config["ENRICHMENT_REVERSE_DNS"] = (
+            env_vars.get("ENRICHMENT_REVERSE_DNS", "true") == "true"
+        )
+        config["ENRICHMENT_DNS_TIMEOUT_MS"] = cls.parse_integer(
+            env_vars.get("ENRICHMENT_DNS_TIMEOUT_MS"), 1000
+        )
+        config["ENRICHMENT_DNS_WORKERS"] = cls.parse_integer(
+            env_vars.get("ENRICHMENT_DNS_WORKERS"), 4
+        )
+        config["ENRICHMENT_CACHE_SIZE"] = cls.parse_integer(
+            env_vars.get("ENRICHMENT_CACHE_SIZE"), 10000
+        )
+        config["ENRICHMENT_CACHE_TTL"] = cls.parse_integer(
+            env_vars.get("ENRICHMENT_CACHE_TTL"), 3600
+        )
+        config["ENRICHMENT_IPV4_PREFIX"] = cls.parse_integer(
+            env_vars.get("ENRICHMENT_IPV4_PREFIX"), 24
+        )
+        config["ENRICHMENT_IPV6_PREFIX"] = cls.parse_integer(
+            env_vars.get("ENRICHMENT_IPV6_PREFIX"), 48
+        )
+
+        config["SHIPPER_PROCESS_ENABLED"] = (
+            env_vars.get("SHIPPER_PROCESS_ENABLED", "true") == "true"
+        )
+        config["SHIPPER_SOCKET"] = env_vars.get("SHIPPER_SOCKET", "shipper.sock")
+        config["SHIPPER_FORWARD_QUEUE"] = cls.parse_integer(
+            env_vars.get("SHIPPER_FORWARD_QUEUE"), 10000
+        )
+
+        config["PAYLOAD_DEDUP_ENABLED"] = env_vars.get("PAYLOAD_DEDUP_ENABLED") == "true"
+        config["PAYLOAD_DEDUP_CACHE_SIZE"] = cls.parse_integer(
+            env_vars.get("PAYLOAD_DEDUP_CACHE_SIZE"), 10000
+        )
+
+        config["SPOOL_ENABLED"] = env_vars.get("SPOOL_ENABLED") == "true"
+        config["SPOOL_DIR"] = env_vars.get("SPOOL_DIR", "spool")
+        config["SPOOL_SEGMENT_BYTES"] = cls.parse_integer(
+            env_vars.get("SPOOL_SEGMENT_BYTES"), 16 * 1024 * 1024
+        )
+        config["SPOOL_MAX_SEGMENTS"] = cls.parse_integer(env_vars.get("SPOOL_MAX_SEGMENTS"), 64)
+        config["SPOOL_FSYNC_BATCH"] = cls.parse_integer(env_vars.get("SPOOL_FSYNC_BATCH"), 100)
+        config["SPOOL_REPLAY_RATE"] = cls.parse_integer(env_vars.get("SPOOL_REPLAY_RATE"), 500)
+
+        config["STORE_ENABLED"] = env_vars.get("STORE_ENABLED") == "true"
+        config["STORE_PATH"] = env_vars.get("STORE_PATH", "incidents.db")
+        config["STORE_BATCH_SIZE"] = cls.parse_integer(env_vars.get("STORE_BATCH_SIZE"), 500)
+        config["STORE_FLUSH_INTERVAL_MS"] = cls.parse_integer(
+            env_vars.get("STORE_FLUSH_INTERVAL_MS"), 1000
+        )
+        config["STORE_RETENTION_DAYS"] = cls.parse_integer(env_vars.get("STORE_RETENTION_DAYS"), 30)
+
+        config["SERVICE_HTTP_WORKERS"] = cls.parse_integer(env_vars.get("SERVICE_HTTP_WORKERS"), 1)
+
+        config["HTTP_DECOY_DIR"] = env_vars.get("HTTP_DECOY_DIR", "decoys")
+        config["HTTP_SIGNATURES_FILE"] = env_vars.get(
+            "HTTP_SIGNATURES_FILE", "signatures/http.rules"
+        )
+        config["HTTP_SIGNATURES_BODY_BYTES"] = cls.parse_integer(
+            env_vars.get("HTTP_SIGNATURES_BODY_BYTES"), 8192
+        )
+        config["HTTP_BODY_CAPTURE_BYTES"] = cls.parse_integer(
+            env_vars.get("HTTP_BODY_CAPTURE_BYTES"), 64 * 1024
+        )
+        config["HTTP_BODY_MAX_BYTES"] = cls.parse_integer(
+            env_vars.get("HTTP_BODY_MAX_BYTES"), 16 * 1024 * 1024
+        )
+
+        config["HTTP_RATE_LIMIT_RATE"] = cls.parse_integer(
+            env_vars.get("HTTP_RATE_LIMIT_RATE"), 10
+        )
+        config["HTTP_RATE_LIMIT_BURST"] = cls.parse_integer(
+            env_vars.get("HTTP_RATE_LIMIT_BURST"), 1000
+        )
+        config["HTTP_RATE_LIMIT_MAX_TRACKED"] = cls.parse_integer(
+            env_vars.get("HTTP_RATE_LIMIT_MAX_TRACKED"), 100000
+        )
+        config["HTTP_RATE_LIMIT_IPV4_PREFIX"] = cls.parse_integer(
+            env_vars.get("HTTP_RATE_LIMIT_IPV4_PREFIX"), 32
+        )
+        config["HTTP_RATE_LIMIT_IPV6_PREFIX"] = cls.parse_integer(
+            env_vars.get("HTTP_RATE_LIMIT_IPV6_PREFIX"), 64
+        )
+
+        config["SERVICE_TELNET_ENABLED"] = env_vars.get("SERVICE_TELNET_ENABLED") == "true"
+        config["SERVICE_TELNET_PORT"] = cls.parse_integer(env_vars.get("SERVICE_TELNET_PORT"), 2323)
+        config["SERVICE_REDIS_ENABLED"] = env_vars.get("SERVICE_REDIS_ENABLED") == "true"
+        config["SERVICE_REDIS_PORT"] = cls.parse_integer(env_vars.get("SERVICE_REDIS_PORT"), 6379)
+        config["SERVICE_SMTP_ENABLED"] = env_vars.get("SERVICE_SMTP_ENABLED") == "true"
+        config["SERVICE_SMTP_PORT"] = cls.parse_integer(env_vars.get("SERVICE_SMTP_PORT"), 2525)
+        config["SERVICE_BANNER_ENABLED"] = env_vars.get("SERVICE_BANNER_ENABLED") == "true"
+        config["SERVICE_BANNER_PORT"] = cls.parse_integer(env_vars.get("SERVICE_BANNER_PORT"), 2121)
+        config["SERVICE_BANNER_TEXT"] = env_vars.get("SERVICE_BANNER_TEXT", "220 (vsFTPd 3.0.3)")
+        config["TCP_MAX_CONNECTIONS"] = cls.parse_integer(
+            env_vars.get("TCP_MAX_CONNECTIONS"), 20000
+        )
+        config["TCP_IDLE_TIMEOUT"] = cls.parse_integer(env_vars.get("TCP_IDLE_TIMEOUT"), 60)
+        config["TCP_BACKLOG"] = cls.parse_integer(env_vars.get("TCP_BACKLOG"), 1024)
+
+        config["SCAN_ENABLED"] = env_vars.get("SCAN_ENABLED") == "true"
+        config["SCAN_PORTS"] = cls.parse_port_ranges(env_vars.get("SCAN_PORTS", "1-1024"))
+        config["SCAN_WINDOW"] = cls.parse_integer(env_vars.get("SCAN_WINDOW"), 60)
+        config["SCAN_MAX_SAMPLES"] = cls.parse_integer(env_vars.get("SCAN_MAX_SAMPLES"), 100)
+        config["SCAN_PAYLOAD_BYTES"] = cls.parse_integer(env_vars.get("SCAN_PAYLOAD_BYTES"), 64)
+        config["SCAN_IDLE_TIMEOUT"] = cls.parse_integer(env_vars.get("SCAN_IDLE_TIMEOUT"), 10)
+
+        config["SSH_HOST_KEY_TYPES"] = [
+            key_type.strip()
+            for key_type in env_vars.get("SSH_HOST_KEY_TYPES", "rsa").split(",")
+            if key_type.strip()
+        ]
+
+        config["SSH_AGGREGATION_ENABLED"] = (
+            env_vars.get("SSH_AGGREGATION_ENABLED", "true") == "true"
+        )
+        config["SSH_AGGREGATION_WINDOW"] = cls.parse_integer(
+            env_vars.get("SSH_AGGREGATION_WINDOW"), 60
+        )
+        config["SSH_AGGREGATION_MAX_CREDENTIALS"] = cls.parse_integer(
+            env_vars.get("SSH_AGGREGATION_MAX_CREDENTIALS"), 100
+        )
+        config["SSH_MAX_CONNECTIONS"] = cls.parse_integer(env_vars.get("SSH_MAX_CONNECTIONS"), 1000)
+        config["SSH_MAX_CONNECTIONS_PER_IP"] = cls.parse_integer(
+            env_vars.get("SSH_MAX_CONNECTIONS_PER_IP"), 10
+        )
+        config["SSH_TARPIT_ENABLED"] = env_vars.get("SSH_TARPIT_ENABLED") == "true"
+        config["SSH_TARPIT_THRESHOLD"] = cls.parse_integer(env_vars.get("SSH_TARPIT_THRESHOLD"), 10)
+        config["SSH_TARPIT_DELAY_MS"] = cls.parse_integer(env_vars.get("SSH_TARPIT_DELAY_MS"), 1000)
+        config["SSH_TARPIT_MAX_DELAY_MS"] = cls.parse_integer(
+            env_vars.get("SSH_TARPIT_MAX_DELAY_MS"), 10000
+        )
+        config["SSH_TARPIT_WINDOW"] = cls.parse_integer(env_vars.get("SSH_TARPIT_WINDOW"), 3600)
+
+        config["METRICS_ENABLED"] = env_vars.get("METRICS_ENABLED") == "true"
+        config["METRICS_HOST"] = env_vars.get("METRICS_HOST", "127.0.0.1")
+        config["METRICS_PORT"] = cls.parse_integer(env_vars.get("METRICS_PORT"), 9108)
+        config["METRICS_DIR"] = env_vars.get("METRICS_DIR", "metrics")
+        config["METRICS_DUMP_INTERVAL"] = cls.parse_integer(
+            env_vars.get("METRICS_DUMP_INTERVAL"), 5
+        )
+
+        config["PROFILE_ENABLED"] = env_vars.get("PROFILE_ENABLED") == "true"
+        config["PROFILE_SAMPLE_RATE"] = cls.parse_integer(env_vars.get("PROFILE_SAMPLE_RATE"), 100)
+        config["PROFILE_TRACEMALLOC"] = env_vars.get("PROFILE_TRACEMALLOC") == "true"
+        config["PROFILE_DUMP_INTERVAL"] = cls.parse_integer(
+            env_vars.get("PROFILE_DUMP_INTERVAL"), 0
+        )
+        config["PROFILE_DIR"] = env_vars.get("PROFILE_DIR", "profiles")
+
         return config
 
+    @classmethod
+    def parse_integer(cls, value, default):
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    @classmethod
+    def parse_port_ranges(cls, value):
+        # "21-25,80,8000-8100" -> sorted list of distinct ports
+        ports = set()
+        try:
+            for part in value.split(","):
+                if not part.strip():
+                    continue
+                first, _, last = part.partition("-")
+                ports.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            return None
+        return sorted(ports)
+
     @classmethod
     def validate_api_post_url(cls, value):
         if value is None:
@@ -89,6 +312,26 @@ class Configuration:
         if not isinstance(value, int):
             raise ValueError(f"'{key}' should be an integer.")
 
+    @classmethod
+    def validate_positive_integer(cls, value, key):
+        if not isinstance(value, int) or value < 1:
+            raise ValueError(f"'{key}' should be a positive integer.")
+
+    @classmethod
+    def validate_choice(cls, value, key, choices):
+        if value not in choices:
+            raise ValueError(f"'{key}' should be one of: {', '.join(choices)}.")
+
+    @classmethod
+    def validate_string_list(cls, value, key):
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"'{key}' should be a comma separated list of strings.")
+
+    @classmethod
+    def validate_port_list(cls, value, key):
+        if not isinstance(value, list) or not all(0 < port < 65536 for port in value):
+            raise ValueError(f"'{key}' should be a comma separated list of ports or port ranges.")
+
     @classmethod
     def validate_config(cls, config: Dict[str, Any]) -> None:
         cls.validate_api_post_url(config.get("API_POST_URL"))
@@ -96,11 +339,141 @@ class Configuration:
         cls.validate_boolean(config.get("API_ENABLED"), "API_ENABLED")
         cls.validate_string(config.get("LOGGING_LEVEL"), "LOGGING_LEVEL")
         cls.validate_boolean(config.get("LOGGING_ENABLED"), "LOGGING_ENABLED")
+        cls.validate_boolean(config.get("LOGGING_ASYNC"), "LOGGING_ASYNC")
+        cls.validate_choice(config.get("LOGGING_FORMAT"), "LOGGING_FORMAT", ["text", "json"])
+        cls.validate_positive_integer(config.get("LOGGING_QUEUE_SIZE"), "LOGGING_QUEUE_SIZE")
+        cls.validate_integer(config.get("LOGGING_RATE_LIMIT"), "LOGGING_RATE_LIMIT")
         cls.validate_string(config.get("COLLECTOR_ID"), "COLLECTOR_ID")
         cls.validate_boolean(config.get("SERVICE_HTTP_ENABLED"), "SERVICE_HTTP_ENABLED")
         cls.validate_boolean(config.get("SERVICE_SSH_ENABLED"), "SERVICE_SSH_ENABLED")
         cls.validate_integer(config.get("SERVICE_HTTP_PORT"), "SERVICE_HTTP_PORT")
         cls.validate_integer(config.get("SERVICE_SSH_PORT"), "SERVICE_SSH_PORT")
+        cls.validate_integer(config.get("API_BATCH_SIZE"), "API_BATCH_SIZE")
+        cls.validate_integer(config.get("API_FLUSH_INTERVAL_MS"), "API_FLUSH_INTERVAL_MS")
+        cls.validate_integer(config.get("API_POOL_SIZE"), "API_POOL_SIZE")
+        cls.validate_choice(config.get("API_BATCH_FORMAT"), "API_BATCH_FORMAT", ["ndjson", "single"])
+        cls.validate_integer(config.get("API_BATCH_RETRY_INTERVAL"), "API_BATCH_RETRY_INTERVAL")
+        cls.validate_choice(
+            config.get("API_COMPRESSION"), "API_COMPRESSION", ["gzip", "zstd", "none"]
+        )
+        cls.validate_integer(config.get("API_COMPRESSION_LEVEL"), "API_COMPRESSION_LEVEL")
+        cls.validate_positive_integer(config.get("API_TIMEOUT_MS"), "API_TIMEOUT_MS")
+        cls.validate_integer(config.get("API_RETRIES"), "API_RETRIES")
+        cls.validate_positive_integer(config.get("API_RETRY_BACKOFF_MS"), "API_RETRY_BACKOFF_MS")
+        cls.validate_positive_integer(config.get("API_LATENCY_TARGET_MS"), "API_LATENCY_TARGET_MS")
+        cls.validate_positive_integer(config.get("API_BREAKER_FAILURES"), "API_BREAKER_FAILURES")
+        cls.validate_positive_integer(
+            config.get("API_BREAKER_COOLDOWN_MS"), "API_BREAKER_COOLDOWN_MS"
+        )
+        cls.validate_positive_integer(
+            config.get("API_BREAKER_MAX_COOLDOWN_MS"), "API_BREAKER_MAX_COOLDOWN_MS"
+        )
+        cls.validate_positive_integer(config.get("INCIDENT_QUEUE_SIZE"), "INCIDENT_QUEUE_SIZE")
+        cls.validate_positive_integer(
+            config.get("INCIDENT_QUEUE_WORKERS"), "INCIDENT_QUEUE_WORKERS"
+        )
+        cls.validate_choice(
+            config.get("INCIDENT_QUEUE_POLICY"),
+            "INCIDENT_QUEUE_POLICY",
+            ["drop_newest", "drop_oldest", "fair_share"],
+        )
+        cls.validate_boolean(config.get("ENRICHMENT_ENABLED"), "ENRICHMENT_ENABLED")
+        cls.validate_string_list(config.get("ENRICHMENT_DATABASES"), "ENRICHMENT_DATABASES")
+        cls.validate_boolean(config.get("ENRICHMENT_REVERSE_DNS"), "ENRICHMENT_REVERSE_DNS")
+        cls.validate_positive_integer(
+            config.get("ENRICHMENT_DNS_TIMEOUT_MS"), "ENRICHMENT_DNS_TIMEOUT_MS"
+        )
+        cls.validate_positive_integer(config.get("ENRICHMENT_DNS_WORKERS"), "ENRICHMENT_DNS_WORKERS")
+        cls.validate_positive_integer(config.get("ENRICHMENT_CACHE_SIZE"), "ENRICHMENT_CACHE_SIZE")
+        cls.validate_positive_integer(config.get("ENRICHMENT_CACHE_TTL"), "ENRICHMENT_CACHE_TTL")
+        cls.validate_integer(config.get("ENRICHMENT_IPV4_PREFIX"), "ENRICHMENT_IPV4_PREFIX")
+        cls.validate_integer(config.get("ENRICHMENT_IPV6_PREFIX"), "ENRICHMENT_IPV6_PREFIX")
+        cls.validate_boolean(config.get("SHIPPER_PROCESS_ENABLED"), "SHIPPER_PROCESS_ENABLED")
+        cls.validate_string(config.get("SHIPPER_SOCKET"), "SHIPPER_SOCKET")
+        cls.validate_positive_integer(
+            config.get("SHIPPER_FORWARD_QUEUE"), "SHIPPER_FORWARD_QUEUE"
+        )
+        cls.validate_boolean(config.get("PAYLOAD_DEDUP_ENABLED"), "PAYLOAD_DEDUP_ENABLED")
+        cls.validate_positive_integer(
+            config.get("PAYLOAD_DEDUP_CACHE_SIZE"), "PAYLOAD_DEDUP_CACHE_SIZE"
+        )
+        cls.validate_boolean(config.get("SPOOL_ENABLED"), "SPOOL_ENABLED")
+        cls.validate_string(config.get("SPOOL_DIR"), "SPOOL_DIR")
+        cls.validate_integer(config.get("SPOOL_SEGMENT_BYTES"), "SPOOL_SEGMENT_BYTES")
+        cls.validate_integer(config.get("SPOOL_MAX_SEGMENTS"), "SPOOL_MAX_SEGMENTS")
+        cls.validate_integer(config.get("SPOOL_FSYNC_BATCH"), "SPOOL_FSYNC_BATCH")
+        cls.validate_integer(config.get("SPOOL_REPLAY_RATE"), "SPOOL_REPLAY_RATE")
+        cls.validate_boolean(config.get("STORE_ENABLED"), "STORE_ENABLED")
+        cls.validate_string(config.get("STORE_PATH"), "STORE_PATH")
+        cls.validate_positive_integer(config.get("STORE_BATCH_SIZE"), "STORE_BATCH_SIZE")
+        cls.validate_positive_integer(
+            config.get("STORE_FLUSH_INTERVAL_MS"), "STORE_FLUSH_INTERVAL_MS"
+        )
+        cls.validate_integer(config.get("STORE_RETENTION_DAYS"), "STORE_RETENTION_DAYS")
+        cls.validate_positive_integer(config.get("SERVICE_HTTP_WORKERS"), "SERVICE_HTTP_WORKERS")
+        cls.validate_string(config.get("HTTP_DECOY_DIR"), "HTTP_DECOY_DIR")
+        cls.validate_string(config.get("HTTP_SIGNATURES_FILE"), "HTTP_SIGNATURES_FILE")
+        cls.validate_integer(config.get("HTTP_SIGNATURES_BODY_BYTES"), "HTTP_SIGNATURES_BODY_BYTES")
+        cls.validate_integer(config.get("HTTP_BODY_CAPTURE_BYTES"), "HTTP_BODY_CAPTURE_BYTES")
+        cls.validate_integer(config.get("HTTP_BODY_MAX_BYTES"), "HTTP_BODY_MAX_BYTES")
+        cls.validate_integer(config.get("HTTP_RATE_LIMIT_RATE"), "HTTP_RATE_LIMIT_RATE")
+        cls.validate_integer(config.get("HTTP_RATE_LIMIT_BURST"), "HTTP_RATE_LIMIT_BURST")
+        cls.validate_integer(
+            config.get("HTTP_RATE_LIMIT_MAX_TRACKED"), "HTTP_RATE_LIMIT_MAX_TRACKED"
+        )
+        cls.validate_integer(
+            config.get("HTTP_RATE_LIMIT_IPV4_PREFIX"), "HTTP_RATE_LIMIT_IPV4_PREFIX"
+        )
+        cls.validate_integer(
+            config.get("HTTP_RATE_LIMIT_IPV6_PREFIX"), "HTTP_RATE_LIMIT_IPV6_PREFIX"
+        )
+        cls.validate_boolean(config.get("SERVICE_TELNET_ENABLED"), "SERVICE_TELNET_ENABLED")
+        cls.validate_integer(config.get("SERVICE_TELNET_PORT"), "SERVICE_TELNET_PORT")
+        cls.validate_boolean(config.get("SERVICE_REDIS_ENABLED"), "SERVICE_REDIS_ENABLED")
+        cls.validate_integer(config.get("SERVICE_REDIS_PORT"), "SERVICE_REDIS_PORT")
+        cls.validate_boolean(config.get("SERVICE_SMTP_ENABLED"), "SERVICE_SMTP_ENABLED")
+        cls.validate_integer(config.get("SERVICE_SMTP_PORT"), "SERVICE_SMTP_PORT")
+        cls.validate_boolean(config.get("SERVICE_BANNER_ENABLED"), "SERVICE_BANNER_ENABLED")
+        cls.validate_integer(config.get("SERVICE_BANNER_PORT"), "SERVICE_BANNER_PORT")
+        cls.validate_string(config.get("SERVICE_BANNER_TEXT"), "SERVICE_BANNER_TEXT")
+        cls.validate_positive_integer(config.get("TCP_MAX_CONNECTIONS"), "TCP_MAX_CONNECTIONS")
+        cls.validate_positive_integer(config.get("TCP_IDLE_TIMEOUT"), "TCP_IDLE_TIMEOUT")
+        cls.validate_positive_integer(config.get("TCP_BACKLOG"), "TCP_BACKLOG")
+        cls.validate_boolean(config.get("SCAN_ENABLED"), "SCAN_ENABLED")
+        cls.validate_port_list(config.get("SCAN_PORTS"), "SCAN_PORTS")
+        cls.validate_positive_integer(config.get("SCAN_WINDOW"), "SCAN_WINDOW")
+        cls.validate_positive_integer(config.get("SCAN_MAX_SAMPLES"), "SCAN_MAX_SAMPLES")
+        cls.validate_integer(config.get("SCAN_PAYLOAD_BYTES"), "SCAN_PAYLOAD_BYTES")
+        cls.validate_positive_integer(config.get("SCAN_IDLE_TIMEOUT"), "SCAN_IDLE_TIMEOUT")
+        cls.validate_string_list(config.get("SSH_HOST_KEY_TYPES"), "SSH_HOST_KEY_TYPES")
+        cls.validate_boolean(config.get("SSH_AGGREGATION_ENABLED"), "SSH_AGGREGATION_ENABLED")
+        cls.validate_positive_integer(
+            config.get("SSH_AGGREGATION_WINDOW"), "SSH_AGGREGATION_WINDOW"
+        )
+        cls.validate_positive_integer(
+            config.get("SSH_AGGREGATION_MAX_CREDENTIALS"), "SSH_AGGREGATION_MAX_CREDENTIALS"
+        )
+        cls.validate_positive_integer(config.get("SSH_MAX_CONNECTIONS"), "SSH_MAX_CONNECTIONS")
+        cls.validate_positive_integer(
+            config.get("SSH_MAX_CONNECTIONS_PER_IP"), "SSH_MAX_CONNECTIONS_PER_IP"
+        )
+        cls.validate_boolean(config.get("SSH_TARPIT_ENABLED"), "SSH_TARPIT_ENABLED")
+        cls.validate_positive_integer(config.get("SSH_TARPIT_THRESHOLD"), "SSH_TARPIT_THRESHOLD")
+        cls.validate_positive_integer(config.get("SSH_TARPIT_DELAY_MS"), "SSH_TARPIT_DELAY_MS")
+        cls.validate_positive_integer(
+            config.get("SSH_TARPIT_MAX_DELAY_MS"), "SSH_TARPIT_MAX_DELAY_MS"
+        )
+        cls.validate_positive_integer(config.get("SSH_TARPIT_WINDOW"), "SSH_TARPIT_WINDOW")
+        cls.validate_boolean(config.get("METRICS_ENABLED"), "METRICS_ENABLED")
+        cls.validate_string(config.get("METRICS_HOST"), "METRICS_HOST")
+        cls.validate_integer(config.get("METRICS_PORT"), "METRICS_PORT")
+        cls.validate_string(config.get("METRICS_DIR"), "METRICS_DIR")
+        cls.validate_positive_integer(config.get("METRICS_DUMP_INTERVAL"), "METRICS_DUMP_INTERVAL")
+        cls.validate_boolean(config.get("PROFILE_ENABLED"), "PROFILE_ENABLED")
+        cls.validate_positive_integer(config.get("PROFILE_SAMPLE_RATE"), "PROFILE_SAMPLE_RATE")
+        cls.validate_boolean(config.get("PROFILE_TRACEMALLOC"), "PROFILE_TRACEMALLOC")
+        cls.validate_integer(config.get("PROFILE_DUMP_INTERVAL"), "PROFILE_DUMP_INTERVAL")
+        cls.validate_string(config.get("PROFILE_DIR"), "PROFILE_DIR")
 
     @classmethod
     def get_config(cls) -> Dict[str, Any]:
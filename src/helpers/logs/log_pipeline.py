@@ -0,0 +1,159 @@
+import contextlib
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import MetricsRegistry
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+TEXT_FORMAT = "%(asctime)s.%(msecs)03d [%(levelname)s] %(module)s - %(funcName)s: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+LOGS_HELP = "Log records that were not written"
+
+
+class ColoredFormatter(logging.Formatter):
+    COLORS = {
+        "DEBUG": "\033[36m",  # Cyan
+        "INFO": "\033[32m",  # Green
+        "WARNING": "\033[33m",  # Yellow
+        "ERROR": "\033[31m",  # Red
+        "CRITICAL": "\033[41m",  # Red background
+    }
+
+    RESET = "\033[0m"  # Reset all colors and styles
+
+    def format(self, record):
+        # Colours a copy, other handlers share the record
+        colored_record = logging.makeLogRecord(record.__dict__)
+        levelname = record.levelname
+        seq = self.COLORS.get(levelname, self.RESET)
+        colored_record.levelname = f"{seq}{levelname}{self.RESET}"
+        return super().format(colored_record)
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line, for log shippers that parse structured logs
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, DATE_FORMAT) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "process": record.processName,
+            "module": record.module,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    # Lets through at most `rate` records per second from each logging call
+    # (e.g. the SSH 'Login attempt from %s ...' line), with bursts of up to one
+    # second's worth. The next record let through after a quiet spell
+    # reports how many were suppressed. Paramiko threads log too, hence
+    # the lock.
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self.buckets: Dict[Any, list] = {}
+        self.lock = threading.Lock()
+        self.suppressed_total = MetricsRegistry().counter(
+            "collector_log_records_dropped_total", LOGS_HELP, reason="rate_limited"
+        )
+
+    def filter(self, record):
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                # [tokens, last refill, suppressed since the last record]
+                bucket = self.buckets[key] = [float(self.rate), now, 0]
+            bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed_total.inc()
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # Never blocks the caller: records are dropped when the writer thread
+    # falls that far behind
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = MetricsRegistry().counter(
+            "collector_log_records_dropped_total", LOGS_HELP, reason="queue_full"
+        )
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.inc()
+
+
+class LogPipeline:
+    # Root logger setup for one process. With LOGGING_ASYNC the event loop
+    # and paramiko threads only format the message and put the record on a
+    # bounded queue, a listener thread does the actual writing, so a slow
+    # terminal or docker log driver cannot stall the accept loop. Threads do
+    # not survive fork, each process sets up its own.
+    def __init__(self):
+        self.handler: Optional[logging.Handler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self):
+        logger = logging.getLogger()
+        level = getattr(logging, (CONFIG.get("LOGGING_LEVEL") or "").upper(), logging.WARNING)
+        logger.setLevel(level)
+        # Drop the handlers inherited from the parent process
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+
+        output = logging.StreamHandler()
+        if CONFIG.get("LOGGING_FORMAT") == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(ColoredFormatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+
+        if CONFIG.get("LOGGING_ASYNC"):
+            log_queue = queue.Queue(CONFIG.get("LOGGING_QUEUE_SIZE"))
+            self.handler = DroppingQueueHandler(log_queue)
+            self.listener = logging.handlers.QueueListener(log_queue, output)
+            self.listener.start()
+        else:
+            self.handler = output
+
+        if CONFIG.get("LOGGING_RATE_LIMIT"):
+            self.handler.addFilter(RateLimitFilter(CONFIG.get("LOGGING_RATE_LIMIT")))
+        logger.addHandler(self.handler)
+
+    def stop(self):
+        # Writes out whatever is still queued
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+@contextlib.contextmanager
+def log_pipeline():
+    pipeline = LogPipeline()
+    pipeline.start()
+    try:
+        yield pipeline
+    finally:
+        pipeline.stop()
@@ -0,0 +1,52 @@
+from bisect import bisect_left
+from typing import Any, Dict, Sequence
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    # Fixed-bucket histogram of durations in seconds, cheap enough to observe
+    # on every event; the last slot counts values above the largest bucket
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+    def summary(self) -> str:
+        if not self.count:
+            return "no observations"
+        lines = [
+            f"count={self.count} mean={self.sum / self.count * 1000:.1f}ms "
+            f"p50<={self.quantile(0.5) * 1000:.0f}ms p99<={self.quantile(0.99) * 1000:.0f}ms"
+        ]
+        bounds = [f"<={bucket * 1000:g}ms" for bucket in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, self.counts):
+            if count:
+                lines.append(f"  {bound:>10} {count}")
+        return "\n".join(lines)
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List
+from aiohttp import web
+from .metrics_registry import render_prometheus
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def remove_snapshots(directory: str):
+    # Snapshots left over from a previous run would describe dead processes
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+
+
+class MetricsExporter:
+    # Serves the snapshots the service processes dump to METRICS_DIR, merged
+    # into one Prometheus scrape. Runs in its own process so that scrapes
+    # never compete with the pots for their event loops.
+    def __init__(self, directory: str, host: str = "127.0.0.1", port: int = 9108, stale_after: float = 60):
+        self.directory = directory
+        self.host = host
+        self.port = port
+        # Snapshots of processes that stopped dumping are left out
+        self.stale_after = stale_after
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.handle_metrics)
+        self.app.router.add_get("/metrics.json", self.handle_metrics_json)
+
+    def run(self):
+        logging.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+        web.run_app(self.app, host=self.host, port=self.port, print=None, access_log=None)
+
+    def load_snapshots(self) -> List[Dict[str, Any]]:
+        snapshots = []
+        now = time.time()
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return snapshots
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError) as error:
+                logging.warning("Failed to read metrics snapshot %s: %s", name, str(error))
+                continue
+            if now - snapshot.get("updated_at", 0) <= self.stale_after:
+                snapshots.append(snapshot)
+        return snapshots
+
+    async def handle_metrics(self, request):
+        return web.Response(
+            body=render_prometheus(self.load_snapshots()).encode("utf-8"),
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+        )
+
+    async def handle_metrics_json(self, request):
+        return web.json_response(self.load_snapshots())
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from multiprocessing import current_process
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.helpers.configuration.configuration import Configuration
+from .latency_histogram import DEFAULT_BUCKETS, LatencyHistogram
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Callback:
+    # A metric whose value is read from existing state when the snapshot is
+    # taken, so the hot path does not pay anything for it
+    __slots__ = ("function",)
+
+    def __init__(self, function: Callable[[], float]):
+        self.function = function
+
+    @property
+    def value(self) -> float:
+        return self.function()
+
+
+class MetricsRegistry:
+    # One registry per process. Every process only ever touches its own
+    # metrics from its event loop thread, so updates are plain attribute
+    # increments with no locks; processes are merged by the exporter from
+    # the snapshots each one dumps to METRICS_DIR.
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetricsRegistry, cls).__new__(cls)
+            cls._instance.metrics = {}
+        return cls._instance
+
+    def register(self, name: str, kind: str, help_text: str, labels: Dict[str, str], factory):
+        family = self.metrics.get(name)
+        if family is None:
+            family = {"type": kind, "help": help_text, "samples": {}}
+            self.metrics[name] = family
+        elif family["type"] != kind:
+            raise ValueError(f"Metric {name} is already registered as a {family['type']}")
+
+        key = tuple(sorted(labels.items()))
+        metric = family["samples"].get(key)
+        if metric is None:
+            metric = factory()
+            family["samples"][key] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, **labels) -> Counter:
+        return self.register(name, COUNTER, help_text, labels, Counter)
+
+    def gauge(self, name: str, help_text: str, **labels) -> Gauge:
+        return self.register(name, GAUGE, help_text, labels, Gauge)
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS, **labels) -> LatencyHistogram:
+        return self.register(name, HISTOGRAM, help_text, labels, lambda: LatencyHistogram(buckets))
+
+    def callback(self, name: str, kind: str, help_text: str, function, **labels) -> Callback:
+        # Re-registering replaces the function, e.g. when a service restarts
+        callback = self.register(name, kind, help_text, labels, lambda: Callback(function))
+        callback.function = function
+        return callback
+
+    def snapshot(self) -> Dict[str, Any]:
+        metrics = []
+        for name, family in self.metrics.items():
+            samples = []
+            for key, metric in family["samples"].items():
+                sample = {"labels": dict(key)}
+                if family["type"] == HISTOGRAM:
+                    sample.update(metric.snapshot())
+                else:
+                    try:
+                        sample["value"] = metric.value
+                    except Exception as error:
+                        logging.debug("Failed to read metric %s: %s", name, str(error))
+                        continue
+                samples.append(sample)
+            metrics.append(
+                {"name": name, "type": family["type"], "help": family["help"], "samples": samples}
+            )
+
+        return {
+            "process": current_process().name,
+            "pid": os.getpid(),
+            "updated_at": time.time(),
+            "metrics": metrics,
+        }
+
+
+class MetricsDumper:
+    # Periodically writes this process' snapshot to METRICS_DIR/<process>.json,
+    # replacing the file atomically so the exporter never reads half of it
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.path = os.path.join(directory, f"{current_process().name}.json")
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        while True:
+            self.dump()
+            await asyncio.sleep(self.interval)
+
+    def dump(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(MetricsRegistry().snapshot(), file)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            logging.error("Failed to write metrics: %s", str(error))
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.dump()
+
+
+def start_metrics_dumper() -> Optional[MetricsDumper]:
+    # Metrics are always counted, they are only written out with METRICS_ENABLED
+    if not CONFIG.get("METRICS_ENABLED"):
+        return None
+    dumper = MetricsDumper(CONFIG.get("METRICS_DIR"), CONFIG.get("METRICS_DUMP_INTERVAL"))
+    dumper.start()
+    return dumper
+
+
+def escape_label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Dict[str, Any], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels.items()) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(snapshots: List[Dict[str, Any]]) -> str:
+    # Merges the per-process snapshots into the Prometheus text format, each
+    # sample labelled with the process it came from
+    families: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        process = ("process", snapshot["process"])
+        for metric in snapshot["metrics"]:
+            family = families.setdefault(
+                metric["name"], {"type": metric["type"], "help": metric["help"], "lines": []}
+            )
+            for sample in metric["samples"]:
+                family["lines"].extend(render_sample(metric, sample, process))
+
+    output = []
+    for name, family in families.items():
+        output.append(f"# HELP {name} {family['help']}")
+        output.append(f"# TYPE {name} {family['type']}")
+        output.extend(family["lines"])
+    return "\n".join(output) + "\n"
+
+
+def render_sample(metric: Dict[str, Any], sample: Dict[str, Any], process: Tuple[str, str]) -> List[str]:
+    name, labels = metric["name"], sample["labels"]
+    if metric["type"] != HISTOGRAM:
+        return [f"{name}{format_labels(labels, (process,))} {format_value(sample['value'])}"]
+
+    lines = []
+    cumulative = 0
+    bounds = [format_value(bucket) for bucket in sample["buckets"]] + ["+Inf"]
+    for bound, count in zip(bounds, sample["counts"]):
+        cumulative += count
+        lines.append(
+            f"{name}_bucket{format_labels(labels, (process, ('le', bound)))} {cumulative}"
+        )
+    lines.append(f"{name}_sum{format_labels(labels, (process,))} {format_value(sample['sum'])}")
+    lines.append(f"{name}_count{format_labels(labels, (process,))} {sample['count']}")
+    return lines
@@ -0,0 +1,231 @@
+import asyncio
+from contextvars import ContextVar
+import logging
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from multiprocessing import current_process
+from typing import Any, Dict, List, Optional, Tuple
+from src.helpers.configuration.configuration import Configuration
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+# Stage path of the trace the current task or thread is in: None outside of
+# any trace, empty inside a trace that was not sampled
+CURRENT_PATH: ContextVar[Optional[Tuple[str, ...]]] = ContextVar("profiler_path", default=None)
+
+
+class NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class UnsampledStage:
+    # Marks the rest of an unsampled trace so that nested traces do not make
+    # a sampling decision of their own
+    __slots__ = ("token",)
+
+    def __enter__(self):
+        self.token = CURRENT_PATH.set(())
+        return self
+
+    def __exit__(self, *exc_info):
+        CURRENT_PATH.reset(self.token)
+        return False
+
+
+class DetachedStage:
+    # Tasks copy the current context, wrap their creation in this when the
+    # task should start its own trace instead of extending the current one
+    __slots__ = ("token",)
+
+    def __enter__(self):
+        self.token = CURRENT_PATH.set(None)
+        return self
+
+    def __exit__(self, *exc_info):
+        CURRENT_PATH.reset(self.token)
+        return False
+
+
+class Stage:
+    __slots__ = ("profiler", "path", "token", "started", "memory")
+
+    def __init__(self, profiler: "StageProfiler", path: Tuple[str, ...]):
+        self.profiler = profiler
+        self.path = path
+        self.memory = 0
+
+    def __enter__(self):
+        self.token = CURRENT_PATH.set(self.path)
+        if self.profiler.trace_memory:
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter_ns() - self.started
+        memory = tracemalloc.get_traced_memory()[0] - self.memory if self.profiler.trace_memory else 0
+        CURRENT_PATH.reset(self.token)
+        self.profiler.record(self.path, duration, memory)
+        return False
+
+
+class StageProfiler:
+    # Times the stages of the incident pipeline for 1 in PROFILE_SAMPLE_RATE
+    # incidents. A trace starts at the entry point of a service, stages
+    # entered while it is active nest under it; outside a sampled trace a
+    # stage costs one context variable lookup. Totals are kept per stage path
+    # and dumped as collapsed stacks (flamegraph.pl / speedscope input) and a
+    # summary table on SIGUSR1 or every PROFILE_DUMP_INTERVAL seconds.
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(StageProfiler, cls).__new__(cls)
+            cls._instance.enabled = CONFIG.get("PROFILE_ENABLED")
+            cls._instance.sample_rate = CONFIG.get("PROFILE_SAMPLE_RATE")
+            cls._instance.trace_memory = CONFIG.get("PROFILE_TRACEMALLOC")
+            cls._instance.calls = {}
+            cls._instance.stats = {}
+            cls._instance.lock = threading.Lock()
+            cls._instance.dump_task = None
+        return cls._instance
+
+    def trace(self, name: str):
+        if not self.enabled:
+            return NULL_STAGE
+        path = CURRENT_PATH.get()
+        if path is not None:
+            return Stage(self, path + (name,)) if path else NULL_STAGE
+
+        # Sampled per entry point so that traces starting together do not
+        # always sample the same one. Not thread safe, an occasional lost
+        # increment only skews sampling
+        calls = self.calls.get(name, 0) + 1
+        self.calls[name] = calls
+        if calls % self.sample_rate:
+            return UnsampledStage()
+        return Stage(self, (name,))
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return NULL_STAGE
+        path = CURRENT_PATH.get()
+        if not path:
+            return NULL_STAGE
+        return Stage(self, path + (name,))
+
+    def detach(self):
+        if not self.enabled:
+            return NULL_STAGE
+        return DetachedStage()
+
+    def record(self, path: Tuple[str, ...], duration: int, memory: int):
+        # Paramiko threads record stages too
+        with self.lock:
+            entry = self.stats.get(path)
+            if entry is None:
+                entry = self.stats[path] = [0, 0, 0]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] += memory
+
+    def self_times(self) -> Dict[Tuple[str, ...], int]:
+        # Time spent in a stage minus the time spent in the stages nested in it
+        with self.lock:
+            stats = {path: list(entry) for path, entry in self.stats.items()}
+        self_times = {path: entry[1] for path, entry in stats.items()}
+        for path, entry in stats.items():
+            if len(path) > 1 and path[:-1] in self_times:
+                self_times[path[:-1]] -= entry[1]
+        return self_times
+
+    def collapsed(self) -> str:
+        # One "root;stage;substage <microseconds>" line per stage path
+        lines = [
+            f"{';'.join(path)} {max(0, duration) // 1000}"
+            for path, duration in sorted(self.self_times().items())
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def summary(self) -> str:
+        with self.lock:
+            stats = sorted((path, list(entry)) for path, entry in self.stats.items())
+        if not stats:
+            return "no samples"
+
+        self_times = self.self_times()
+        total = sum(max(0, duration) for duration in self_times.values()) or 1
+        lines = [
+            f"{'stage':<40} {'samples':>8} {'total ms':>10} {'mean us':>9} {'self %':>7}"
+            + (f" {'mem/call':>10}" if self.trace_memory else "")
+        ]
+        for path, (count, duration, memory) in stats:
+            name = "  " * (len(path) - 1) + path[-1]
+            line = (
+                f"{name:<40} {count:>8} {duration / 1e6:>10.2f} {duration / count / 1e3:>9.1f} "
+                f"{max(0, self_times[path]) / total * 100:>6.1f}%"
+            )
+            if self.trace_memory:
+                line += f" {memory // count:>9}B"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def dump(self) -> List[str]:
+        directory = CONFIG.get("PROFILE_DIR")
+        name = current_process().name
+        paths = [
+            os.path.join(directory, f"{name}.collapsed"),
+            os.path.join(directory, f"{name}.txt"),
+        ]
+        summary = self.summary()
+        logging.info("Pipeline profile (1 in %s incidents):\n%s", self.sample_rate, summary)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(paths[0], "w", encoding="utf-8") as file:
+                file.write(self.collapsed())
+            with open(paths[1], "w", encoding="utf-8") as file:
+                file.write(summary + "\n")
+        except OSError as error:
+            logging.error("Failed to write pipeline profile: %s", str(error))
+        return paths
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, "SIGUSR1"):
+            loop.add_signal_handler(signal.SIGUSR1, self.dump)
+        if CONFIG.get("PROFILE_DUMP_INTERVAL"):
+            self.dump_task = loop.create_task(self.run_dumps(CONFIG.get("PROFILE_DUMP_INTERVAL")))
+
+    async def run_dumps(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            self.dump()
+
+    def close(self):
+        if not self.enabled:
+            return
+        if self.dump_task is not None:
+            self.dump_task.cancel()
+            self.dump_task = None
+        self.dump()
@@ -0,0 +1,65 @@
+import gzip
+import logging
+from typing import Any, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - gzip is used instead
+    zstandard = None
+
+COMPRESSIONS = ("gzip", "zstd", "none")
+
+
+class BatchEncoder:
+    # Frames a batch of encoded incidents as newline-delimited JSON and
+    # compresses it, keeping track of how much the compression saves
+    content_type = "application/x-ndjson"
+
+    def __init__(self, compression: str = "gzip", level: Optional[int] = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported API compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            logging.warning("zstandard is not installed, compressing batches with gzip")
+            compression = "gzip"
+
+        self.compression = compression
+        if compression == "gzip":
+            self.level = 6 if level is None else level
+        elif compression == "zstd":
+            self.level = 3 if level is None else level
+            self.compressor = zstandard.ZstdCompressor(level=self.level)
+        else:
+            self.level = None
+
+        self.batches = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+
+    @property
+    def content_encoding(self) -> Optional[str]:
+        return None if self.compression == "none" else self.compression
+
+    def encode(self, batch: List[bytes]) -> bytes:
+        body = b"\n".join(batch) + b"\n"
+        if self.compression == "gzip":
+            encoded = gzip.compress(body, compresslevel=self.level)
+        elif self.compression == "zstd":
+            encoded = self.compressor.compress(body)
+        else:
+            encoded = body
+
+        self.batches += 1
+        self.raw_bytes += len(body)
+        self.encoded_bytes += len(encoded)
+        return encoded
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "raw_bytes": self.raw_bytes,
+            "encoded_bytes": self.encoded_bytes,
+            "bytes_saved": self.raw_bytes - self.encoded_bytes,
+            "compression_ratio": (
+                self.raw_bytes / self.encoded_bytes if self.encoded_bytes else 0.0
+            ),
+        }
@@ -0,0 +1,72 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Iterable
+from .incident_record import IncidentRecord, encode_json
+
+# Metadata fields that scanners replay verbatim across incidents
+BLOB_FIELDS = ("payload", "headers")
+
+
+class BlobCache:
+    # LRU of the digests of metadata blobs the API has acknowledged. A blob is
+    # sent in full, with its digest under metadata["blobs"], until an incident
+    # carrying it got a 201; after that incidents only reference it through
+    # metadata["blob_refs"].
+    def __init__(self, max_entries: int, fields: Iterable[str] = BLOB_FIELDS):
+        self.max_entries = max_entries
+        self.fields = tuple(fields)
+        self.acknowledged: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def encode(self, record: IncidentRecord) -> bytes:
+        data = record.to_dict()
+        metadata = dict(data["metadata"])
+        blobs: Dict[str, str] = {}
+        blob_refs: Dict[str, str] = {}
+
+        for field in self.fields:
+            value = metadata.get(field)
+            if not value:
+                continue
+            blob = encode_json(value)
+            digest = hashlib.sha256(blob).hexdigest()
+            if digest in self.acknowledged:
+                self.acknowledged.move_to_end(digest)
+                self.hits += 1
+                self.bytes_saved += len(blob)
+                metadata[field] = None
+                blob_refs[field] = digest
+            else:
+                self.misses += 1
+                blobs[field] = digest
+
+        if blobs:
+            metadata["blobs"] = blobs
+        if blob_refs:
+            metadata["blob_refs"] = blob_refs
+        data["metadata"] = metadata
+        return encode_json(data)
+
+    def acknowledge(self, payload: bytes):
+        # Called with every document the API accepted
+        blobs = json.loads(payload).get("metadata", {}).get("blobs")
+        if not blobs:
+            return
+        for digest in blobs.values():
+            self.acknowledged[digest] = True
+            self.acknowledged.move_to_end(digest)
+        while len(self.acknowledged) > self.max_entries:
+            self.acknowledged.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.acknowledged),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
@@ -0,0 +1,178 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric value of each circuit state in the metrics
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Rate of the moving averages exposed for monitoring
+EWMA_ALPHA = 0.1
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeliveryController:
+    # Decides when and how many requests the shipper sends to the API.
+    #
+    # A circuit breaker opens after `failures` failed requests in a row and
+    # fails fast for a cooldown that doubles (with jitter) every time it
+    # opens again, up to `max_cooldown`. Then a single half-open probe
+    # decides whether it closes or opens again.
+    #
+    # While closed, the number of requests in flight is limited AIMD style:
+    # the limit grows by one per window of requests answered successfully
+    # within `latency_target`, and halves on a failed or slow request, at
+    # most once per round trip.
+    def __init__(
+        self,
+        max_concurrency: int,
+        latency_target: float,
+        failures: int,
+        cooldown: float,
+        max_cooldown: float,
+        retry_backoff: float,
+        clock=time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.failure_threshold = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.retry_backoff = retry_backoff
+        self.clock = clock
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened = 0
+        self.open_until = 0.0
+        self.probing = False
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.waiters = deque()
+
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.rejected = 0
+        self.opened_total = 0
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: anywhere between nothing and the exponential delay
+        return random.uniform(0, min(self.max_cooldown, self.retry_backoff * 2**attempt))
+
+    def retry_in(self) -> float:
+        # Seconds until the open circuit lets a probe through
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_until - self.clock())
+
+    async def acquire(self) -> float:
+        # Waits for a slot and returns the start time to hand to release, or
+        # raises CircuitOpenError without waiting when requests would fail
+        if self.state == OPEN and self.clock() >= self.open_until:
+            self.state = HALF_OPEN
+        if self.state == OPEN or (self.state == HALF_OPEN and self.probing):
+            self.rejected += 1
+            raise CircuitOpenError()
+        if self.state == HALF_OPEN:
+            self.probing = True
+            self.in_flight += 1
+            return self.clock()
+
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass the wake up on to the next waiter
+                if waiter.done() and not waiter.cancelled():
+                    self.wake()
+                raise
+            finally:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+            if self.state != CLOSED:
+                self.rejected += 1
+                raise CircuitOpenError()
+        self.in_flight += 1
+        return self.clock()
+
+    def release(self, started: float, success: bool):
+        now = self.clock()
+        latency = now - started
+        self.in_flight -= 1
+        self.latency += EWMA_ALPHA * (latency - self.latency)
+        self.error_rate += EWMA_ALPHA * ((0.0 if success else 1.0) - self.error_rate)
+
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if success:
+                self.close_circuit()
+            else:
+                self.open_circuit(now)
+        elif success:
+            self.consecutive_failures = 0
+            if latency <= self.latency_target:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            else:
+                self.decrease(started, now)
+        else:
+            self.consecutive_failures += 1
+            self.decrease(started, now)
+            # Requests still in flight when the circuit opened don't reopen it
+            if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.open_circuit(now)
+        self.wake()
+
+    def decrease(self, started: float, now: float):
+        # Requests sent before the last decrease saw the old limit
+        if started >= self.last_decrease:
+            self.limit = max(1.0, self.limit / 2)
+            self.last_decrease = now
+
+    def open_circuit(self, now: float):
+        cooldown = min(self.max_cooldown, self.base_cooldown * 2**self.opened)
+        self.state = OPEN
+        self.opened += 1
+        self.opened_total += 1
+        self.open_until = now + random.uniform(cooldown / 2, cooldown)
+        # Whoever is waiting fails fast instead of piling up behind the outage
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def close_circuit(self):
+        self.state = CLOSED
+        self.opened = 0
+        self.consecutive_failures = 0
+        self.limit = 1.0
+
+    def wake(self):
+        available = int(self.limit) - self.in_flight
+        for waiter in self.waiters:
+            if available <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+            "rejected": self.rejected,
+            "opened": self.opened_total,
+        }
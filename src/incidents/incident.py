@@ -1,74 +1,67 @@
-from datetime import datetime
-import ipaddress
 import logging
 from typing import Any, Dict
-import aiohttp
 from src.helpers.configuration.configuration import Configuration
-from .incident_type_enum import IncidentType
+from src.helpers.metrics.metrics_registry import MetricsRegistry
+from src.helpers.metrics.stage_profiler import StageProfiler
+from .incident_record import IncidentRecord
+from .incident_forwarder import get_shipper, store_enabled
+from .ip_enricher import IPEnricher
 
 CONFIG: Dict[str, Any] = Configuration().get_config()
 
+INCIDENTS_HELP = "Incidents seen at each stage of the pipeline"
+INCIDENTS_CREATED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="created")
+INCIDENTS_VALIDATED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="validated")
+INCIDENTS_INVALID = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="invalid")
+INCIDENTS_DROPPED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="dropped")
+
 
 class Incident:
     def __init__(self, data=None):
+        # Either an IncidentRecord (already validated) or a plain dict
         self.data = data
+        self.record = None
 
     async def create(self):
-        logging.info(self.data)
-        self.validate()
-        if not CONFIG.get("API_ENABLED"):
-            return None
+        with StageProfiler().trace("incident"):
+            INCIDENTS_CREATED.inc()
+            with StageProfiler().stage("log"):
+                logging.debug("Incident: %s", self.data)
+            try:
+                with StageProfiler().stage("validate"):
+                    self.validate()
+            except ValueError:
+                INCIDENTS_INVALID.inc()
+                raise
+            INCIDENTS_VALIDATED.inc()
+            if CONFIG.get("ENRICHMENT_ENABLED"):
+                with StageProfiler().stage("enrich"):
+                    await IPEnricher().enrich(self.record)
+            if store_enabled():
+                with StageProfiler().stage("store"):
+                    get_shipper().enqueue(self.record)
+                return None
+            if not CONFIG.get("API_ENABLED"):
+                return None
 
-        await self.send_to_api()
+            with StageProfiler().stage("enqueue"):
+                await self.send_to_api()
 
     def validate(self):
         if not self.data:
             raise ValueError("Data is None. Please provide valid data.")
 
-        required_keys = ["ip_address", "incident_type", "metadata", "happened_at"]
-
-        missing_keys = [key for key in required_keys if key not in self.data]
-        if missing_keys:
-            raise ValueError(
-                f"Invalid data - missing required key(s): {', '.join(missing_keys)}"
-            )
-
-        # Check IP address format
-        try:
-            ipaddress.ip_address(self.data["ip_address"])
-        except ValueError as exc:
-            raise ValueError("Invalid IP address format.") from exc
-
-        # Check incident_type is a valid enum value
-        if self.data["incident_type"] not in [
-            incident_type.value for incident_type in IncidentType
-        ]:
-            raise ValueError("Invalid incident type.")
-
-        # Check happened_at is a valid date in ISO format
-        try:
-            datetime.fromisoformat(self.data["happened_at"])
-        except ValueError as exc:
-            raise ValueError("Invalid date format. Must be in ISO format.") from exc
+        if isinstance(self.data, IncidentRecord):
+            self.record = self.data
+        else:
+            self.record = IncidentRecord.from_dict(self.data)
 
     async def send_to_api(self):
         if not CONFIG.get("API_TOKEN") or not CONFIG.get("API_POST_URL") or not CONFIG.get("COLLECTOR_ID"):
             logging.error(
                         "Missing arguments: API_TOKEN, API_POST_URL and COLLECTOR_ID must all be set up",
                     )
+            INCIDENTS_DROPPED.inc()
             return None
-        self.data['collector_name'] = CONFIG.get("COLLECTOR_ID")
-        print(self.data)
-        headers = {"authorization": f"Bearer {CONFIG.get('API_TOKEN')}"}
-        timeout = aiohttp.ClientTimeout(total=5)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(
-                url=CONFIG.get("API_POST_URL"),
-                headers=headers,
-                json=self.data,
-            ) as response:
-                if response.status != 201:
-                    logging.error(
-                        "Failed to send incident to API, status code: %s",
-                        response.status,
-                    )
+        self.record.collector_name = CONFIG.get("COLLECTOR_ID")
+        get_shipper().enqueue(self.record)
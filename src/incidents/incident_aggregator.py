@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class AggregateBucket:
+    __slots__ = (
+        "ip_address",
+        "incident_type",
+        "first_seen",
+        "last_seen",
+        "attempts",
+        "samples",
+        "dropped_samples",
+        "handle",
+    )
+
+    def __init__(self, ip_address: str, incident_type: str, happened_at: str):
+        self.ip_address = ip_address
+        self.incident_type = incident_type
+        self.first_seen = happened_at
+        self.last_seen = happened_at
+        self.attempts = 0
+        # sample -> number of times it was seen, in first-seen order
+        self.samples: Dict[Hashable, int] = {}
+        self.dropped_samples = 0
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class IncidentAggregator:
+    # Folds repeated events from the same (ip_address, incident_type) into a
+    # single bucket per `window` seconds, counted from the first event. Distinct
+    # samples are deduplicated and capped at `max_samples`; when the window
+    # closes the bucket is handed to `emit`.
+    def __init__(
+        self,
+        window: float,
+        max_samples: int,
+        emit: Callable[[AggregateBucket], Any],
+    ):
+        self.window = window
+        self.max_samples = max_samples
+        self.emit = emit
+        self.buckets: Dict[Tuple[str, str], AggregateBucket] = {}
+
+    def add(
+        self,
+        ip_address: str,
+        incident_type: str,
+        sample: Hashable,
+        happened_at: Optional[str] = None,
+    ) -> AggregateBucket:
+        happened_at = happened_at or datetime.now().isoformat()
+        key = (ip_address, incident_type)
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = AggregateBucket(ip_address, incident_type, happened_at)
+            bucket.handle = asyncio.get_running_loop().call_later(
+                self.window, self.flush_key, key
+            )
+            self.buckets[key] = bucket
+
+        bucket.attempts += 1
+        bucket.last_seen = happened_at
+        if sample in bucket.samples:
+            bucket.samples[sample] += 1
+        elif len(bucket.samples) < self.max_samples:
+            bucket.samples[sample] = 1
+        else:
+            bucket.dropped_samples += 1
+
+        return bucket
+
+    def flush_key(self, key: Tuple[str, str]):
+        bucket = self.buckets.pop(key, None)
+        if bucket is not None:
+            bucket.handle.cancel()
+            self.emit(bucket)
+
+    def flush(self):
+        for key in list(self.buckets):
+            self.flush_key(key)
@@ -0,0 +1,170 @@
+import asyncio
+from collections import deque
+import logging
+import socket
+import struct
+from typing import Any, Dict, Optional
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import GAUGE, MetricsRegistry
+from src.helpers.metrics.stage_profiler import StageProfiler
+from .incident_record import IncidentRecord
+from .incident_shipper import IncidentShipper
+from .incident_store import IncidentStore
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+# Every frame on the shipper socket is a big-endian length followed by one
+# JSON encoded incident
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# Frames written to the socket in one go
+WRITE_BATCH = 256
+
+# How long close() keeps trying to hand over queued incidents
+CLOSE_TIMEOUT = 5
+
+INCIDENTS_DROPPED = MetricsRegistry().counter(
+    "collector_incidents_total", "Incidents seen at each stage of the pipeline", stage="dropped"
+)
+
+
+def shipper_process_enabled() -> bool:
+    # Nothing is shipped with the API disabled, so there is no need for one
+    return (
+        CONFIG.get("SHIPPER_PROCESS_ENABLED")
+        and CONFIG.get("API_ENABLED")
+        and hasattr(socket, "AF_UNIX")
+    )
+
+
+def store_enabled() -> bool:
+    # The local store keeps what would otherwise be thrown away
+    return CONFIG.get("STORE_ENABLED") and not CONFIG.get("API_ENABLED")
+
+
+def get_shipper():
+    # Service processes hand their incidents to the shipper process when
+    # there is one, and ship them themselves otherwise. Without the API
+    # they go to the local store, if enabled.
+    if store_enabled():
+        return IncidentStore()
+    if shipper_process_enabled():
+        return IncidentForwarder()
+    return IncidentShipper()
+
+
+class IncidentForwarder:
+    # Stands in for the IncidentShipper in the service processes: incidents
+    # are encoded here and written to the shipper process over a Unix socket.
+    # Up to SHIPPER_FORWARD_QUEUE incidents wait in memory while the shipper
+    # is not connected or not reading fast enough, then the oldest are dropped.
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(IncidentForwarder, cls).__new__(cls)
+            cls._instance.queue = deque()
+            cls._instance.loop = None
+            cls._instance.task = None
+            cls._instance.wakeup = None
+            cls._instance.closing = False
+            MetricsRegistry().callback(
+                "collector_forwarder_queue_depth",
+                GAUGE,
+                "Incidents waiting to be handed to the shipper process",
+                lambda: len(cls._instance.queue),
+            )
+        return cls._instance
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+
+        self.loop = loop
+        self.closing = False
+        self.wakeup = asyncio.Event()
+        self.task = loop.create_task(self.run())
+
+    def enqueue(self, record: IncidentRecord):
+        self.start()
+        with StageProfiler().stage("encode"):
+            payload = record.to_json()
+
+        if len(self.queue) >= CONFIG.get("SHIPPER_FORWARD_QUEUE"):
+            self.queue.popleft()
+            INCIDENTS_DROPPED.inc()
+        self.queue.append(payload)
+        self.wakeup.set()
+
+    async def connect(self) -> Optional[asyncio.StreamWriter]:
+        backoff = 0.1
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(CONFIG.get("SHIPPER_SOCKET"))
+                return writer
+            except OSError as error:
+                if self.closing:
+                    logging.error("Shipper process is not reachable: %s", str(error))
+                    return None
+                logging.debug("Waiting for the shipper process: %s", str(error))
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 2)
+
+    async def run(self):
+        writer = None
+        try:
+            while True:
+                if not self.queue:
+                    if self.closing:
+                        return
+                    await self.wakeup.wait()
+                    self.wakeup.clear()
+                    continue
+
+                if writer is None:
+                    writer = await self.connect()
+                    if writer is None:
+                        return
+
+                count = min(len(self.queue), WRITE_BATCH)
+                frames = [self.queue.popleft() for _ in range(count)]
+                try:
+                    writer.write(
+                        b"".join(FRAME_HEADER.pack(len(frame)) + frame for frame in frames)
+                    )
+                    # Waits while the shipper process is not keeping up
+                    await writer.drain()
+                except OSError as error:
+                    # The frames may or may not have reached the shipper, they
+                    # are requeued and sent again over a new connection
+                    logging.error("Lost connection to the shipper process: %s", str(error))
+                    self.queue.extendleft(reversed(frames))
+                    writer.close()
+                    writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+
+    async def close(self):
+        if self.task is None:
+            return
+        self.closing = True
+        self.wakeup.set()
+        try:
+            await asyncio.wait_for(self.task, CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        if self.queue:
+            logging.error(
+                "Dropping %s incidents the shipper process did not take", len(self.queue)
+            )
+            INCIDENTS_DROPPED.inc(len(self.queue))
+            self.queue.clear()
+        self.task = None
+        self.loop = None
@@ -0,0 +1,153 @@
+import asyncio
+from collections import OrderedDict, deque
+import logging
+from typing import Any, Awaitable, Callable, Deque, Optional, Set, Tuple
+from src.helpers.metrics.metrics_registry import GAUGE, MetricsRegistry
+from src.helpers.metrics.stage_profiler import StageProfiler
+
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+FAIR_SHARE = "fair_share"
+
+SHED_HELP = "Incidents shed by the incident queue before they were created"
+
+# How long close() keeps creating the incidents still queued
+CLOSE_TIMEOUT = 5
+
+
+class IncidentQueue:
+    # Bounded queue between the services and incident creation. At most
+    # `workers` incidents are created concurrently; when `size` incidents are
+    # waiting the policy decides what is shed:
+    #   drop_newest  rejects the incoming incident
+    #   drop_oldest  evicts the oldest waiting incident
+    #   fair_share   gives every source IP an equal share of the queue: an IP
+    #                over its share has its own incident rejected, otherwise
+    #                the oldest incident of the busiest IP is evicted. Waiting
+    #                IPs are also served round-robin.
+    def __init__(self, service: str, size: int, workers: int, policy: str):
+        self.size = size
+        self.workers = workers
+        self.policy = policy
+        # Waiting incidents per source IP (a single None key unless fair_share)
+        self.queues: "OrderedDict[Optional[str], Deque[Tuple[Callable, tuple]]]" = OrderedDict()
+        self.length = 0
+        self.busiest: Optional[str] = None
+        self.active = 0
+        self.tasks: Set[asyncio.Task] = set()
+        self.closing = False
+
+        registry = MetricsRegistry()
+        self.rejected = registry.counter(
+            "collector_incident_queue_shed_total", SHED_HELP, service=service, reason="rejected"
+        )
+        self.evicted = registry.counter(
+            "collector_incident_queue_shed_total", SHED_HELP, service=service, reason="evicted"
+        )
+        self.abandoned = registry.counter(
+            "collector_incident_queue_shed_total", SHED_HELP, service=service, reason="shutdown"
+        )
+        registry.callback(
+            "collector_incident_queue_depth",
+            GAUGE,
+            "Incidents waiting to be created",
+            lambda: self.length,
+            service=service,
+        )
+        registry.callback(
+            "collector_incident_queue_active",
+            GAUGE,
+            "Incidents currently being created",
+            lambda: self.active,
+            service=service,
+        )
+
+    def submit(self, ip_address: str, function: Callable[..., Awaitable[Any]], *args) -> bool:
+        # Must be called from the event loop thread
+        if self.closing:
+            self.abandoned.inc()
+            return False
+
+        key = ip_address if self.policy == FAIR_SHARE else None
+        if self.length >= self.size and not self.make_room(key):
+            self.rejected.inc()
+            return False
+
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = deque()
+        queue.append((function, args))
+        self.length += 1
+        if self.busiest not in self.queues or len(queue) > len(self.queues[self.busiest]):
+            self.busiest = key
+
+        if self.active < self.workers:
+            self.active += 1
+            # Workers run many incidents, each starts its own trace
+            with StageProfiler().detach():
+                task = asyncio.get_running_loop().create_task(self.work())
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return True
+
+    def make_room(self, key: Optional[str]) -> bool:
+        if self.policy == DROP_NEWEST:
+            return False
+
+        victim = key
+        if self.policy == FAIR_SHARE:
+            share = self.size / (len(self.queues) + (key not in self.queues))
+            if len(self.queues.get(key, ())) >= share:
+                return False
+            # The busiest IP is tracked on submit, it goes stale as its
+            # incidents are taken
+            victim = self.busiest
+            if victim not in self.queues or len(self.queues[victim]) < share:
+                victim = max(self.queues, key=lambda queued: len(self.queues[queued]))
+                self.busiest = victim
+
+        self.pop(victim)
+        self.evicted.inc()
+        return True
+
+    def pop(self, key: Optional[str]):
+        queue = self.queues[key]
+        item = queue.popleft()
+        self.length -= 1
+        if not queue:
+            del self.queues[key]
+        return item
+
+    def take(self):
+        # Round-robin over the waiting IPs
+        key = next(iter(self.queues))
+        item = self.pop(key)
+        if key in self.queues:
+            self.queues.move_to_end(key)
+        return item
+
+    async def work(self):
+        try:
+            while self.queues:
+                function, args = self.take()
+                try:
+                    await function(*args)
+                except Exception as error:
+                    logging.error("Failed to create incident: %s", str(error))
+                # Incident creation rarely suspends, let the accept loop run
+                await asyncio.sleep(0)
+        finally:
+            self.active -= 1
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT):
+        # Creates what is already queued, within `timeout` seconds
+        self.closing = True
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=timeout)
+        for task in list(self.tasks):
+            task.cancel()
+        if self.length:
+            logging.error("Dropping %s incidents that were not created in time", self.length)
+            self.abandoned.inc(self.length)
+            self.queues.clear()
+            self.length = 0
@@ -0,0 +1,103 @@
+from datetime import datetime
+from functools import lru_cache
+import ipaddress
+import json
+from typing import Any, Dict, Optional, Union
+from .incident_type_enum import IncidentType
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder is used instead
+    orjson = None
+
+INCIDENT_TYPES = frozenset(incident_type.value for incident_type in IncidentType)
+REQUIRED_KEYS = ("ip_address", "incident_type", "metadata", "happened_at")
+
+
+@lru_cache(maxsize=4096)
+def is_valid_ip_address(value) -> bool:
+    # Floods come from a handful of addresses, so parsing is mostly a cache hit
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def encode_json(data: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # orjson refuses str subclasses as keys (multidict's istr header
+            # names for one), the stdlib encoder takes them
+            pass
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+class IncidentRecord:
+    # Validated once at construction; services build records directly so the
+    # timestamp stays a datetime until it is serialized
+    __slots__ = ("ip_address", "incident_type", "happened_at", "metadata", "collector_name")
+
+    def __init__(
+        self,
+        ip_address: str,
+        incident_type: str,
+        happened_at: Union[datetime, str],
+        metadata: Dict[str, Any],
+        collector_name: Optional[str] = None,
+    ):
+        if not is_valid_ip_address(ip_address):
+            raise ValueError("Invalid IP address format.")
+
+        if incident_type not in INCIDENT_TYPES:
+            raise ValueError("Invalid incident type.")
+
+        if isinstance(happened_at, str):
+            try:
+                datetime.fromisoformat(happened_at)
+            except ValueError as exc:
+                raise ValueError("Invalid date format. Must be in ISO format.") from exc
+        elif not isinstance(happened_at, datetime):
+            raise ValueError("Invalid date format. Must be in ISO format.")
+
+        self.ip_address = ip_address
+        self.incident_type = incident_type
+        self.happened_at = happened_at
+        self.metadata = metadata
+        self.collector_name = collector_name
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IncidentRecord":
+        missing_keys = [key for key in REQUIRED_KEYS if key not in data]
+        if missing_keys:
+            raise ValueError(
+                f"Invalid data - missing required key(s): {', '.join(missing_keys)}"
+            )
+
+        return cls(
+            data["ip_address"],
+            data["incident_type"],
+            data["happened_at"],
+            data["metadata"],
+            data.get("collector_name"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        happened_at = self.happened_at
+        data = {
+            "ip_address": self.ip_address,
+            "incident_type": self.incident_type,
+            "happened_at": happened_at if isinstance(happened_at, str) else happened_at.isoformat(),
+            "metadata": self.metadata,
+        }
+        if self.collector_name is not None:
+            data["collector_name"] = self.collector_name
+        return data
+
+    def to_json(self) -> bytes:
+        return encode_json(self.to_dict())
+
+    def __repr__(self):
+        return repr(self.to_dict())
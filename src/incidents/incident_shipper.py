@@ -0,0 +1,399 @@
+import asyncio
+import logging
+import os
+from multiprocessing import current_process
+from typing import Any, Dict, List, Optional, Tuple
+import aiohttp
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import COUNTER, GAUGE, MetricsRegistry
+from src.helpers.metrics.stage_profiler import StageProfiler
+from .batch_encoder import BatchEncoder
+from .blob_cache import BlobCache
+from .delivery_controller import STATE_VALUES, CircuitOpenError, DeliveryController
+from .incident_record import IncidentRecord
+from .incident_spool import IncidentSpool, IncidentSpoolReplayer
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+# How often the shipping statistics are written to the log
+STATS_LOG_INTERVAL = 300
+
+# Answers meaning the API does not understand batches, as opposed to failing
+BATCH_UNSUPPORTED_STATUSES = (400, 404, 405, 406, 415, 501)
+
+# Answers worth sending the same request again for
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+INCIDENTS_HELP = "Incidents seen at each stage of the pipeline"
+INCIDENTS_SHIPPED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="shipped")
+INCIDENTS_FAILED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="failed")
+INCIDENTS_DROPPED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="dropped")
+API_LATENCY_HELP = "Duration of requests to the API in seconds"
+API_LATENCY_BATCH = MetricsRegistry().histogram("collector_api_request_seconds", API_LATENCY_HELP, kind="batch")
+API_LATENCY_SINGLE = MetricsRegistry().histogram("collector_api_request_seconds", API_LATENCY_HELP, kind="single")
+API_RETRIES = MetricsRegistry().counter("collector_api_retries_total", "Requests to the API sent again after a failure")
+
+
+def create_delivery_controller() -> DeliveryController:
+    return DeliveryController(
+        max_concurrency=CONFIG.get("API_POOL_SIZE"),
+        latency_target=CONFIG.get("API_LATENCY_TARGET_MS") / 1000,
+        failures=CONFIG.get("API_BREAKER_FAILURES"),
+        cooldown=CONFIG.get("API_BREAKER_COOLDOWN_MS") / 1000,
+        max_cooldown=CONFIG.get("API_BREAKER_MAX_COOLDOWN_MS") / 1000,
+        retry_backoff=CONFIG.get("API_RETRY_BACKOFF_MS") / 1000,
+    )
+
+
+def register_delivery_metrics(shipper):
+    MetricsRegistry().callback(
+        "collector_api_circuit_state",
+        GAUGE,
+        "State of the API circuit breaker: 0 closed, 1 half open, 2 open",
+        lambda: STATE_VALUES[shipper.delivery.state],
+    )
+    MetricsRegistry().callback(
+        "collector_api_circuit_opened_total",
+        COUNTER,
+        "Times the API circuit breaker opened",
+        lambda: shipper.delivery.opened_total,
+    )
+    MetricsRegistry().callback(
+        "collector_api_requests_rejected_total",
+        COUNTER,
+        "Requests to the API not sent because the circuit breaker was open",
+        lambda: shipper.delivery.rejected,
+    )
+    MetricsRegistry().callback(
+        "collector_api_concurrency_limit",
+        GAUGE,
+        "Requests to the API currently allowed in flight",
+        lambda: shipper.delivery.limit,
+    )
+    MetricsRegistry().callback(
+        "collector_api_in_flight",
+        GAUGE,
+        "Requests to the API currently in flight",
+        lambda: shipper.delivery.in_flight,
+    )
+
+
+class IncidentShipper:
+    # Owns a keep-alive connection pool towards the API and buffers encoded
+    # incidents, flushing them when API_BATCH_SIZE incidents are pending or
+    # every API_FLUSH_INTERVAL_MS milliseconds, whichever comes first. With
+    # SPOOL_ENABLED the buffer is an on-disk spool drained by a replayer.
+    # Runs in the shipper process, or in each service process when
+    # SHIPPER_PROCESS_ENABLED is off.
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(IncidentShipper, cls).__new__(cls)
+            cls._instance.buffer = []
+            cls._instance.session = None
+            cls._instance.loop = None
+            cls._instance.flush_timer = None
+            cls._instance.flush_tasks = set()
+            cls._instance.capacity = None
+            cls._instance.spool = None
+            cls._instance.stats_timer = None
+            cls._instance.blob_cache = None
+            if CONFIG.get("PAYLOAD_DEDUP_ENABLED"):
+                cls._instance.blob_cache = BlobCache(CONFIG.get("PAYLOAD_DEDUP_CACHE_SIZE"))
+            cls._instance.batch_encoder = None
+            cls._instance.batch_retry_at = 0.0
+            cls._instance.delivery = create_delivery_controller()
+            register_delivery_metrics(cls._instance)
+            if CONFIG.get("API_BATCH_FORMAT") == "ndjson":
+                cls._instance.batch_encoder = BatchEncoder(
+                    CONFIG.get("API_COMPRESSION"), CONFIG.get("API_COMPRESSION_LEVEL")
+                )
+            MetricsRegistry().callback(
+                "collector_shipper_queue_depth",
+                GAUGE,
+                "Incidents buffered in memory waiting to be shipped",
+                lambda: len(cls._instance.buffer),
+            )
+        return cls._instance
+
+    def encode(self, record: IncidentRecord) -> bytes:
+        if self.blob_cache is None:
+            return record.to_json()
+        return self.blob_cache.encode(record)
+
+    def enqueue(self, record: IncidentRecord):
+        with StageProfiler().stage("encode"):
+            payload = self.encode(record)
+        self.enqueue_payload(payload)
+
+    def enqueue_payload(self, payload: bytes):
+        # Takes an already encoded incident, as handed over by the services
+        # to the shipper process
+        self.start()
+        if self.spool is not None:
+            try:
+                with StageProfiler().stage("spool_append"):
+                    self.spool.append(payload)
+            except OSError as error:
+                INCIDENTS_DROPPED.inc()
+                logging.error("Failed to spool incident: %s", str(error))
+            return
+
+        self.buffer.append(payload)
+
+        if len(self.buffer) >= CONFIG.get("API_BATCH_SIZE"):
+            # The flush is profiled as a trace of its own, not as part of
+            # the incident that happened to fill the batch
+            with StageProfiler().detach():
+                task = self.loop.create_task(self.flush())
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_done)
+
+    def flush_done(self, task: asyncio.Task):
+        self.flush_tasks.discard(task)
+        self.notify_capacity()
+
+    def backlogged(self) -> bool:
+        # Delivery is not keeping up: the delivery controller has as many
+        # batches as it lets in flight, or the spool would drop its oldest
+        # segment on the next rotation
+        if self.spool is not None:
+            return self.spool.lag() >= max(1, self.spool.max_segments - 1)
+        return len(self.flush_tasks) >= max(1, int(self.delivery.limit))
+
+    async def wait_for_capacity(self):
+        self.start()
+        while self.backlogged():
+            self.capacity.clear()
+            await self.capacity.wait()
+
+    def notify_capacity(self):
+        # Called whenever a batch is done with, delivered or not
+        if self.capacity is not None:
+            self.capacity.set()
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+
+        # The previous loop (if any) is gone, so are its session, timer and
+        # the requests the delivery controller was waiting for
+        self.loop = loop
+        self.session = None
+        self.flush_tasks = set()
+        self.capacity = asyncio.Event()
+        self.delivery = create_delivery_controller()
+
+        if CONFIG.get("SPOOL_ENABLED"):
+            if self.spool is None:
+                self.spool = self.open_spool()
+            replayer = IncidentSpoolReplayer(self.spool, self)
+            self.flush_timer = loop.create_task(replayer.run())
+        else:
+            self.flush_timer = loop.create_task(self.run_flush_timer())
+
+        self.stats_timer = loop.create_task(self.log_stats())
+
+    async def log_stats(self):
+        while True:
+            await asyncio.sleep(STATS_LOG_INTERVAL)
+            self.write_stats()
+
+    def write_stats(self):
+        logging.info("API delivery: %s", self.delivery.stats())
+        if self.batch_encoder is not None:
+            logging.info("Batch upload: %s", self.batch_encoder.stats())
+        if self.blob_cache is not None:
+            logging.info("Payload dedup cache: %s", self.blob_cache.stats())
+
+    def open_spool(self) -> IncidentSpool:
+        # Each service process gets its own spool, named after the process so
+        # that it is found again after a restart
+        directory = os.path.join(CONFIG.get("SPOOL_DIR"), current_process().name)
+        return IncidentSpool(
+            directory,
+            segment_bytes=CONFIG.get("SPOOL_SEGMENT_BYTES"),
+            max_segments=CONFIG.get("SPOOL_MAX_SEGMENTS"),
+            fsync_batch=CONFIG.get("SPOOL_FSYNC_BATCH"),
+        )
+
+    async def run_flush_timer(self):
+        interval = CONFIG.get("API_FLUSH_INTERVAL_MS") / 1000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                # The timer must outlive whatever went wrong with one batch
+                logging.exception("Failed to flush incidents")
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=CONFIG.get("API_POOL_SIZE"), keepalive_timeout=30
+            )
+            timeout = aiohttp.ClientTimeout(total=CONFIG.get("API_TIMEOUT_MS") / 1000)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
+
+    async def flush(self) -> int:
+        if not self.buffer:
+            return 0
+
+        batch: List[bytes] = self.buffer
+        self.buffer = []
+
+        with StageProfiler().trace("ship"):
+            failed = await self.send_batch(batch)
+        return len(failed)
+
+    async def send_batch(self, batch: List[bytes]) -> List[bytes]:
+        # Incidents are shipped as already encoded JSON documents
+        session = self.get_session()
+
+        results = None
+        if self.batch_encoder is not None and self.batch_retry_at <= self.loop.time():
+            with StageProfiler().stage("send_batch"):
+                shipped = await self.post_batch(session, batch)
+            if shipped is not None:
+                results = [shipped] * len(batch)
+
+        if results is None:
+            with StageProfiler().stage("send_single"):
+                results = await asyncio.gather(*(self.post(session, payload) for payload in batch))
+
+        failed = [payload for payload, shipped in zip(batch, results) if not shipped]
+        INCIDENTS_SHIPPED.inc(len(batch) - len(failed))
+        INCIDENTS_FAILED.inc(len(failed))
+
+        if self.blob_cache is not None:
+            for payload, shipped in zip(batch, results):
+                if shipped:
+                    self.blob_cache.acknowledge(payload)
+        return failed
+
+    async def request(
+        self,
+        session: aiohttp.ClientSession,
+        latency: Any,
+        headers: Dict[str, str],
+        body: bytes,
+        healthy: Tuple[int, ...],
+    ) -> int:
+        # One POST within the delivery controller's limits. Raises
+        # CircuitOpenError when it was not sent, and the aiohttp error when
+        # it failed; `healthy` are the statuses meaning the API is fine.
+        started = await self.delivery.acquire()
+        status = None
+        try:
+            async with session.post(
+                url=CONFIG.get("API_POST_URL"),
+                headers=headers,
+                data=body,
+            ) as response:
+                latency.observe(self.delivery.clock() - started)
+                status = response.status
+        finally:
+            self.delivery.release(started, status in healthy)
+        return status
+
+    async def retry(self, attempt: int) -> bool:
+        # Waits before attempt number `attempt`, False when out of attempts
+        if attempt > CONFIG.get("API_RETRIES"):
+            return False
+        if attempt > 0:
+            API_RETRIES.inc()
+            await asyncio.sleep(self.delivery.backoff(attempt))
+        return True
+
+    async def post_batch(self, session: aiohttp.ClientSession, batch: List[bytes]) -> Optional[bool]:
+        # Returns None when the API does not take batches, in which case the
+        # caller falls back to one POST per incident
+        with StageProfiler().stage("compress"):
+            body = await self.loop.run_in_executor(None, self.batch_encoder.encode, batch)
+        headers = {
+            "authorization": f"Bearer {CONFIG.get('API_TOKEN')}",
+            "content-type": self.batch_encoder.content_type,
+        }
+        if self.batch_encoder.content_encoding is not None:
+            headers["content-encoding"] = self.batch_encoder.content_encoding
+
+        attempt = 0
+        while await self.retry(attempt):
+            attempt += 1
+            try:
+                status = await self.request(
+                    session,
+                    API_LATENCY_BATCH,
+                    headers,
+                    body,
+                    (200, 201, 202) + BATCH_UNSUPPORTED_STATUSES,
+                )
+            except CircuitOpenError:
+                return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                logging.error("Failed to send incident batch to API: %s", str(error))
+                continue
+
+            if status in BATCH_UNSUPPORTED_STATUSES:
+                logging.warning(
+                    "API refused a batch upload (status code: %s), "
+                    "falling back to single incident POSTs",
+                    status,
+                )
+                self.batch_retry_at = self.loop.time() + CONFIG.get("API_BATCH_RETRY_INTERVAL")
+                return None
+            if status in (200, 201, 202):
+                return True
+            logging.error("Failed to send incident batch to API, status code: %s", status)
+            if status not in RETRY_STATUSES:
+                return False
+
+        return False
+
+    async def post(self, session: aiohttp.ClientSession, payload: bytes) -> bool:
+        headers = {
+            "authorization": f"Bearer {CONFIG.get('API_TOKEN')}",
+            "content-type": "application/json",
+        }
+        attempt = 0
+        while await self.retry(attempt):
+            attempt += 1
+            try:
+                status = await self.request(session, API_LATENCY_SINGLE, headers, payload, (201,))
+            except CircuitOpenError:
+                return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                logging.error("Failed to send incident to API: %s", str(error))
+                continue
+
+            if status == 201:
+                return True
+            logging.error("Failed to send incident to API, status code: %s", status)
+            if status not in RETRY_STATUSES:
+                return False
+
+        return False
+
+    async def close(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if self.stats_timer is not None:
+            self.stats_timer.cancel()
+            self.stats_timer = None
+            self.write_stats()
+
+        if self.flush_tasks:
+            await asyncio.gather(*self.flush_tasks)
+        await self.flush()
+        if self.spool is not None:
+            self.spool.sync()
+
+        session: Optional[aiohttp.ClientSession] = self.session
+        if session is not None and not session.closed:
+            await session.close()
+        self.session = None
+        self.loop = None
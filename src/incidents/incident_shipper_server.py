@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+from typing import Set
+from src.helpers.metrics.metrics_registry import MetricsRegistry, start_metrics_dumper
+from src.helpers.metrics.stage_profiler import StageProfiler
+from .incident_forwarder import FRAME_HEADER, MAX_FRAME_BYTES
+from .incident_record import IncidentRecord
+from .incident_shipper import IncidentShipper
+
+# How long the shipper keeps reading after being asked to stop, the services
+# are stopping at the same time and hand over what they still have queued
+SHUTDOWN_DRAIN_TIMEOUT = 5
+
+
+class IncidentShipperServer:
+    # The shipper process: takes encoded incidents from every service process
+    # over a Unix socket and ships them through a single IncidentShipper, so
+    # the whole collector shares one connection pool, one batching and retry
+    # policy and one backpressure point. While delivery is not keeping up it
+    # stops reading, the socket buffers fill up and the services queue.
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.connections: Set[asyncio.Task] = set()
+        self.received = MetricsRegistry().counter(
+            "collector_shipper_frames_total", "Incidents received from the service processes"
+        )
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        stopping = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopping.set)
+
+        # A socket left behind by a previous run would make the bind fail
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, self.socket_path)
+        shipper = IncidentShipper()
+        shipper.start()
+        metrics_dumper = start_metrics_dumper()
+        StageProfiler().start()
+        logging.info("Shipper process listening on %s", self.socket_path)
+
+        try:
+            await stopping.wait()
+            server.close()
+            if self.connections:
+                await asyncio.wait(self.connections, timeout=SHUTDOWN_DRAIN_TIMEOUT)
+            for task in self.connections:
+                task.cancel()
+        finally:
+            await shipper.close()
+            StageProfiler().close()
+            if metrics_dumper is not None:
+                metrics_dumper.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            await self.read_frames(reader)
+        except asyncio.IncompleteReadError:
+            # The service closed its end, possibly in the middle of a frame
+            pass
+        except (OSError, ValueError) as error:
+            logging.error("Dropping connection from a service process: %s", str(error))
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    async def read_frames(self, reader: asyncio.StreamReader):
+        shipper = IncidentShipper()
+        while True:
+            (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            if length > MAX_FRAME_BYTES:
+                raise ValueError(f"frame of {length} bytes is too large")
+            payload = await reader.readexactly(length)
+            self.received.inc()
+            self.dispatch(shipper, payload)
+
+            # Backpressure: stop reading while the API is not keeping up
+            if shipper.backlogged():
+                await shipper.wait_for_capacity()
+
+    def dispatch(self, shipper: IncidentShipper, payload: bytes):
+        # Blob references are computed from the record, everything else ships
+        # the bytes exactly as the service encoded them
+        if shipper.blob_cache is None:
+            shipper.enqueue_payload(payload)
+            return
+        try:
+            record = IncidentRecord.from_dict(json.loads(payload))
+        except ValueError as error:
+            logging.error("Dropping malformed incident from a service: %s", str(error))
+            return
+        shipper.enqueue(record)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Tuple
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import MetricsRegistry
+from src.helpers.metrics.stage_profiler import StageProfiler
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+SEGMENT_SUFFIX = ".log"
+CURSOR_FILENAME = "cursor"
+
+SEGMENTS_DROPPED = MetricsRegistry().counter(
+    "collector_spool_segments_dropped_total", "Spool segments dropped because the spool was full"
+)
+
+
+class IncidentSpool:
+    # Append-only write-ahead log of incidents. Encoded incidents are stored as
+    # JSON lines in numbered segment files; a cursor file remembers how far the replayer
+    # got, so pending incidents survive restarts. Nothing but the current write
+    # segment handle and one read batch is ever held in memory.
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_segments: int = 64,
+        fsync_batch: int = 100,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.fsync_batch = fsync_batch
+        self.unsynced = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.list_segments()
+        self.cursor = self.read_cursor(segments)
+
+        # Never append to a segment left over from a previous run, its tail
+        # may be a torn write
+        self.write_seq = segments[-1] + 1 if segments else 0
+        self.writer = open(self.segment_path(self.write_seq), "ab")
+
+    def segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{SEGMENT_SUFFIX}")
+
+    def list_segments(self) -> List[int]:
+        return sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit()
+        )
+
+    def read_cursor(self, segments: List[int]) -> Tuple[int, int]:
+        first = segments[0] if segments else 0
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILENAME), "r", encoding="utf-8") as file:
+                seq, offset = (int(value) for value in file.read().split())
+        except (OSError, ValueError):
+            return first, 0
+
+        if seq < first:
+            return first, 0
+        return seq, offset
+
+    def append(self, payload: bytes):
+        self.writer.write(payload + b"\n")
+        self.unsynced += 1
+
+        if self.unsynced >= self.fsync_batch:
+            self.sync()
+        if self.writer.tell() >= self.segment_bytes:
+            self.rotate()
+
+    def sync(self):
+        if not self.unsynced:
+            return
+        self.writer.flush()
+        os.fsync(self.writer.fileno())
+        self.unsynced = 0
+
+    def rotate(self):
+        self.writer.flush()
+        os.fsync(self.writer.fileno())
+        self.unsynced = 0
+        self.writer.close()
+        self.write_seq += 1
+        self.writer = open(self.segment_path(self.write_seq), "ab")
+        self.enforce_max_segments()
+
+    def enforce_max_segments(self):
+        segments = self.list_segments()
+        while len(segments) > self.max_segments:
+            oldest = segments.pop(0)
+            logging.warning(
+                "Incident spool is full, dropping segment %s", self.segment_path(oldest)
+            )
+            os.remove(self.segment_path(oldest))
+            SEGMENTS_DROPPED.inc()
+            if self.cursor[0] <= oldest:
+                self.cursor = (oldest + 1, 0)
+
+    def lag(self) -> int:
+        # Complete segments not delivered yet, behind the one being written
+        return self.write_seq - self.cursor[0]
+
+    def read_batch(self, limit: int) -> Tuple[List[bytes], Tuple[int, int]]:
+        # Make sure everything appended so far is visible to the reader
+        self.writer.flush()
+
+        records: List[bytes] = []
+        seq, offset = self.cursor
+        while len(records) < limit:
+            try:
+                segment = open(self.segment_path(seq), "rb")
+            except FileNotFoundError:
+                segment = None
+
+            if segment is not None:
+                with segment:
+                    segment.seek(offset)
+                    for line in segment:
+                        # A missing newline is a write in progress or a torn write
+                        if not line.endswith(b"\n"):
+                            break
+                        offset += len(line)
+                        records.append(line[:-1])
+                        if len(records) >= limit:
+                            break
+
+            if len(records) >= limit or seq >= self.write_seq:
+                break
+            seq, offset = seq + 1, 0
+
+        return records, (seq, offset)
+
+    def commit(self, cursor: Tuple[int, int]):
+        tmp_path = os.path.join(self.directory, CURSOR_FILENAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(f"{cursor[0]} {cursor[1]}")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, CURSOR_FILENAME))
+        self.cursor = cursor
+
+        # Segments before the cursor are fully delivered
+        for seq in self.list_segments():
+            if seq >= cursor[0]:
+                break
+            os.remove(self.segment_path(seq))
+
+    def close(self):
+        self.sync()
+        self.writer.close()
+
+
+class IncidentSpoolReplayer:
+    # Drains the spool to the API in batches, never faster than
+    # SPOOL_REPLAY_RATE incidents per second, backing off while the API is down
+    def __init__(self, spool: IncidentSpool, shipper):
+        self.spool = spool
+        self.shipper = shipper
+        self.max_backoff = 60
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        idle_interval = CONFIG.get("API_FLUSH_INTERVAL_MS") / 1000
+        backoff = 1
+
+        while True:
+            self.spool.sync()
+            records, cursor = self.spool.read_batch(CONFIG.get("API_BATCH_SIZE"))
+            if not records:
+                await asyncio.sleep(idle_interval)
+                continue
+
+            started = loop.time()
+            with StageProfiler().trace("replay"):
+                failed = await self.shipper.send_batch(records)
+            if len(failed) == len(records):
+                # No point in trying again before the API circuit lets requests through
+                await asyncio.sleep(max(backoff, self.shipper.delivery.retry_in()))
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = 1
+            # Partially failed batches go back to the tail of the spool
+            for payload in failed:
+                self.spool.append(payload)
+            self.spool.commit(cursor)
+            self.shipper.notify_capacity()
+
+            min_duration = len(records) / CONFIG.get("SPOOL_REPLAY_RATE")
+            elapsed = loop.time() - started
+            if elapsed < min_duration:
+                await asyncio.sleep(min_duration - elapsed)
@@ -0,0 +1,368 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import GAUGE, MetricsRegistry
+from src.helpers.metrics.stage_profiler import StageProfiler
+from .incident_record import IncidentRecord
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+# How often incidents past STORE_RETENTION_DAYS are deleted
+COMPACT_INTERVAL = 3600
+
+# Rows deleted per statement while compacting, so writers are not locked out
+COMPACT_CHUNK = 10000
+
+# How long a process waits for another one writing to the same database
+BUSY_TIMEOUT_MS = 10000
+
+INCIDENTS_HELP = "Incidents seen at each stage of the pipeline"
+INCIDENTS_STORED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="stored")
+INCIDENTS_DROPPED = MetricsRegistry().counter("collector_incidents_total", INCIDENTS_HELP, stage="dropped")
+
+# Raw incidents are indexed for lookups by source, type and time. The daily
+# rollups are kept up to date on insert, so top IPs and credential counts
+# read a few rows per day instead of scanning every incident.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    happened_at TEXT NOT NULL,
+    ip_address TEXT NOT NULL,
+    incident_type TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS incidents_happened_at ON incidents (happened_at);
+CREATE INDEX IF NOT EXISTS incidents_ip_address ON incidents (ip_address, happened_at);
+CREATE INDEX IF NOT EXISTS incidents_incident_type ON incidents (incident_type, happened_at);
+CREATE TABLE IF NOT EXISTS ip_daily (
+    day TEXT NOT NULL,
+    ip_address TEXT NOT NULL,
+    incident_type TEXT NOT NULL,
+    incidents INTEGER NOT NULL,
+    PRIMARY KEY (day, ip_address, incident_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS credential_daily (
+    day TEXT NOT NULL,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    PRIMARY KEY (day, username, password)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_timestamp(happened_at) -> str:
+    # One fixed ISO format, so that timestamps sort as text
+    if isinstance(happened_at, str):
+        happened_at = datetime.fromisoformat(happened_at)
+    return happened_at.isoformat(timespec="microseconds")
+
+
+def extract_credentials(metadata: Dict[str, Any]) -> List[Tuple[str, str, int]]:
+    # Aggregated incidents list every credential tried with a count, the
+    # others carry a single username and password
+    credentials = metadata.get("credentials")
+    if isinstance(credentials, list):
+        return [
+            (str(item.get("username", "")), str(item.get("password", "")), item.get("count", 1))
+            for item in credentials
+            if isinstance(item, dict) and "password" in item
+        ]
+    if "password" in metadata:
+        return [(str(metadata.get("username", "")), str(metadata["password"]), 1)]
+    return []
+
+
+class IncidentDatabase:
+    # SQLite in WAL mode, so the CLI can query while the services write.
+    # Every service process opens the same file and writes in batches.
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False
+        )
+        # Only takes effect on a new database, lets compact() give space back
+        self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def insert(self, rows: List[Tuple[str, str, str, Dict[str, Any]]]):
+        # rows of (happened_at, ip_address, incident_type, metadata)
+        ips: Dict[Tuple[str, str, str], int] = {}
+        credentials: Dict[Tuple[str, str, str], int] = {}
+        incidents = []
+        for happened_at, ip_address, incident_type, metadata in rows:
+            incidents.append(
+                (happened_at, ip_address, incident_type, json.dumps(metadata, default=str))
+            )
+            day = happened_at[:10]
+            key = (day, ip_address, incident_type)
+            ips[key] = ips.get(key, 0) + 1
+            for username, password, count in extract_credentials(metadata):
+                key = (day, username, password)
+                credentials[key] = credentials.get(key, 0) + count
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO incidents (happened_at, ip_address, incident_type, metadata) "
+                "VALUES (?, ?, ?, ?)",
+                incidents,
+            )
+            self.connection.executemany(
+                "INSERT INTO ip_daily VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, ip_address, incident_type) DO UPDATE "
+                "SET incidents = incidents + excluded.incidents",
+                [(*key, count) for key, count in ips.items()],
+            )
+            self.connection.executemany(
+                "INSERT INTO credential_daily VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, username, password) DO UPDATE "
+                "SET attempts = attempts + excluded.attempts",
+                [(*key, count) for key, count in credentials.items()],
+            )
+
+    def compact(self, retention_days: int, now: Optional[datetime] = None) -> int:
+        # Deletes everything older than `retention_days` and returns the
+        # number of incidents deleted
+        cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+        cutoff_time = normalize_timestamp(cutoff)
+        cutoff_day = cutoff_time[:10]
+
+        deleted = 0
+        while True:
+            with self.connection:
+                cursor = self.connection.execute(
+                    "DELETE FROM incidents WHERE id IN "
+                    "(SELECT id FROM incidents WHERE happened_at < ? LIMIT ?)",
+                    (cutoff_time, COMPACT_CHUNK),
+                )
+            deleted += cursor.rowcount
+            if cursor.rowcount < COMPACT_CHUNK:
+                break
+        with self.connection:
+            self.connection.execute("DELETE FROM ip_daily WHERE day < ?", (cutoff_day,))
+            self.connection.execute("DELETE FROM credential_daily WHERE day < ?", (cutoff_day,))
+        if deleted:
+            self.connection.execute("PRAGMA incremental_vacuum")
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    def top_ips(
+        self,
+        limit: int = 10,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        incident_type: Optional[str] = None,
+    ) -> List[Tuple[str, int]]:
+        # Days from `since` to `until`, both included
+        where, params = self.day_range(since, until)
+        if incident_type is not None:
+            where.append("incident_type = ?")
+            params.append(incident_type)
+        return self.connection.execute(
+            "SELECT ip_address, SUM(incidents) AS total FROM ip_daily"
+            + self.where(where)
+            + " GROUP BY ip_address ORDER BY total DESC, ip_address LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+
+    def top_credentials(
+        self,
+        limit: int = 10,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> List[Tuple[str, str, int]]:
+        where, params = self.day_range(since, until)
+        return self.connection.execute(
+            "SELECT username, password, SUM(attempts) AS total FROM credential_daily"
+            + self.where(where)
+            + " GROUP BY username, password ORDER BY total DESC, username, password LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+
+    def daily_counts(
+        self, since: Optional[str] = None, until: Optional[str] = None
+    ) -> List[Tuple[str, str, int, int]]:
+        # (day, incident type, incidents, distinct source IPs)
+        where, params = self.day_range(since, until)
+        return self.connection.execute(
+            "SELECT day, incident_type, SUM(incidents), COUNT(DISTINCT ip_address) FROM ip_daily"
+            + self.where(where)
+            + " GROUP BY day, incident_type ORDER BY day, incident_type",
+            params,
+        ).fetchall()
+
+    def incidents(
+        self,
+        limit: int = 100,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        incident_type: Optional[str] = None,
+    ) -> List[Tuple[str, str, str, Dict[str, Any]]]:
+        # Newest first, `until` excluded
+        where, params = [], []
+        if since is not None:
+            where.append("happened_at >= ?")
+            params.append(normalize_timestamp(since))
+        if until is not None:
+            where.append("happened_at < ?")
+            params.append(normalize_timestamp(until))
+        if ip_address is not None:
+            where.append("ip_address = ?")
+            params.append(ip_address)
+        if incident_type is not None:
+            where.append("incident_type = ?")
+            params.append(incident_type)
+        rows = self.connection.execute(
+            "SELECT happened_at, ip_address, incident_type, metadata FROM incidents"
+            + self.where(where)
+            + " ORDER BY happened_at DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        return [(row[0], row[1], row[2], json.loads(row[3])) for row in rows]
+
+    @staticmethod
+    def day_range(since: Optional[str], until: Optional[str]) -> Tuple[List[str], List[Any]]:
+        where, params = [], []
+        if since is not None:
+            where.append("day >= ?")
+            params.append(since[:10])
+        if until is not None:
+            where.append("day <= ?")
+            params.append(until[:10])
+        return where, params
+
+    @staticmethod
+    def where(conditions: List[str]) -> str:
+        return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    def close(self):
+        self.connection.close()
+
+
+class IncidentStore:
+    # Stands in for the IncidentShipper when the API is disabled and
+    # STORE_ENABLED is set: incidents are buffered and written to the local
+    # database every STORE_BATCH_SIZE incidents or STORE_FLUSH_INTERVAL_MS
+    # milliseconds, from a single writer thread so SQLite never blocks the
+    # event loop.
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(IncidentStore, cls).__new__(cls)
+            cls._instance.buffer = []
+            cls._instance.loop = None
+            cls._instance.database = None
+            cls._instance.executor = None
+            cls._instance.flush_timer = None
+            cls._instance.compact_timer = None
+            cls._instance.flush_tasks = set()
+            MetricsRegistry().callback(
+                "collector_store_queue_depth",
+                GAUGE,
+                "Incidents buffered in memory waiting to be stored",
+                lambda: len(cls._instance.buffer),
+            )
+        return cls._instance
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+
+        self.loop = loop
+        self.flush_tasks = set()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="incident-store")
+        self.flush_timer = loop.create_task(self.run_flush_timer())
+        if CONFIG.get("STORE_RETENTION_DAYS"):
+            self.compact_timer = loop.create_task(self.run_compact_timer())
+
+    def enqueue(self, record: IncidentRecord):
+        self.start()
+        self.buffer.append(
+            (
+                normalize_timestamp(record.happened_at),
+                record.ip_address,
+                record.incident_type,
+                record.metadata,
+            )
+        )
+        if len(self.buffer) >= CONFIG.get("STORE_BATCH_SIZE"):
+            with StageProfiler().detach():
+                task = self.loop.create_task(self.flush())
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_tasks.discard)
+
+    async def run_flush_timer(self):
+        interval = CONFIG.get("STORE_FLUSH_INTERVAL_MS") / 1000
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def run_compact_timer(self):
+        while True:
+            try:
+                deleted = await self.run(self.compact)
+                if deleted:
+                    logging.info("Deleted %s incidents past the store retention", deleted)
+            except sqlite3.Error as error:
+                logging.error("Failed to compact the incident store: %s", str(error))
+            await asyncio.sleep(COMPACT_INTERVAL)
+
+    def get_database(self) -> IncidentDatabase:
+        # Only called from the writer thread
+        if self.database is None:
+            self.database = IncidentDatabase(CONFIG.get("STORE_PATH"))
+        return self.database
+
+    async def run(self, function, *args):
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    async def flush(self) -> int:
+        if not self.buffer:
+            return 0
+
+        rows, self.buffer = self.buffer, []
+        with StageProfiler().trace("store"):
+            try:
+                await self.run(self.insert, rows)
+            except sqlite3.Error as error:
+                INCIDENTS_DROPPED.inc(len(rows))
+                logging.error("Failed to store %s incidents: %s", len(rows), str(error))
+                return 0
+        INCIDENTS_STORED.inc(len(rows))
+        return len(rows)
+
+    def insert(self, rows):
+        self.get_database().insert(rows)
+
+    def compact(self) -> int:
+        return self.get_database().compact(CONFIG.get("STORE_RETENTION_DAYS"))
+
+    async def close(self):
+        for timer in (self.flush_timer, self.compact_timer):
+            if timer is not None:
+                timer.cancel()
+        self.flush_timer = None
+        self.compact_timer = None
+
+        if self.loop is not None:
+            if self.flush_tasks:
+                await asyncio.gather(*self.flush_tasks)
+            await self.flush()
+            if self.database is not None:
+                await self.run(self.database.close)
+        self.database = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.executor = None
+        self.loop = None
@@ -4,3 +4,8 @@ from enum import Enum
 class IncidentType(Enum):
     BH_HTTP = "BH-HTTP"
     BH_SSH = "BH-SSH"
+    BH_TELNET = "BH-TELNET"
+    BH_REDIS = "BH-REDIS"
+    BH_SMTP = "BH-SMTP"
+    BH_TCP = "BH-TCP"
+    BH_SCAN = "BH-SCAN"
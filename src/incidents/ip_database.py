@@ -0,0 +1,146 @@
+from bisect import bisect_right
+import csv
+import ipaddress
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import maxminddb
+except ImportError:  # pragma: no cover - only CIDR tables can be used
+    maxminddb = None
+
+# Column names of the GeoLite2 CSV exports and fields of the mmdb databases,
+# mapped to the names used in the incident metadata
+FIELD_ALIASES = {
+    "autonomous_system_number": "asn",
+    "autonomous_system_organization": "as_org",
+    "country_iso_code": "country",
+    "asn": "asn",
+    "as_org": "as_org",
+    "country": "country",
+    "city": "city",
+}
+
+
+def normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {}
+    for name, value in row.items():
+        field = FIELD_ALIASES.get(name)
+        if field is None or value in (None, "") or isinstance(value, (dict, list)):
+            continue
+        if field == "asn":
+            try:
+                value = int(value)
+            except ValueError:
+                continue
+        fields[field] = value
+    return fields
+
+
+class CidrTable:
+    # A CSV file with a `network` column (1.0.0.0/24, 2001:db8::/32...) and
+    # any of the columns in FIELD_ALIASES, for example the GeoLite2 ASN CSV
+    # export. Networks must not overlap; lookups are a binary search over
+    # the sorted network starts.
+    #
+    # get_with_prefix_len also returns the prefix length of the largest
+    # network around the address that gets the same answer: the network
+    # matched, or the largest block between two networks when none does.
+    def __init__(self, path: str):
+        self.path = path
+        # version -> (sorted starts, ends, fields)
+        self.tables: Dict[int, tuple] = {}
+        self.load()
+
+    def load(self):
+        rows: Dict[int, List[tuple]] = {4: [], 6: []}
+        # Most networks share their fields with many others
+        interned: Dict[tuple, Dict[str, Any]] = {}
+        with open(self.path, "r", encoding="utf-8", newline="") as file:
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                try:
+                    network = ipaddress.ip_network(row.get("network") or "", strict=False)
+                except ValueError:
+                    logging.warning("Skipping invalid network on %s:%s", self.path, line)
+                    continue
+                fields = normalize(row)
+                fields = interned.setdefault(tuple(sorted(fields.items())), fields)
+                rows[network.version].append(
+                    (int(network.network_address), int(network.broadcast_address), fields)
+                )
+
+        for version, entries in rows.items():
+            entries.sort(key=lambda entry: entry[0])
+            self.tables[version] = (
+                [entry[0] for entry in entries],
+                [entry[1] for entry in entries],
+                [entry[2] for entry in entries],
+            )
+
+    def get(self, address) -> Optional[Dict[str, Any]]:
+        return self.get_with_prefix_len(address)[0]
+
+    def get_with_prefix_len(self, address) -> Tuple[Optional[Dict[str, Any]], int]:
+        starts, ends, fields = self.tables[address.version]
+        value = int(address)
+        bits = address.max_prefixlen
+        index = bisect_right(starts, value) - 1
+        if index >= 0 and value <= ends[index]:
+            size = ends[index] - starts[index] + 1
+            return fields[index], bits - size.bit_length() + 1
+
+        # Widen the block around the address while it stays between the
+        # previous network and the next one
+        low = ends[index] if index >= 0 else -1
+        high = starts[index + 1] if index + 1 < len(starts) else 1 << bits
+        prefix_len = bits
+        while prefix_len > 0:
+            host_bits = bits - prefix_len + 1
+            first = value >> host_bits << host_bits
+            if first <= low or first + (1 << host_bits) - 1 >= high:
+                break
+            prefix_len -= 1
+        return None, prefix_len
+
+    def close(self):
+        pass
+
+
+class MmdbDatabase:
+    # MaxMind DB file (GeoLite2 ASN, Country or City...), memory mapped so
+    # that every process shares the same pages
+    def __init__(self, path: str):
+        self.path = path
+        self.reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def get(self, address) -> Optional[Dict[str, Any]]:
+        return self.get_with_prefix_len(address)[0]
+
+    def get_with_prefix_len(self, address) -> Tuple[Optional[Dict[str, Any]], int]:
+        record, prefix_len = self.reader.get_with_prefix_len(address)
+        return self.fields(record), prefix_len
+
+    @staticmethod
+    def fields(record) -> Optional[Dict[str, Any]]:
+        if not record:
+            return None
+
+        fields = normalize(record)
+        country = record.get("country") or record.get("registered_country")
+        if isinstance(country, dict) and country.get("iso_code"):
+            fields["country"] = country["iso_code"]
+        city = record.get("city")
+        if isinstance(city, dict) and city.get("names", {}).get("en"):
+            fields["city"] = city["names"]["en"]
+        return fields or None
+
+    def close(self):
+        self.reader.close()
+
+
+def open_ip_database(path: str):
+    if path.endswith(".mmdb"):
+        if maxminddb is None:
+            raise ValueError(f"{path}: the maxminddb package is needed to read .mmdb files")
+        return MmdbDatabase(path)
+    return CidrTable(path)
@@ -0,0 +1,203 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import ipaddress
+import logging
+import socket
+import time
+from typing import Any, Dict, Hashable, Optional
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import MetricsRegistry
+from .incident_record import IncidentRecord
+from .ip_database import open_ip_database
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+CACHE_HELP = "Enrichment cache lookups"
+MISSING = object()
+# Cached for a prefix some database splits into smaller networks, whose
+# addresses are then cached one by one
+SPLIT = object()
+
+
+class TTLCache:
+    # LRU cache whose entries also expire `ttl` seconds after being stored
+    def __init__(self, name: str, max_size: int, ttl: float, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        # key -> (expires at, value)
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = MetricsRegistry().counter(
+            "collector_enrichment_cache_total", CACHE_HELP, cache=name, result="hit"
+        )
+        self.misses = MetricsRegistry().counter(
+            "collector_enrichment_cache_total", CACHE_HELP, cache=name, result="miss"
+        )
+
+    def get(self, key: Hashable):
+        value = self.peek(key)
+        if value is MISSING:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return value
+
+    def peek(self, key: Hashable):
+        # get without counting the lookup
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < self.clock():
+            return MISSING
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value):
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class IPEnricher:
+    # Adds what the local IP databases and reverse DNS know about the source
+    # of an incident to its metadata. Database results are cached per
+    # ENRICHMENT_IPV4_PREFIX (or IPv6) prefix when every database gives the
+    # whole prefix the same answer, per address otherwise, and reverse DNS
+    # results per address, so an IP producing thousands of incidents costs
+    # one lookup per ENRICHMENT_CACHE_TTL.
+    #
+    # Reverse lookups run on ENRICHMENT_DNS_WORKERS threads of their own.
+    # Concurrent lookups of the same address share one resolver call, and
+    # incidents don't wait for a lookup when all the threads are busy.
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(IPEnricher, cls).__new__(cls)
+            cls._instance.setup()
+        return cls._instance
+
+    def setup(self):
+        self.databases = []
+        for path in CONFIG.get("ENRICHMENT_DATABASES"):
+            try:
+                self.databases.append(open_ip_database(path))
+            except (OSError, ValueError) as error:
+                logging.error("Failed to open IP database %s: %s", path, str(error))
+        self.reverse_dns_enabled = CONFIG.get("ENRICHMENT_REVERSE_DNS")
+        self.dns_timeout = CONFIG.get("ENRICHMENT_DNS_TIMEOUT_MS") / 1000
+        self.prefix_lens = {
+            4: CONFIG.get("ENRICHMENT_IPV4_PREFIX"),
+            6: CONFIG.get("ENRICHMENT_IPV6_PREFIX"),
+        }
+        self.networks = TTLCache(
+            "network", CONFIG.get("ENRICHMENT_CACHE_SIZE"), CONFIG.get("ENRICHMENT_CACHE_TTL")
+        )
+        self.hostnames = TTLCache(
+            "dns", CONFIG.get("ENRICHMENT_CACHE_SIZE"), CONFIG.get("ENRICHMENT_CACHE_TTL")
+        )
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.dns_workers = CONFIG.get("ENRICHMENT_DNS_WORKERS")
+        self.dns_busy = 0
+        self.executor = None
+        self.dns_timeouts = MetricsRegistry().counter(
+            "collector_enrichment_dns_timeouts_total", "Reverse DNS lookups that timed out"
+        )
+        self.dns_skipped = MetricsRegistry().counter(
+            "collector_enrichment_dns_skipped_total",
+            "Reverse DNS lookups skipped because every resolver thread was busy",
+        )
+
+    async def enrich(self, record: IncidentRecord):
+        address = ipaddress.ip_address(record.ip_address)
+        enrichment = dict(self.lookup_network(address) or {})
+        if self.reverse_dns_enabled and not (address.is_private or address.is_loopback):
+            hostname = await self.reverse_dns(record.ip_address)
+            if hostname is not None:
+                enrichment["reverse_dns"] = hostname
+        if enrichment:
+            record.metadata["enrichment"] = enrichment
+
+    def lookup_network(self, address) -> Optional[Dict[str, Any]]:
+        if not self.databases:
+            return None
+
+        prefix_len = self.prefix_lens[address.version]
+        value = int(address)
+        key = (address.version, prefix_len, value >> (address.max_prefixlen - prefix_len))
+        fields = self.networks.peek(key)
+        if fields is SPLIT:
+            key = (address.version, address.max_prefixlen, value)
+            fields = self.networks.peek(key)
+        if fields is not MISSING:
+            self.networks.hits.inc()
+            return fields
+
+        self.networks.misses.inc()
+        fields = {}
+        # The answer holds for the smallest of the networks matched
+        matched_len = 0
+        for database in self.databases:
+            result, result_len = database.get_with_prefix_len(address)
+            fields.update(result or {})
+            matched_len = max(matched_len, result_len)
+        if matched_len > prefix_len:
+            if key[1] == prefix_len:
+                self.networks.set(key, SPLIT)
+                key = (address.version, address.max_prefixlen, value)
+        self.networks.set(key, fields)
+        return fields
+
+    async def reverse_dns(self, ip_address: str) -> Optional[str]:
+        hostname = self.hostnames.get(ip_address)
+        if hostname is not MISSING:
+            return hostname
+
+        future = self.pending.get(ip_address)
+        if future is None:
+            if self.dns_busy >= self.dns_workers:
+                # Waiting behind the resolver would hold up the incident
+                self.dns_skipped.inc()
+                return None
+            future = asyncio.ensure_future(self.resolve(ip_address))
+            self.pending[ip_address] = future
+            future.add_done_callback(lambda _: self.pending.pop(ip_address, None))
+        return await asyncio.shield(future)
+
+    async def resolve(self, ip_address: str) -> Optional[str]:
+        # A lookup that times out keeps its thread busy until the resolver
+        # gives up, but nobody waits on it
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.dns_workers, thread_name_prefix="reverse-dns"
+            )
+        lookup = loop.run_in_executor(
+            self.executor, socket.getnameinfo, (ip_address, 0), socket.NI_NAMEREQD
+        )
+        self.dns_busy += 1
+        lookup.add_done_callback(self.lookup_done)
+        hostname = None
+        try:
+            hostname, _ = await asyncio.wait_for(asyncio.shield(lookup), self.dns_timeout)
+        except asyncio.TimeoutError:
+            self.dns_timeouts.inc()
+        except OSError:
+            # No PTR record
+            pass
+        # Failures are cached too, they are the common case for scanners
+        self.hostnames.set(ip_address, hostname)
+        return hostname
+
+    def lookup_done(self, lookup: asyncio.Future):
+        self.dns_busy -= 1
+        # Retrieved even when the incident stopped waiting for it
+        if not lookup.cancelled():
+            lookup.exception()
+
+    def close(self):
+        for database in self.databases:
+            database.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
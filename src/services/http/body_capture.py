@@ -0,0 +1,77 @@
+import base64
+import codecs
+import hashlib
+from typing import Any, Dict, Optional
+from aiohttp import StreamReader
+
+
+class CapturedBody:
+    # The first `capture_bytes` of a request body, plus the length and SHA-256
+    # of the whole body. len() is the full body length, so size checks keep
+    # working as they did on the decoded text.
+    __slots__ = ("data", "length", "sha256", "complete")
+
+    def __init__(self, data: bytes, length: int, sha256: str, complete: bool = True):
+        self.data = data
+        self.length = length
+        self.sha256 = sha256
+        self.complete = complete
+
+    @classmethod
+    def from_bytes(cls, body: bytes, capture_bytes: int) -> "CapturedBody":
+        return cls(body[:capture_bytes], len(body), hashlib.sha256(body).hexdigest())
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.data) < self.length
+
+    def to_metadata(self) -> Dict[str, Any]:
+        # Text bodies are kept readable, anything else goes out as base64. A
+        # character cut in half by the capture cap does not make it binary.
+        try:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            payload = decoder.decode(self.data, final=not self.truncated)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            payload = base64.b64encode(self.data).decode("ascii")
+            encoding = "base64"
+
+        return {
+            "payload": payload,
+            "payload_encoding": encoding,
+            "payload_length": self.length,
+            "payload_sha256": self.sha256,
+            "payload_truncated": self.truncated,
+            "payload_complete": self.complete,
+        }
+
+
+async def capture_body(
+    stream: StreamReader, capture_bytes: int, max_bytes: int
+) -> Optional[CapturedBody]:
+    # Streams the body without ever buffering more than `capture_bytes` of it.
+    # Reading stops after `max_bytes`, the rest of the body is never hashed.
+    digest = hashlib.sha256()
+    head = bytearray()
+    length = 0
+    complete = True
+
+    while complete:
+        chunk = await stream.readany()
+        if not chunk:
+            break
+        if length + len(chunk) > max_bytes:
+            chunk = chunk[: max_bytes - length]
+            complete = False
+        length += len(chunk)
+        digest.update(chunk)
+        if len(head) < capture_bytes:
+            head += chunk[: capture_bytes - len(head)]
+
+    if not length:
+        return None
+
+    return CapturedBody(bytes(head), length, digest.hexdigest(), complete)
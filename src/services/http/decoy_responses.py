@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import mmap
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from aiohttp import web
+
+# Bodies larger than this are served from a memory map of the template
+MMAP_THRESHOLD = 1024 * 1024
+
+ANY_METHOD = "*"
+
+
+class DecoyResponse:
+    # A response encoded once at startup: the body is bytes (or a memoryview
+    # of a memory mapped template) and the ETag is computed from it up front,
+    # so serving it only builds the web.Response
+    __slots__ = ("name", "status", "headers", "body", "etag")
+
+    def __init__(self, name: str, status: int, headers: Dict[str, str], body):
+        self.name = name
+        self.status = status
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        self.headers = dict(headers)
+        if not any(name.lower() == "content-type" for name in headers):
+            self.headers["Content-Type"] = "text/html"
+        self.headers["ETag"] = self.etag
+
+    def respond(self, if_none_match: Optional[str] = None) -> web.Response:
+        if if_none_match and self.status == 200 and self.etag in if_none_match:
+            return web.Response(status=304, headers={"ETag": self.etag})
+        return web.Response(status=self.status, body=self.body, headers=self.headers)
+
+
+class DecoyRouter:
+    # Picks the response for a request from a directory of templates. Every
+    # template file is a block of headers, an empty line and the body:
+    #
+    #   Match: GET|POST /wp-(login|admin).*
+    #   Status: 200
+    #   Server: Apache/2.4.41 (Ubuntu)
+    #
+    #   <html>...
+    #
+    # `Match` takes the methods (or *) and a regular expression the whole
+    # path must match, `Status` defaults to 200 and every other header is
+    # sent as is. Templates are tried in file name order; the path patterns
+    # are compiled into one alternation per method, so routing a request is
+    # a dict lookup and a single regex match whatever the number of
+    # templates. Requests no template matches get `default`.
+    def __init__(self, default: DecoyResponse):
+        self.default = default
+        self.responses: List[DecoyResponse] = []
+        self.rules: List[Tuple[str, frozenset]] = []
+        # method -> (combined pattern, responses by group name)
+        self.routes: Dict[str, Tuple[re.Pattern, Dict[str, DecoyResponse]]] = {}
+
+    def load(self, directory: str):
+        if not os.path.isdir(directory):
+            logging.warning("Decoy directory %s not found, serving the default page", directory)
+            return
+
+        for file_name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, file_name)
+            if not os.path.isfile(path) or file_name.startswith("."):
+                continue
+            try:
+                self.add(*self.read_template(path))
+            except (OSError, ValueError, re.error) as error:
+                logging.error("Skipping decoy template %s: %s", path, str(error))
+        self.compile()
+        logging.info("Loaded %s decoy responses from %s", len(self.responses), directory)
+
+    def read_template(self, path: str) -> Tuple[str, frozenset, DecoyResponse]:
+        headers: Dict[str, str] = {}
+        with open(path, "rb") as file:
+            for line in iter(file.readline, b""):
+                line = line.decode("utf-8").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                if not value:
+                    raise ValueError(f"invalid header line {line!r}")
+                headers[name.strip()] = value.strip()
+
+            offset = file.tell()
+            size = os.fstat(file.fileno()).st_size
+            if size - offset > MMAP_THRESHOLD:
+                body = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))[offset:]
+            else:
+                body = file.read()
+
+        match = headers.pop("Match", None)
+        if match is None:
+            raise ValueError("missing Match header")
+        methods, _, pattern = match.partition(" ")
+        methods = frozenset(method.upper() for method in methods.split("|"))
+        status = int(headers.pop("Status", "200"))
+        response = DecoyResponse(os.path.basename(path), status, headers, body)
+        return pattern.strip() or ".*", methods, response
+
+    def add(self, pattern: str, methods: frozenset, response: DecoyResponse):
+        re.compile(pattern)
+        self.rules.append((pattern, methods))
+        self.responses.append(response)
+
+    def compile(self):
+        methods = {method for _, rule_methods in self.rules for method in rule_methods}
+        self.routes = {}
+        for method in methods | {ANY_METHOD}:
+            alternatives = []
+            responses = {}
+            for index, (pattern, rule_methods) in enumerate(self.rules):
+                if method in rule_methods or ANY_METHOD in rule_methods:
+                    name = f"decoy{index}"
+                    alternatives.append(f"(?P<{name}>{pattern})")
+                    responses[name] = self.responses[index]
+            if alternatives:
+                self.routes[method] = (re.compile("|".join(alternatives)), responses)
+
+    def match(self, method: str, path: str) -> DecoyResponse:
+        if method == "HEAD":
+            method = "GET"
+        route = self.routes.get(method) or self.routes.get(ANY_METHOD)
+        if route is None:
+            return self.default
+        pattern, responses = route
+        match = pattern.fullmatch(path)
+        if match is None:
+            return self.default
+        return responses[match.lastgroup]
@@ -1,42 +1,127 @@
 from datetime import datetime
 import logging
-import asyncio
-from collections import defaultdict
+from urllib.parse import unquote
 from aiohttp import web
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import COUNTER, GAUGE, MetricsRegistry, start_metrics_dumper
+from src.helpers.metrics.stage_profiler import StageProfiler
 from src.incidents.incident import Incident
+from src.incidents.incident_record import IncidentRecord
+from src.incidents.incident_forwarder import get_shipper
+from src.incidents.incident_queue import IncidentQueue
+from src.incidents.ip_enricher import IPEnricher
+from .body_capture import capture_body
+from .decoy_responses import DecoyResponse, DecoyRouter
+from .rate_limiter import RateLimiter
+from .signature_classifier import SignatureClassifier
+
+CONFIG = Configuration().get_config()
+
+VALID_METHODS = frozenset(("GET", "POST", "PUT", "DELETE"))
+BODY_METHODS = frozenset(("POST", "PUT", "DELETE"))
+REQUIRED_HEADERS = ("Accept", "Host", "User-Agent")
 
 class HTTPService:
-    def __init__(self, port=8888):
+    def __init__(self, port=8888, reuse_port=False):
         self.app = web.Application(middlewares=[self.rate_limiter])
         self.app.router.add_route("*", "/{tail:.*}", self.handle_request)
-        # Limit the number of concurrent requests to 100
-        self.semaphore = asyncio.Semaphore(100)
-        self.request_counts = defaultdict(int)
+        self.app.on_startup.append(self.start_shipper)
+        self.app.on_cleanup.append(self.close_shipper)
+        self.incident_queue = IncidentQueue(
+            "http",
+            size=CONFIG.get("INCIDENT_QUEUE_SIZE"),
+            workers=CONFIG.get("INCIDENT_QUEUE_WORKERS"),
+            policy=CONFIG.get("INCIDENT_QUEUE_POLICY"),
+        )
+        self.limiter = RateLimiter(
+            rate=CONFIG.get("HTTP_RATE_LIMIT_RATE"),
+            burst=CONFIG.get("HTTP_RATE_LIMIT_BURST"),
+            max_tracked=CONFIG.get("HTTP_RATE_LIMIT_MAX_TRACKED"),
+            ipv4_prefix=CONFIG.get("HTTP_RATE_LIMIT_IPV4_PREFIX"),
+            ipv6_prefix=CONFIG.get("HTTP_RATE_LIMIT_IPV6_PREFIX"),
+        )
+        # Responses are encoded once here, not per request
+        self.decoys = DecoyRouter(
+            DecoyResponse("default", 200, {}, self.create_response_content().encode("utf-8"))
+        )
+        if CONFIG.get("HTTP_DECOY_DIR"):
+            self.decoys.load(CONFIG.get("HTTP_DECOY_DIR"))
+        self.classifier = SignatureClassifier(CONFIG.get("HTTP_SIGNATURES_BODY_BYTES"))
+        if CONFIG.get("HTTP_SIGNATURES_FILE"):
+            self.classifier.load(CONFIG.get("HTTP_SIGNATURES_FILE"))
         self.port = port
+        self.reuse_port = reuse_port
+        self.metrics_dumper = None
+        self.requests_total = MetricsRegistry().counter(
+            "collector_http_requests_total", "HTTP requests received, including rate limited ones"
+        )
+        self.requests_active = MetricsRegistry().gauge(
+            "collector_http_requests_active", "HTTP requests currently being handled"
+        )
+        MetricsRegistry().callback(
+            "collector_http_rate_limited_total",
+            COUNTER,
+            "HTTP requests rejected by the rate limiter",
+            lambda: self.limiter.rejected,
+        )
+        MetricsRegistry().callback(
+            "collector_http_rate_limit_tracked",
+            GAUGE,
+            "Networks currently tracked by the rate limiter",
+            lambda: self.limiter.tracked,
+        )
 
     def run(self):
-        web.run_app(self.app, port=self.port)
+        web.run_app(self.app, port=self.port, reuse_port=self.reuse_port or None)
+
+    async def start_shipper(self, app):
+        # Connects to the shipper process, or starts replaying incidents
+        # spooled by a previous run right away
+        get_shipper().start()
+        if CONFIG.get("ENRICHMENT_ENABLED"):
+            # Loads the IP databases before the first incident
+            IPEnricher()
+        self.metrics_dumper = start_metrics_dumper()
+        StageProfiler().start()
+
+    async def close_shipper(self, app):
+        # Flush whatever is still buffered before the process exits
+        await self.incident_queue.close()
+        await get_shipper().close()
+        StageProfiler().close()
+        if self.metrics_dumper is not None:
+            self.metrics_dumper.close()
 
     @web.middleware
     async def rate_limiter(self, request, handler):
-        client_ip = request.remote
-        self.request_counts[client_ip] += 1
-
-        if self.request_counts[client_ip] > 1000:
+        self.requests_total.inc()
+        if not self.limiter.allow(request.remote):
             return web.Response(status=429, text="Too many requests")
 
-        return await handler(request)
+        self.requests_active.inc()
+        try:
+            return await handler(request)
+        finally:
+            self.requests_active.dec()
 
     async def handle_request(self, request):
-        response_text = self.create_response_content()
-        response = web.Response(body=response_text, content_type="text/html")
-
-        if request.method == "POST":
-            request_payload = await request.text()
+        decoy = self.decoys.match(request.method, request.path)
+        response = decoy.respond(request.headers.get("If-None-Match"))
+
+        # Any method may carry a body, is_malformed decides whether it should
+        if request.body_exists:
+            with StageProfiler().trace("http.capture_body"):
+                request_payload = await capture_body(
+                    request.content,
+                    CONFIG.get("HTTP_BODY_CAPTURE_BYTES"),
+                    CONFIG.get("HTTP_BODY_MAX_BYTES"),
+                )
         else:
             request_payload = None
 
-        asyncio.create_task(self.create_incident(request, request_payload))
+        self.incident_queue.submit(
+            request.remote, self.create_incident, request, request_payload
+        )
 
         return response
 
@@ -54,39 +139,52 @@ class HTTPService:
 
     def create_payload(self, request, request_payload):
         # Get the current timestamp
-        timestamp = datetime.now().isoformat()
+        timestamp = datetime.now()
 
         # Log the request details
         client_ip = request.remote
         user_agent = request.headers.get("User-Agent")
         request_method = request.method
         request_path = request.path
-        request_headers = dict(request.headers)
-
-        is_malformed = self.is_malformed(
-            request_method, request_path, request_headers, request_payload
-        )
-        request_data = {
-            "ip_address": client_ip,
-            "incident_type": "BH-HTTP",
-            "happened_at": timestamp,
-            "metadata": {
-                "user_agent": user_agent,
-                "method": request_method,
-                "path": request_path,
-                "headers": request_headers,
-                "payload": request_payload,
-                "is_malformed": is_malformed,
-            },
+        # Header names are multidict istr, which orjson will not take as keys
+        request_headers = {str(name): request.headers[name] for name in request.headers}
+
+        with StageProfiler().stage("is_malformed"):
+            is_malformed = self.is_malformed(
+                request_method, request_path, request_headers, request_payload
+            )
+        with StageProfiler().stage("classify"):
+            # The query string is only partly decoded in path_qs
+            signatures, severity = self.classifier.classify(
+                unquote(request.raw_path),
+                request_headers,
+                request_payload.data if request_payload is not None else None,
+            )
+        metadata = {
+            "user_agent": user_agent,
+            "method": request_method,
+            "path": request_path,
+            "headers": request_headers,
+            "payload": None,
+            "is_malformed": is_malformed,
+            "signatures": signatures,
+            "severity": severity,
         }
-
-        return request_data
+        if request_payload is not None:
+            metadata.update(request_payload.to_metadata())
+
+        return IncidentRecord(
+            ip_address=client_ip,
+            incident_type="BH-HTTP",
+            happened_at=timestamp,
+            metadata=metadata,
+        )
 
     def is_malformed(
         self, request_method, request_path, request_headers, request_payload
     ):
         # Check if the method is invalid
-        if request_method not in ["GET", "POST", "PUT", "DELETE"]:
+        if request_method not in VALID_METHODS:
             return True
 
         # Check if a GET request has a payload
@@ -94,16 +192,11 @@ class HTTPService:
             return True
 
         # Check if the path is invalid
-        if (
-            not request_path
-            or ".." in request_path
-            or not all(char.isprintable() for char in request_path)
-        ):
+        if not request_path or ".." in request_path or not request_path.isprintable():
             return True
 
         # Check if required headers are missing
-        required_headers = ["Accept", "Host", "User-Agent"]
-        if not all(header in request_headers for header in required_headers):
+        if not all(header in request_headers for header in REQUIRED_HEADERS):
             return True
 
         # Check if the payload is too large
@@ -111,16 +204,18 @@ class HTTPService:
             return True
 
         # Check if a POST, PUT or DELETE request has no payload
-        if request_method in ["POST", "PUT", "DELETE"] and not request_payload:
+        if request_method in BODY_METHODS and not request_payload:
             return True
 
         return False
 
     async def create_incident(self, request, request_payload):
         try:
-            payload = self.create_payload(request, request_payload)
-            incident = Incident(payload)
-            await incident.create()
+            with StageProfiler().trace("http.incident"):
+                with StageProfiler().stage("create_payload"):
+                    payload = self.create_payload(request, request_payload)
+                incident = Incident(payload)
+                await incident.create()
         except Exception as error:
             logging.error("Failed to create incident: %s", str(error))
 
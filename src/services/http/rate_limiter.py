@@ -0,0 +1,69 @@
+import ipaddress
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class RateLimiter:
+    # Token bucket per client network. Buckets refill at `rate` tokens per
+    # second up to `burst`, and at most `max_tracked` networks are remembered,
+    # evicting the least recently seen one. Addresses are grouped by their
+    # IPv4/IPv6 prefix so that a scanner cannot dodge the limit by rotating
+    # addresses within its own subnet.
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_tracked: int,
+        ipv4_prefix: int = 32,
+        ipv6_prefix: int = 128,
+        clock=time.monotonic,
+    ):
+        if not 0 <= ipv4_prefix <= 32 or not 0 <= ipv6_prefix <= 128:
+            raise ValueError("Invalid rate limiter prefix length.")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_tracked = max_tracked
+        self.ipv4_shift = 32 - ipv4_prefix
+        self.ipv6_shift = 128 - ipv6_prefix
+        self.clock = clock
+        # network key -> [tokens, last refill time]
+        self.buckets: OrderedDict = OrderedDict()
+        self.rejected = 0
+
+    def key(self, ip_address) -> Hashable:
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return ip_address
+
+        if address.version == 4:
+            return 4, int(address) >> self.ipv4_shift
+        return 6, int(address) >> self.ipv6_shift
+
+    def allow(self, ip_address) -> bool:
+        key = self.key(ip_address)
+        now = self.clock()
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_tracked:
+                self.buckets.popitem(last=False)
+            bucket = [self.burst, now]
+            self.buckets[key] = bucket
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] < 1:
+            self.rejected += 1
+            return False
+
+        bucket[0] -= 1
+        return True
+
+    @property
+    def tracked(self) -> int:
+        return len(self.buckets)
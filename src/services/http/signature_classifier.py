@@ -0,0 +1,152 @@
+import logging
+import re
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# From least to most severe, an incident gets the highest of its rules
+SEVERITIES = ("info", "low", "medium", "high", "critical")
+
+URL = "url"
+USER_AGENT = "user_agent"
+HEADERS = "headers"
+BODY = "body"
+FIELDS = (URL, USER_AGENT, HEADERS, BODY)
+
+
+def split_alternatives(pattern: str) -> List[str]:
+    # The top level branches of `a|b(c|d)|e`: a, b(c|d) and e
+    branches = []
+    start = depth = 0
+    index = 0
+    in_class = False
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            index += 1
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # A ] right after [ or [^ is a literal
+            if pattern[index + 1 : index + 2] == "^":
+                index += 1
+            if pattern[index + 1 : index + 2] == "]":
+                index += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            branches.append(pattern[start:index])
+            start = index + 1
+        index += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+class SignatureClassifier:
+    # Tags HTTP requests with the attack signatures they match. Every line
+    # of a signature file is a rule:
+    #
+    #   log4shell  critical  url|headers|body  \$\{\s*jndi\s*:
+    #
+    # an id, a severity, the fields the rule applies to and a regular
+    # expression (the rest of the line) searched in them. The fields are the
+    # decoded path and query string, the User-Agent, every header as
+    # `Name: value` lines and the first `max_body_bytes` of the body.
+    #
+    # The re module has no multi-pattern matcher: an alternation is tried
+    # branch by branch at every offset, while a pattern starting with a
+    # literal is searched with the same fast substring search as `in`. So
+    # the top level branches of every rule are compiled as patterns of their
+    # own, and fields are lower-cased once per request to match patterns
+    # written in lower case rather than with re.IGNORECASE, which turns the
+    # literal search off as well. Scanning a field this way is an order of
+    # magnitude faster than with one alternation of all its rules.
+    def __init__(self, max_body_bytes: int = 8192):
+        self.max_body_bytes = max_body_bytes
+        self.rules: List[Tuple[str, str, frozenset, List[re.Pattern]]] = []
+        # field -> [(rule index, pattern)], a rule has a pattern per branch
+        self.matchers: Dict[str, List[Tuple[int, re.Pattern]]] = {}
+
+    def load(self, path: str):
+        try:
+            with open(path, encoding="utf-8") as file:
+                lines = file.readlines()
+        except OSError as error:
+            logging.warning("Signature file %s not loaded: %s", path, str(error))
+            return
+
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                self.add(*self.parse_rule(line))
+            except (ValueError, re.error) as error:
+                logging.error("Skipping signature %s:%s: %s", path, number, str(error))
+        self.compile()
+        logging.info("Loaded %s HTTP signatures from %s", len(self.rules), path)
+
+    @staticmethod
+    def parse_rule(line: str) -> Tuple[str, str, frozenset, str]:
+        parts = line.split(None, 3)
+        if len(parts) != 4:
+            raise ValueError(f"expected an id, a severity, fields and a pattern in {line!r}")
+        rule_id, severity, fields, pattern = parts
+        return rule_id, severity.lower(), frozenset(fields.lower().split("|")), pattern
+
+    def add(self, rule_id: str, severity: str, fields: frozenset, pattern: str):
+        if severity not in SEVERITIES:
+            raise ValueError(f"unknown severity {severity!r}")
+        unknown = fields - set(FIELDS)
+        if unknown:
+            raise ValueError(f"unknown fields {', '.join(sorted(unknown))}")
+        compiled = re.compile(pattern, re.DOTALL)
+        patterns = [compiled]
+        # Inline global flags like (?i) would only apply to the first branch
+        if compiled.flags == re.compile("", re.DOTALL).flags:
+            try:
+                patterns = [re.compile(branch, re.DOTALL) for branch in split_alternatives(pattern)]
+            except re.error:
+                # References across branches
+                pass
+        self.rules.append((rule_id, severity, fields, patterns))
+
+    def compile(self):
+        self.matchers = {}
+        for index, (_, _, fields, patterns) in enumerate(self.rules):
+            for field in fields:
+                self.matchers.setdefault(field, []).extend((index, pattern) for pattern in patterns)
+
+    def classify(
+        self, url: str, headers: Mapping[str, str], body: Optional[bytes] = None
+    ) -> Tuple[List[str], Optional[str]]:
+        # Returns the ids of the rules matched, in file order, and the
+        # highest severity among them (None when nothing matched)
+        if not self.matchers:
+            return [], None
+
+        fields = {URL: url}
+        if USER_AGENT in self.matchers:
+            fields[USER_AGENT] = headers.get("User-Agent", "")
+        if HEADERS in self.matchers:
+            fields[HEADERS] = "\n".join(f"{name}: {value}" for name, value in headers.items())
+        if body and BODY in self.matchers:
+            # One character per byte, binary bodies are matched as is
+            fields[BODY] = body[: self.max_body_bytes].decode("latin-1")
+
+        matched = set()
+        for field, text in fields.items():
+            matchers = self.matchers.get(field)
+            if not matchers or not text:
+                continue
+            text = text.lower()
+            for index, pattern in matchers:
+                if index not in matched and pattern.search(text) is not None:
+                    matched.add(index)
+
+        if not matched:
+            return [], None
+        ordered = sorted(matched)
+        severity = max((self.rules[index][1] for index in ordered), key=SEVERITIES.index)
+        return [self.rules[index][0] for index in ordered], severity
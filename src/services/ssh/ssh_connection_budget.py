@@ -0,0 +1,38 @@
+from typing import Dict
+
+PER_IP = "per_ip"
+GLOBAL = "global"
+
+
+class ConnectionBudget:
+    # Concurrent connection limits checked right after accept, before any
+    # thread or paramiko transport exists for the client. Over budget
+    # connections are only counted by the reason they were turned away.
+    def __init__(self, total: int, per_ip: int):
+        self.total = total
+        self.per_ip = per_ip
+        self.active = 0
+        self.connections: Dict[str, int] = {}
+        self.rejected = {PER_IP: 0, GLOBAL: 0}
+
+    def acquire(self, ip_address: str) -> bool:
+        if self.active >= self.total:
+            self.rejected[GLOBAL] += 1
+            return False
+        count = self.connections.get(ip_address, 0)
+        if count >= self.per_ip:
+            self.rejected[PER_IP] += 1
+            return False
+        self.connections[ip_address] = count + 1
+        self.active += 1
+        return True
+
+    def release(self, ip_address: str):
+        count = self.connections.get(ip_address, 0)
+        if count == 0:
+            return
+        if count == 1:
+            del self.connections[ip_address]
+        else:
+            self.connections[ip_address] = count - 1
+        self.active -= 1
@@ -0,0 +1,44 @@
+import logging
+import os
+import socket
+from typing import List
+import paramiko
+
+HOST_KEY_FILES = {
+    "rsa": ("id_rsa", paramiko.RSAKey),
+    "ecdsa": ("id_ecdsa", paramiko.ECDSAKey),
+    "ed25519": ("id_ed25519", paramiko.Ed25519Key),
+}
+
+
+class SSHHandshakeCache:
+    # Everything a transport needs for the handshake that does not depend on
+    # the client, loaded once at startup and shared by every connection
+    def __init__(self, certificates_directory: str, key_types: List[str]):
+        self.host_keys = self.load_host_keys(certificates_directory, key_types)
+        # Moduli are kept on the Transport class, loading them once is enough
+        self.moduli_loaded = paramiko.Transport.load_server_moduli()
+        self.hostname = socket.getfqdn("")
+
+    def load_host_keys(
+        self, certificates_directory: str, key_types: List[str]
+    ) -> List[paramiko.PKey]:
+        host_keys = []
+        for key_type in key_types:
+            if key_type not in HOST_KEY_FILES:
+                raise ValueError(f"Unsupported SSH host key type: {key_type}")
+
+            filename, key_class = HOST_KEY_FILES[key_type]
+            key_path = os.path.join(certificates_directory, filename)
+            if not os.path.exists(key_path):
+                logging.warning("SSH host key %s not found, skipping", key_path)
+                continue
+            host_keys.append(key_class(filename=key_path))
+
+        if not host_keys:
+            raise ValueError("No SSH host key could be loaded.")
+        return host_keys
+
+    def setup_transport(self, transport: paramiko.Transport):
+        for host_key in self.host_keys:
+            transport.add_server_key(host_key)
@@ -4,29 +4,60 @@ import threading
 import logging
 import paramiko
 import aiohttp
+from src.helpers.metrics.stage_profiler import StageProfiler
 from src.incidents.incident import Incident
+from src.incidents.incident_record import IncidentRecord
 
 class SSHServer(paramiko.ServerInterface):
-    def __init__(self, transport, client_ip_addr, loop):
-        self.completion_event = threading.Event()
+    def __init__(
+        self,
+        transport,
+        client_ip_addr,
+        loop,
+        completion_event=None,
+        aggregator=None,
+        incident_queue=None,
+        tarpit=None,
+    ):
+        self.completion_event = completion_event or threading.Event()
         self.transport = transport
         self.client_ip_addr = client_ip_addr
         self.loop = loop
+        self.aggregator = aggregator
+        self.incident_queue = incident_queue
+        self.tarpit = tarpit
 
     def check_auth_password(self, username, password):
         logging.info(
             'Login attempt from %s with username "%s" and password "%s"', 
             self.client_ip_addr, username, password
         )
+        if self.tarpit is not None:
+            self.loop.call_soon_threadsafe(self.tarpit.record, self.client_ip_addr)
+
+        if self.aggregator is not None:
+            # Attempts are folded into one incident per IP by the event loop
+            self.loop.call_soon_threadsafe(
+                self.aggregator.add,
+                self.client_ip_addr,
+                "BH-SSH",
+                (username, password),
+                datetime.datetime.now().isoformat(),
+            )
+            return paramiko.AUTH_FAILED
 
         data = {
             "client_ip_addr": self.client_ip_addr,
             "username": username,
             "password": password,
         }
-        asyncio.run_coroutine_threadsafe(
-            self.create_incident(data), self.loop
-        )  # Use run_coroutine_threadsafe
+        if self.incident_queue is not None:
+            # Queued from the event loop, which sheds what it cannot keep up with
+            self.loop.call_soon_threadsafe(
+                self.incident_queue.submit, self.client_ip_addr, self.create_incident, data
+            )
+        else:
+            asyncio.run_coroutine_threadsafe(self.create_incident(data), self.loop)
         return paramiko.AUTH_FAILED
 
     def check_channel_request(self, kind, chanid):
@@ -40,21 +71,45 @@ class SSHServer(paramiko.ServerInterface):
         return True
 
     def create_payload(self, data):
-        timestamp = datetime.datetime.now().isoformat()
-        return {
-            "ip_address": data["client_ip_addr"],
-            "incident_type": "BH-SSH",
-            "happened_at": timestamp,
-            "metadata": {
+        timestamp = datetime.datetime.now()
+        return IncidentRecord(
+            ip_address=data["client_ip_addr"],
+            incident_type="BH-SSH",
+            happened_at=timestamp,
+            metadata={
                 "username": data["username"],
                 "password": data["password"],
             },
-        }
+        )
+
+    @staticmethod
+    def create_aggregated_payload(bucket):
+        credentials = [
+            {"username": username, "password": password, "count": count}
+            for (username, password), count in bucket.samples.items()
+        ]
+        return IncidentRecord(
+            ip_address=bucket.ip_address,
+            incident_type=bucket.incident_type,
+            happened_at=bucket.first_seen,
+            metadata={
+                # First attempt, keeps the raw incident fields available
+                "username": credentials[0]["username"],
+                "password": credentials[0]["password"],
+                "attempts": bucket.attempts,
+                "first_seen": bucket.first_seen,
+                "last_seen": bucket.last_seen,
+                "credentials": credentials,
+                "credentials_dropped": bucket.dropped_samples,
+            },
+        )
 
     async def create_incident(self, data):
         try:
-            payload = self.create_payload(data)
-            incident = Incident(payload)
-            await incident.create()
+            with StageProfiler().trace("ssh.incident"):
+                with StageProfiler().stage("create_payload"):
+                    payload = self.create_payload(data)
+                incident = Incident(payload)
+                await incident.create()
         except aiohttp.ClientConnectionError as error:
             logging.error("Failed to create incident: %s", str(error))
@@ -2,63 +2,223 @@ import asyncio
 import socket
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
 import paramiko
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import COUNTER, GAUGE, MetricsRegistry, start_metrics_dumper
+from src.helpers.metrics.stage_profiler import StageProfiler
+from src.incidents.incident import Incident
+from src.incidents.incident_aggregator import IncidentAggregator
+from src.incidents.incident_forwarder import get_shipper
+from src.incidents.incident_queue import IncidentQueue
+from src.incidents.ip_enricher import IPEnricher
+from .ssh_connection_budget import GLOBAL, PER_IP, ConnectionBudget
+from .ssh_handshake_cache import SSHHandshakeCache
 from .ssh_server import SSHServer
+from .ssh_tarpit import Tarpit, TarpitRelay
+from .ssh_transport import HandshakeEvent, SSHTransport
+
+CONFIG = Configuration().get_config()
+
+# How often the handshake latency histogram is written to the log
+HANDSHAKE_STATS_INTERVAL = 300
+
+# Seconds on top of the longest tarpit delay a closing connection is given
+# to get the responses still held back
+RELAY_DRAIN_GRACE = 1
 
 
 class SSHService:
     def __init__(self, port=2222):
         self.port = port
-        self.executor = ThreadPoolExecutor(max_workers=4)
         self.sock = None
+        self.clients = set()
+        self.handshake_cache = None
+        self.handshake_latency = MetricsRegistry().histogram(
+            "collector_ssh_handshake_seconds", "Duration of successful SSH key exchanges in seconds"
+        )
+        self.aggregator = None
+        self.incident_queue = IncidentQueue(
+            "ssh",
+            size=CONFIG.get("INCIDENT_QUEUE_SIZE"),
+            workers=CONFIG.get("INCIDENT_QUEUE_WORKERS"),
+            policy=CONFIG.get("INCIDENT_QUEUE_POLICY"),
+        )
+        self.connections_total = MetricsRegistry().counter(
+            "collector_connections_total", "Connections accepted by a service", service="ssh"
+        )
+        self.connections_active = MetricsRegistry().gauge(
+            "collector_connections_active", "Connections currently open on a service", service="ssh"
+        )
+        self.budget = ConnectionBudget(
+            total=CONFIG.get("SSH_MAX_CONNECTIONS"),
+            per_ip=CONFIG.get("SSH_MAX_CONNECTIONS_PER_IP"),
+        )
+        for reason in (GLOBAL, PER_IP):
+            MetricsRegistry().callback(
+                "collector_ssh_connections_rejected_total",
+                COUNTER,
+                "SSH connections closed before the handshake for being over budget",
+                lambda reason=reason: self.budget.rejected[reason],
+                reason=reason,
+            )
+        self.tarpit = None
+        if CONFIG.get("SSH_TARPIT_ENABLED"):
+            self.tarpit = Tarpit(
+                threshold=CONFIG.get("SSH_TARPIT_THRESHOLD"),
+                delay=CONFIG.get("SSH_TARPIT_DELAY_MS") / 1000,
+                max_delay=CONFIG.get("SSH_TARPIT_MAX_DELAY_MS") / 1000,
+                window=CONFIG.get("SSH_TARPIT_WINDOW"),
+            )
+            MetricsRegistry().callback(
+                "collector_ssh_tarpit_tracked",
+                GAUGE,
+                "Source IPs whose SSH password attempts are counted by the tarpit",
+                lambda: self.tarpit.tracked,
+            )
+        self.tarpitted_total = MetricsRegistry().counter(
+            "collector_ssh_tarpitted_connections_total",
+            "SSH connections that had responses held back by the tarpit",
+        )
 
     async def run(self):
         logging.basicConfig(level=logging.INFO)
         current_directory = os.path.dirname(os.path.abspath(__file__))
-        rsa_key_fullpath = os.path.join(current_directory, "../../../certificates/id_rsa")
-        host_key = paramiko.RSAKey(filename=rsa_key_fullpath)
+        certificates_directory = os.path.join(current_directory, "../../../certificates")
+        self.handshake_cache = SSHHandshakeCache(
+            certificates_directory, CONFIG.get("SSH_HOST_KEY_TYPES")
+        )
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.sock.bind(("", self.port))
         self.sock.listen(100)
+        self.sock.setblocking(False)
 
         loop = asyncio.get_running_loop()
+        get_shipper().start()
+        if CONFIG.get("ENRICHMENT_ENABLED"):
+            # Loads the IP databases before the first incident
+            IPEnricher()
+        if CONFIG.get("SSH_AGGREGATION_ENABLED"):
+            self.aggregator = IncidentAggregator(
+                window=CONFIG.get("SSH_AGGREGATION_WINDOW"),
+                max_samples=CONFIG.get("SSH_AGGREGATION_MAX_CREDENTIALS"),
+                emit=self.emit_aggregate,
+            )
+        stats_task = asyncio.create_task(self.log_handshake_stats())
+        metrics_dumper = start_metrics_dumper()
+        StageProfiler().start()
+        logging.info(
+            "SSH Service pot listening on %s:%s", self.handshake_cache.hostname, self.port
+        )
 
-        while True:
-            try:
-                client, addr = await loop.run_in_executor(
-                    self.executor, self.sock.accept
-                )
-            except socket.error as err:
-                logging.error("Failed to accept client: %s", err)
+        try:
+            while True:
+                try:
+                    client, addr = await loop.sock_accept(self.sock)
+                except socket.error as err:
+                    logging.error("Failed to accept client: %s", err)
+                    # Typically out of file descriptors, give connections time to close
+                    await asyncio.sleep(0.1)
+                    continue
+
+                # Turned away before a transport thread is spent on it
+                if not self.budget.acquire(addr[0]):
+                    client.close()
+                    continue
 
-            asyncio.create_task(self.handle_client(client, addr, host_key, loop))
+                self.connections_total.inc()
+                task = asyncio.create_task(self.handle_client(client, addr, loop))
+                self.clients.add(task)
+                task.add_done_callback(self.clients.discard)
+        finally:
+            stats_task.cancel()
+            logging.info("SSH handshake latency: %s", self.handshake_latency.summary())
+            if self.aggregator is not None:
+                self.aggregator.flush()
+            await self.incident_queue.close()
+            # Flush whatever is still buffered before the process exits
+            await get_shipper().close()
+            StageProfiler().close()
+            if metrics_dumper is not None:
+                metrics_dumper.close()
 
     def stop(self):
         # Close the listening socket to stop accepting new connections
         if self.sock:
             self.sock.close()
 
-        # Wait for the executor's tasks to finish (existing connections)
-        self.executor.shutdown(wait=True)
+    def emit_aggregate(self, bucket):
+        self.incident_queue.submit(bucket.ip_address, self.create_aggregated_incident, bucket)
+
+    async def create_aggregated_incident(self, bucket):
+        try:
+            with StageProfiler().trace("ssh.aggregate"):
+                with StageProfiler().stage("create_payload"):
+                    payload = SSHServer.create_aggregated_payload(bucket)
+                incident = Incident(payload)
+                await incident.create()
+        except ValueError as error:
+            logging.error("Failed to create incident: %s", str(error))
 
-    async def handle_client(self, client, addr, host_key, loop):
+    async def log_handshake_stats(self):
+        while True:
+            await asyncio.sleep(HANDSHAKE_STATS_INTERVAL)
+            logging.info("SSH handshake latency: %s", self.handshake_latency.summary())
+
+    def observe_handshake(self, transport, duration):
+        # The event is also set when negotiation fails
+        if transport.is_active():
+            self.handshake_latency.observe(duration)
+
+    async def handle_client(self, client, addr, loop):
         transport = None
+        relay = None
+        self.connections_active.inc()
         try:
-            transport = paramiko.Transport(client, (socket.getfqdn(""), 0))
-            transport.load_server_moduli()
-            transport.add_server_key(host_key)
-            server = SSHServer(transport, addr[0], loop)
-            transport.start_server(server=server)
+            if self.tarpit is not None:
+                # Relayed from the start, a source may cross the threshold
+                # on this very connection
+                relay = TarpitRelay(
+                    loop, lambda: self.tarpit.delay(addr[0]), self.tarpitted_total.inc
+                )
+                client = await relay.start(client)
+            client.setblocking(True)
+            transport = SSHTransport(client, loop)
+            self.handshake_cache.setup_transport(transport)
+            completion_event = HandshakeEvent(
+                loop,
+                # Tarpitted handshakes are slow on purpose, keep them out of
+                # the latency histogram
+                lambda duration: not (relay and relay.held)
+                and self.observe_handshake(transport, duration),
+            )
+            server = SSHServer(
+                transport,
+                addr[0],
+                loop,
+                completion_event,
+                self.aggregator,
+                self.incident_queue,
+                self.tarpit,
+            )
+            # Passing an event makes the handshake run on the transport thread
+            # instead of blocking the event loop
+            transport.start_server(event=server.completion_event, server=server)
 
             logging.info("SSH connection received from %s", addr)
 
-            while transport.is_active():
-                await asyncio.sleep(1)
-        except socket.error as err:
+            await transport.closed
+        except (socket.error, paramiko.SSHException) as err:
             logging.error("Failed to handle client: %s", str(err))
         finally:
             if transport is not None:
                 transport.close()
+            if relay is not None:
+                try:
+                    # The last responses held back still reach the client
+                    await relay.drain(self.tarpit.max_delay + RELAY_DRAIN_GRACE)
+                finally:
+                    relay.close()
+            self.connections_active.dec()
+            self.budget.release(addr[0])
@@ -0,0 +1,165 @@
+import asyncio
+import socket
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Optional
+
+# Source IPs whose attempts are remembered, least recently seen are evicted
+MAX_TRACKED = 100000
+
+
+class Tarpit:
+    # Counts password attempts per source IP. Once an IP has made
+    # `threshold` attempts without going quiet for `window` seconds, its
+    # connections are relayed with every response held back by `delay`
+    # seconds, doubling per further `threshold` attempts up to `max_delay`.
+    def __init__(
+        self,
+        threshold: int,
+        delay: float,
+        max_delay: float,
+        window: float,
+        max_tracked: int = MAX_TRACKED,
+        clock=time.monotonic,
+    ):
+        self.threshold = threshold
+        self.base_delay = delay
+        self.max_delay = max_delay
+        self.window = window
+        self.max_tracked = max_tracked
+        self.clock = clock
+        # ip address -> [attempts, last attempt time]
+        self.attempts: OrderedDict = OrderedDict()
+
+    def record(self, ip_address: str):
+        now = self.clock()
+        entry = self.attempts.get(ip_address)
+        if entry is None or now - entry[1] > self.window:
+            if entry is None and len(self.attempts) >= self.max_tracked:
+                self.attempts.popitem(last=False)
+            entry = [0, now]
+            self.attempts[ip_address] = entry
+        self.attempts.move_to_end(ip_address)
+        entry[0] += 1
+        entry[1] = now
+
+    def delay(self, ip_address: str) -> float:
+        entry = self.attempts.get(ip_address)
+        if entry is None or entry[0] < self.threshold:
+            return 0
+        if self.clock() - entry[1] > self.window:
+            return 0
+        doublings = min(entry[0] // self.threshold - 1, 16)
+        return min(self.max_delay, self.base_delay * 2**doublings)
+
+    @property
+    def tracked(self) -> int:
+        return len(self.attempts)
+
+
+class RelaySide(asyncio.Protocol):
+    def __init__(self, on_data: Callable[[bytes], None], on_lost: Callable[[], None]):
+        self.on_data = on_data
+        self.on_lost = on_lost
+        self.transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.on_data(data)
+
+    def connection_lost(self, exc):
+        self.on_lost()
+
+
+class TarpitRelay:
+    # Sits between the client socket and a socketpair handed to paramiko.
+    # Client data goes through untouched; what paramiko sends back is
+    # released by a single timer on the event loop once `delay()` seconds
+    # have passed, so the transport thread never sleeps and keeps the order
+    # of the data it wrote. `delay()` is asked again for every write, so a
+    # source crossing the threshold mid-session is slowed down right away.
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        delay: Callable[[], float],
+        on_held: Optional[Callable[[], None]] = None,
+    ):
+        self.loop = loop
+        self.delay = delay
+        self.on_held = on_held
+        self.client: Optional[RelaySide] = None
+        self.server: Optional[RelaySide] = None
+        # (release time, data) in the order paramiko wrote them
+        self.pending = deque()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.server_closed = False
+        # Whether any response was held back on this connection
+        self.held = False
+        self.finished = loop.create_future()
+
+    async def start(self, client_sock: socket.socket) -> socket.socket:
+        # Returns the socket paramiko should use in place of the client's
+        paramiko_sock, relay_sock = socket.socketpair()
+        # Paramiko does not write before start_server, so the server side
+        # is ready before the client can send anything
+        _, self.server = await self.loop.connect_accepted_socket(
+            lambda: RelaySide(self.from_server, self.server_lost), sock=relay_sock
+        )
+        _, self.client = await self.loop.connect_accepted_socket(
+            lambda: RelaySide(self.from_client, self.close), sock=client_sock
+        )
+        return paramiko_sock
+
+    def from_client(self, data: bytes):
+        self.server.transport.write(data)
+
+    def from_server(self, data: bytes):
+        delay = self.delay()
+        if delay <= 0 and not self.pending:
+            self.client.transport.write(data)
+            return
+        if delay > 0 and not self.held:
+            self.held = True
+            if self.on_held is not None:
+                self.on_held()
+        self.pending.append((self.loop.time() + delay, data))
+        if self.timer is None:
+            self.release()
+
+    def release(self):
+        self.timer = None
+        now = self.loop.time()
+        while self.pending and self.pending[0][0] <= now:
+            self.client.transport.write(self.pending.popleft()[1])
+        if self.pending:
+            self.timer = self.loop.call_at(self.pending[0][0], self.release)
+        elif self.server_closed:
+            self.client.transport.close()
+
+    def server_lost(self):
+        # Whatever paramiko wrote last still goes out at its release time
+        self.server_closed = True
+        if self.timer is None:
+            self.release()
+
+    async def drain(self, timeout: float):
+        # Waits up to `timeout` seconds for the responses still held back to
+        # be written out and the client connection to close
+        try:
+            await asyncio.wait_for(asyncio.shield(self.finished), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def close(self):
+        # Called once the client connection is gone, or to give up on it
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.pending.clear()
+        for side in (self.client, self.server):
+            if side is not None and side.transport is not None:
+                side.transport.abort()
+        if not self.finished.done():
+            self.finished.set_result(None)
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+import paramiko
+
+
+class SSHTransport(paramiko.Transport):
+    # Resolves `closed` on the event loop as soon as the transport thread
+    # exits, so connection teardown does not depend on polling is_active()
+    def __init__(self, sock, loop: asyncio.AbstractEventLoop, *args, **kwargs):
+        super().__init__(sock, *args, **kwargs)
+        self.loop = loop
+        self.closed = loop.create_future()
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            try:
+                self.loop.call_soon_threadsafe(self.notify_closed)
+            except RuntimeError:
+                # The event loop is already closed, nobody is waiting anymore
+                pass
+
+    def notify_closed(self):
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+class HandshakeEvent(threading.Event):
+    # Completion event for Transport.start_server that reports how long the
+    # negotiation took back to the event loop
+    def __init__(self, loop: asyncio.AbstractEventLoop, on_complete):
+        super().__init__()
+        self.loop = loop
+        self.on_complete = on_complete
+        self.started = time.perf_counter()
+
+    def set(self):
+        # Paramiko sets the event again when the transport stops
+        if self.is_set():
+            return
+        duration = time.perf_counter() - self.started
+        super().set()
+        try:
+            self.loop.call_soon_threadsafe(self.on_complete, duration)
+        except RuntimeError:
+            pass
@@ -0,0 +1,20 @@
+from typing import Any, Dict
+from src.helpers.configuration.configuration import Configuration
+from .tcp_protocol import HoneypotProtocol
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+
+class BannerProtocol(HoneypotProtocol):
+    # Sends SERVICE_BANNER_TEXT and records whatever the client sends back.
+    # Every connection is an incident, banner grabbers often send nothing.
+    __slots__ = ()
+
+    name = "banner"
+    incident_type = "BH-TCP"
+
+    def greeting(self) -> bytes:
+        return CONFIG.get("SERVICE_BANNER_TEXT").encode("utf-8") + b"\r\n"
+
+    def finish(self):
+        self.report({"commands": self.commands})
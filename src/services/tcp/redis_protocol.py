@@ -0,0 +1,67 @@
+from .tcp_protocol import HoneypotProtocol
+
+NOAUTH = b"-NOAUTH Authentication required.\r\n"
+WRONGPASS = b"-WRONGPASS invalid username-password pair or user is disabled.\r\n"
+
+
+class RedisProtocol(HoneypotProtocol):
+    # A password protected Redis: both RESP arrays and inline commands are
+    # parsed, AUTH is always refused and everything else needs it. One
+    # incident per connection with the commands and the credentials tried.
+    __slots__ = ("arguments", "expected", "credentials")
+
+    name = "redis"
+    incident_type = "BH-REDIS"
+
+    def __init__(self, service):
+        super().__init__(service)
+        self.arguments = []
+        self.expected = 0
+        self.credentials = []
+
+    def line_received(self, line: bytes):
+        if self.expected == 0:
+            if line.startswith(b"*"):
+                try:
+                    self.expected = int(line[1:])
+                except ValueError:
+                    self.expected = 0
+                if self.expected <= 0:
+                    self.send(b"-ERR Protocol error: invalid multibulk length\r\n")
+                    self.close()
+                return
+            # Inline command
+            self.command(line.split())
+            return
+
+        if line.startswith(b"$"):
+            return
+        self.arguments.append(line)
+        if len(self.arguments) == self.expected:
+            arguments, self.arguments, self.expected = self.arguments, [], 0
+            self.command(arguments)
+
+    def command(self, arguments):
+        if not arguments:
+            return
+        self.remember(b" ".join(arguments))
+        name = arguments[0].upper()
+        if name == b"AUTH" and len(arguments) > 1:
+            # AUTH <password> or AUTH <username> <password>
+            username = arguments[1] if len(arguments) > 2 else b"default"
+            self.credentials.append(
+                {
+                    "username": username.decode("utf-8", "backslashreplace"),
+                    "password": arguments[-1].decode("utf-8", "backslashreplace"),
+                }
+            )
+            self.send(WRONGPASS)
+        elif name == b"QUIT":
+            self.send(b"+OK\r\n")
+            self.close()
+        else:
+            self.send(NOAUTH)
+
+    def finish(self):
+        if self.commands:
+            self.report({"commands": self.commands, "credentials": self.credentials})
@@ -0,0 +1,28 @@
+from typing import Any, Dict
+from src.helpers.configuration.configuration import Configuration
+from .tcp_protocol import HoneypotProtocol
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+
+class ScanProtocol(HoneypotProtocol):
+    # Listens silently on every SCAN_PORTS port. A connection keeps at most
+    # SCAN_PAYLOAD_BYTES of the first data sent and is closed right after,
+    # then it is folded into the per source IP scan incident by the service.
+    __slots__ = ()
+
+    name = "scan"
+    incident_type = "BH-SCAN"
+    # One IPv4 socket per port instead of one per address family
+    host = "0.0.0.0"
+    # Scanners that wait for a banner get nothing, don't keep them around
+    idle_timeout = CONFIG.get("SCAN_IDLE_TIMEOUT")
+
+    def data_received(self, data):
+        self.buffer += data[: CONFIG.get("SCAN_PAYLOAD_BYTES")]
+        self.transport.close()
+
+    def finish(self):
+        port = self.transport.get_extra_info("sockname")[1]
+        payload = bytes(self.buffer).decode("utf-8", "backslashreplace")
+        self.service.aggregate(self.peer, self.incident_type, (port, payload))
@@ -0,0 +1,103 @@
+import base64
+import binascii
+from .tcp_protocol import HoneypotProtocol
+
+HOSTNAME = b"mail.localdomain"
+
+
+def decode_base64(data: bytes) -> str:
+    try:
+        return base64.b64decode(data, validate=True).decode("utf-8", "backslashreplace")
+    except (binascii.Error, ValueError):
+        return data.decode("utf-8", "backslashreplace")
+
+
+class SMTPProtocol(HoneypotProtocol):
+    # A Postfix lookalike that takes EHLO, refuses every AUTH attempt and
+    # relays nothing. One incident per connection with the commands, the
+    # credentials tried and the envelope.
+    __slots__ = ("state", "username", "credentials", "envelope")
+
+    name = "smtp"
+    incident_type = "BH-SMTP"
+
+    def __init__(self, service):
+        super().__init__(service)
+        # None, or the AUTH LOGIN prompt being answered
+        self.state = None
+        self.username = None
+        self.credentials = []
+        self.envelope = {}
+
+    def greeting(self) -> bytes:
+        return b"220 " + HOSTNAME + b" ESMTP Postfix (Ubuntu)\r\n"
+
+    def line_received(self, line: bytes):
+        if self.state == "username":
+            self.username = decode_base64(line)
+            self.state = "password"
+            self.send(b"334 UGFzc3dvcmQ6\r\n")
+            return
+        if self.state == "password":
+            self.refuse(self.username, decode_base64(line))
+            return
+
+        self.remember(line)
+        verb, _, argument = line.partition(b" ")
+        verb = verb.upper()
+        if verb in (b"EHLO", b"HELO"):
+            self.envelope["helo"] = argument.decode("utf-8", "backslashreplace")
+            if verb == b"EHLO":
+                self.send(
+                    b"250-" + HOSTNAME + b"\r\n250-PIPELINING\r\n250-SIZE 10240000\r\n"
+                    b"250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n"
+                )
+            else:
+                self.send(b"250 " + HOSTNAME + b"\r\n")
+        elif verb == b"AUTH":
+            self.authenticate(argument.split())
+        elif verb == b"MAIL":
+            self.envelope["mail_from"] = argument.decode("utf-8", "backslashreplace")
+            self.send(b"250 2.1.0 Ok\r\n")
+        elif verb == b"RCPT":
+            self.envelope.setdefault("rcpt_to", []).append(
+                argument.decode("utf-8", "backslashreplace")
+            )
+            self.send(b"454 4.7.1 Relay access denied\r\n")
+        elif verb == b"DATA":
+            self.send(b"554 5.5.1 Error: no valid recipients\r\n")
+        elif verb in (b"RSET", b"NOOP"):
+            self.send(b"250 2.0.0 Ok\r\n")
+        elif verb == b"QUIT":
+            self.send(b"221 2.0.0 Bye\r\n")
+            self.close()
+        else:
+            self.send(b"502 5.5.2 Error: command not recognized\r\n")
+
+    def authenticate(self, arguments):
+        mechanism = arguments[0].upper() if arguments else b""
+        if mechanism == b"LOGIN":
+            if len(arguments) > 1:
+                self.username = decode_base64(arguments[1])
+                self.state = "password"
+                self.send(b"334 UGFzc3dvcmQ6\r\n")
+            else:
+                self.state = "username"
+                self.send(b"334 VXNlcm5hbWU6\r\n")
+        elif mechanism == b"PLAIN" and len(arguments) > 1:
+            # authzid \0 authcid \0 password
+            parts = decode_base64(arguments[1]).split("\x00")
+            self.refuse(parts[-2] if len(parts) > 1 else "", parts[-1])
+        else:
+            self.send(b"504 5.5.4 Unrecognized authentication type\r\n")
+
+    def refuse(self, username: str, password: str):
+        self.state = None
+        self.credentials.append({"username": username, "password": password})
+        self.send(b"535 5.7.8 Error: authentication failed\r\n")
+
+    def finish(self):
+        if self.commands:
+            self.report(
+                {"commands": self.commands, "credentials": self.credentials, **self.envelope}
+            )
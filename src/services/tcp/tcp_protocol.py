@@ -0,0 +1,89 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+# Longest line kept, anything longer is cut and handled as a line
+MAX_LINE_BYTES = 4096
+
+# Commands kept per connection in the incident metadata
+MAX_COMMANDS = 32
+
+
+class HoneypotProtocol(asyncio.Protocol):
+    # Base of the line based TCP pots. One instance per connection holding
+    # only what is declared in __slots__; idle connections are closed by the
+    # service's sweep rather than a timer per connection. Subclasses send a
+    # greeting, answer lines and report incidents through the service.
+    __slots__ = ("service", "transport", "peer", "buffer", "last_seen", "commands")
+
+    name = "tcp"
+    incident_type = "BH-TCP"
+    # Address the pot binds, None for every IPv4 and IPv6 address
+    host = None
+    # Seconds without data before the sweep closes the connection, None for
+    # the service's TCP_IDLE_TIMEOUT
+    idle_timeout = None
+
+    def __init__(self, service):
+        self.service = service
+        self.transport: Optional[asyncio.Transport] = None
+        self.peer = None
+        self.buffer = bytearray()
+        self.last_seen = 0.0
+        self.commands = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+        peername = transport.get_extra_info("peername")
+        self.peer = peername[0] if peername else None
+        if self.peer is None or not self.service.admit(self):
+            transport.abort()
+            return
+        self.last_seen = self.service.loop.time()
+        greeting = self.greeting()
+        if greeting:
+            transport.write(greeting)
+
+    def data_received(self, data):
+        self.last_seen = self.service.loop.time()
+        self.buffer += data
+        while not self.transport.is_closing():
+            index = self.buffer.find(b"\n")
+            if index < 0:
+                if len(self.buffer) > MAX_LINE_BYTES:
+                    line = bytes(self.buffer[:MAX_LINE_BYTES])
+                    self.buffer.clear()
+                    self.line_received(line)
+                return
+            line = bytes(self.buffer[: min(index, MAX_LINE_BYTES)]).rstrip(b"\r")
+            del self.buffer[: index + 1]
+            self.line_received(line)
+
+    def connection_lost(self, exc):
+        if self.service.release(self):
+            self.finish()
+
+    def greeting(self) -> bytes:
+        return b""
+
+    def line_received(self, line: bytes):
+        self.remember(line)
+
+    def finish(self):
+        # Called once the connection is gone, by default one incident with
+        # every command the client sent
+        if self.commands:
+            self.report({"commands": self.commands})
+
+    def remember(self, line: bytes):
+        if len(self.commands) < MAX_COMMANDS:
+            self.commands.append(line.decode("utf-8", "backslashreplace"))
+
+    def send(self, data: bytes):
+        self.transport.write(data)
+
+    def close(self):
+        self.transport.close()
+
+    def report(self, metadata: Dict[str, Any]):
+        port = self.transport.get_extra_info("sockname")[1]
+        self.service.report(self.peer, self.incident_type, {"port": port, **metadata})
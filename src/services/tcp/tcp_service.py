@@ -0,0 +1,248 @@
+import asyncio
+from datetime import datetime
+import logging
+from typing import Any, Dict, List, Set, Tuple, Type
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.metrics_registry import MetricsRegistry, start_metrics_dumper
+from src.helpers.metrics.stage_profiler import StageProfiler
+from src.incidents.incident import Incident
+from src.incidents.incident_aggregator import AggregateBucket, IncidentAggregator
+from src.incidents.incident_forwarder import get_shipper
+from src.incidents.incident_queue import IncidentQueue
+from src.incidents.incident_record import IncidentRecord
+from src.incidents.ip_enricher import IPEnricher
+from .banner_protocol import BannerProtocol
+from .redis_protocol import RedisProtocol
+from .scan_protocol import ScanProtocol
+from .smtp_protocol import SMTPProtocol
+from .tcp_protocol import HoneypotProtocol
+from .telnet_protocol import TelnetProtocol
+
+CONFIG: Dict[str, Any] = Configuration().get_config()
+
+# How often idle connections are looked for
+SWEEP_INTERVAL = 1
+
+# Protocol and config key prefix of every TCP pot
+PROTOCOLS: List[Tuple[Type[HoneypotProtocol], str]] = [
+    (TelnetProtocol, "SERVICE_TELNET"),
+    (RedisProtocol, "SERVICE_REDIS"),
+    (SMTPProtocol, "SERVICE_SMTP"),
+    (BannerProtocol, "SERVICE_BANNER"),
+]
+
+
+def configured_listeners() -> List[Tuple[Type[HoneypotProtocol], int]]:
+    listeners = [
+        (protocol, CONFIG.get(f"{prefix}_PORT"))
+        for protocol, prefix in PROTOCOLS
+        if CONFIG.get(f"{prefix}_ENABLED")
+    ]
+    if CONFIG.get("SCAN_ENABLED"):
+        # The scan sensor takes every port in SCAN_PORTS no other service uses
+        taken = {port for _, port in listeners}
+        for prefix in ("SERVICE_HTTP", "SERVICE_SSH", "METRICS"):
+            if CONFIG.get(f"{prefix}_ENABLED"):
+                taken.add(CONFIG.get(f"{prefix}_PORT"))
+        listeners += [
+            (ScanProtocol, port) for port in CONFIG.get("SCAN_PORTS") if port not in taken
+        ]
+    return listeners
+
+
+def raise_open_files_limit():
+    # Every scanned port is a listening socket, the default soft limit of
+    # 1024 descriptors is easily reached
+    try:
+        import resource
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError) as error:
+        logging.warning("Could not raise the open files limit: %s", error)
+
+
+class TCPService:
+    # Runs every enabled asyncio.Protocol pot on a single event loop. A
+    # connection costs one small protocol object and its transport, there
+    # is no task or thread per connection, so one process can hold tens of
+    # thousands of idle bots. New pots subclass HoneypotProtocol and get an
+    # entry in PROTOCOLS.
+    def __init__(self, listeners: List[Tuple[Type[HoneypotProtocol], int]]):
+        self.listeners = listeners
+        self.loop = None
+        self.servers = []
+        self.connections: Set[HoneypotProtocol] = set()
+        self.max_connections = CONFIG.get("TCP_MAX_CONNECTIONS")
+        self.idle_timeout = CONFIG.get("TCP_IDLE_TIMEOUT")
+        self.incident_queue = IncidentQueue(
+            "tcp",
+            size=CONFIG.get("INCIDENT_QUEUE_SIZE"),
+            workers=CONFIG.get("INCIDENT_QUEUE_WORKERS"),
+            policy=CONFIG.get("INCIDENT_QUEUE_POLICY"),
+        )
+        self.connections_total = {}
+        self.connections_active = {}
+        for protocol, _ in listeners:
+            self.connections_total[protocol.name] = MetricsRegistry().counter(
+                "collector_connections_total",
+                "Connections accepted by a service",
+                service=protocol.name,
+            )
+            self.connections_active[protocol.name] = MetricsRegistry().gauge(
+                "collector_connections_active",
+                "Connections currently open on a service",
+                service=protocol.name,
+            )
+        self.rejected = MetricsRegistry().counter(
+            "collector_tcp_connections_rejected_total",
+            "TCP connections closed right away because TCP_MAX_CONNECTIONS were open",
+        )
+        # Folds the scan sensor connections into one incident per source IP
+        self.aggregator = IncidentAggregator(
+            window=CONFIG.get("SCAN_WINDOW"),
+            max_samples=CONFIG.get("SCAN_MAX_SAMPLES"),
+            emit=self.emit_scan,
+        )
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        get_shipper().start()
+        if CONFIG.get("ENRICHMENT_ENABLED"):
+            # Loads the IP databases before the first incident
+            IPEnricher()
+        metrics_dumper = start_metrics_dumper()
+        StageProfiler().start()
+
+        sweep_task = None
+        try:
+            scan_ports = [port for protocol, port in self.listeners if protocol is ScanProtocol]
+            if len(scan_ports) > 100:
+                raise_open_files_limit()
+            for protocol, port in self.listeners:
+                if protocol is not ScanProtocol:
+                    await self.listen(protocol, port)
+                    logging.info("%s pot listening on port %s", protocol.name, port)
+            if scan_ports:
+                await self.listen_scan_ports(scan_ports)
+            sweep_task = asyncio.create_task(self.sweep())
+            await asyncio.Event().wait()
+        finally:
+            if sweep_task is not None:
+                sweep_task.cancel()
+            for server in self.servers:
+                server.close()
+            # Connections report their incident as they are closed
+            for connection in list(self.connections):
+                connection.transport.abort()
+            await asyncio.sleep(0)
+            self.aggregator.flush()
+            await self.incident_queue.close()
+            # Flush whatever is still buffered before the process exits
+            await get_shipper().close()
+            StageProfiler().close()
+            if metrics_dumper is not None:
+                metrics_dumper.close()
+
+    async def listen(self, protocol: Type[HoneypotProtocol], port: int):
+        self.servers.append(
+            await self.loop.create_server(
+                lambda: protocol(self),
+                host=protocol.host,
+                port=port,
+                reuse_address=True,
+                backlog=CONFIG.get("TCP_BACKLOG"),
+            )
+        )
+
+    async def listen_scan_ports(self, ports: List[int]):
+        # Ports taken by other programs or needing root are skipped, the
+        # sensor covers whatever it can bind
+        skipped = {}
+        for port in ports:
+            try:
+                await self.listen(ScanProtocol, port)
+            except OSError as error:
+                skipped[port] = error.strerror
+        logging.info("scan sensor listening on %s ports", len(ports) - len(skipped))
+        if skipped:
+            logging.warning(
+                "scan sensor skipped %s ports: %s",
+                len(skipped),
+                ", ".join(f"{port} ({reason})" for port, reason in list(skipped.items())[:10]),
+            )
+
+    def admit(self, connection: HoneypotProtocol) -> bool:
+        if len(self.connections) >= self.max_connections:
+            self.rejected.inc()
+            return False
+        self.connections.add(connection)
+        self.connections_total[connection.name].inc()
+        self.connections_active[connection.name].inc()
+        return True
+
+    def release(self, connection: HoneypotProtocol) -> bool:
+        # False for connections that were never admitted
+        if connection not in self.connections:
+            return False
+        self.connections.discard(connection)
+        self.connections_active[connection.name].dec()
+        return True
+
+    async def sweep(self):
+        # One pass over the open connections per interval instead of a timer
+        # per connection rescheduled on every read
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            now = self.loop.time()
+            for connection in [
+                c
+                for c in self.connections
+                if now - c.last_seen > (c.idle_timeout or self.idle_timeout)
+            ]:
+                connection.transport.close()
+
+    def report(self, ip_address: str, incident_type: str, metadata: Dict[str, Any]):
+        record = IncidentRecord(
+            ip_address=ip_address,
+            incident_type=incident_type,
+            happened_at=datetime.now(),
+            metadata=metadata,
+        )
+        self.incident_queue.submit(ip_address, self.create_incident, record)
+
+    def aggregate(self, ip_address: str, incident_type: str, sample: Tuple[int, str]):
+        self.aggregator.add(ip_address, incident_type, sample)
+
+    def emit_scan(self, bucket: AggregateBucket):
+        duration = (
+            datetime.fromisoformat(bucket.last_seen) - datetime.fromisoformat(bucket.first_seen)
+        ).total_seconds()
+        payloads = {}
+        for port, payload in bucket.samples:
+            if payload:
+                payloads.setdefault(payload, port)
+        self.report(
+            bucket.ip_address,
+            bucket.incident_type,
+            {
+                "ports": sorted({port for port, _ in bucket.samples}),
+                "connections": bucket.attempts,
+                "first_seen": bucket.first_seen,
+                "last_seen": bucket.last_seen,
+                # Connections per second, over at least one second
+                "rate": round(bucket.attempts / max(duration, 1), 2),
+                "payloads": [
+                    {"port": port, "payload": payload} for payload, port in payloads.items()
+                ],
+                "dropped_samples": bucket.dropped_samples,
+            },
+        )
+
+    async def create_incident(self, record: IncidentRecord):
+        try:
+            with StageProfiler().trace("tcp.incident"):
+                await Incident(record).create()
+        except ValueError as error:
+            logging.error("Failed to create incident: %s", str(error))
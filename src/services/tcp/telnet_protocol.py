@@ -0,0 +1,71 @@
+from .tcp_protocol import HoneypotProtocol
+
+IAC = 255
+SB = 250
+SE = 240
+
+# IAC WILL ECHO, IAC WILL SUPPRESS-GO-AHEAD: the client stops echoing so the
+# password prompt looks real
+NEGOTIATION = bytes([IAC, 251, 1, IAC, 251, 3])
+
+LOGIN_ATTEMPTS = 3
+
+
+def strip_telnet_commands(data: bytes) -> bytes:
+    # Drops IAC negotiation and subnegotiation sequences from the input
+    if IAC not in data:
+        return data
+    output = bytearray()
+    index = 0
+    while index < len(data):
+        byte = data[index]
+        if byte != IAC:
+            output.append(byte)
+            index += 1
+        elif index + 1 < len(data) and data[index + 1] == IAC:
+            output.append(IAC)
+            index += 2
+        elif index + 1 < len(data) and data[index + 1] == SB:
+            end = data.find(bytes([IAC, SE]), index + 2)
+            index = len(data) if end < 0 else end + 2
+        elif index + 1 < len(data) and 251 <= data[index + 1] <= 254:
+            index += 3
+        else:
+            index += 2
+    return bytes(output)
+
+
+class TelnetProtocol(HoneypotProtocol):
+    # A login prompt that never accepts anything, one incident per attempt
+    __slots__ = ("username", "attempts")
+
+    name = "telnet"
+    incident_type = "BH-TELNET"
+
+    def __init__(self, service):
+        super().__init__(service)
+        self.username = None
+        self.attempts = 0
+
+    def greeting(self) -> bytes:
+        return NEGOTIATION + b"\r\nUbuntu 20.04.6 LTS\r\nlogin: "
+
+    def line_received(self, line: bytes):
+        text = strip_telnet_commands(line).decode("utf-8", "backslashreplace").strip("\x00")
+        if self.username is None:
+            self.username = text
+            self.send(b"Password: ")
+            return
+
+        self.attempts += 1
+        self.report({"username": self.username, "password": text, "attempt": self.attempts})
+        self.username = None
+        if self.attempts >= LOGIN_ATTEMPTS:
+            self.send(b"\r\nLogin incorrect\r\n")
+            self.close()
+        else:
+            self.send(b"\r\nLogin incorrect\r\nlogin: ")
+
+    def finish(self):
+        # Attempts were reported as they came
+        pass
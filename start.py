@@ -1,61 +1,85 @@
 import asyncio
+import os
+import signal
+import socket
 import sys
+import time
 import logging
 from multiprocessing import Process
 from typing import Dict, Any
 from src.helpers.configuration.configuration import Configuration
+from src.helpers.logs.log_pipeline import log_pipeline
+from src.helpers.metrics.metrics_exporter import MetricsExporter, remove_snapshots
+from src.incidents.incident_forwarder import shipper_process_enabled
+from src.incidents.incident_shipper_server import IncidentShipperServer
 from src.services.http.http_service import HTTPService
 from src.services.ssh.ssh_service import SSHService
+from src.services.tcp.tcp_service import TCPService, configured_listeners
 
 CONFIG: Dict[str, Any] = Configuration().get_config()
 
-log_level_str = CONFIG.get("LOGGING_LEVEL")
-log_level = getattr(logging, log_level_str.upper(), logging.WARNING)
+# Seconds the services get to shut down on their own after Ctrl+C
+SHUTDOWN_GRACE_PERIOD = 10
 
+logger = logging.getLogger()
 
-class ColoredFormatter(logging.Formatter):
-    COLORS = {
-        "DEBUG": "\033[36m",  # Cyan
-        "INFO": "\033[32m",  # Green
-        "WARNING": "\033[33m",  # Yellow
-        "ERROR": "\033[31m",  # Red
-        "CRITICAL": "\033[41m",  # Red background
-    }
 
-    RESET = "\033[0m"  # Reset all colors and styles
+def start_http_service(port: int, reuse_port: bool = False):
+    with log_pipeline():
+        logger.info("Starting HTTP Service pot")
+        http_service = HTTPService(port, reuse_port=reuse_port)
+        http_service.run()
 
-    def format(self, record):
-        colored_record = record
-        levelname = colored_record.levelname
-        seq = self.COLORS.get(levelname, self.RESET)
-        colored_levelname = f"{seq}{levelname}{self.RESET}"
-        colored_record.levelname = colored_levelname
-        return super().format(colored_record)
 
+def get_http_workers() -> int:
+    workers = CONFIG.get("SERVICE_HTTP_WORKERS")
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        logger.warning("SO_REUSEPORT is not supported here, starting a single HTTP worker")
+        return 1
+    return workers
 
-handler = logging.StreamHandler()
-handler.setFormatter(
-    ColoredFormatter(
-        "%(asctime)s.%(msecs)03d [%(levelname)s] %(module)s - %(funcName)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
-)
 
-logger = logging.getLogger()
-logger.setLevel(log_level)
-logger.addHandler(handler)
+def start_ssh_service(port: int):
+    with log_pipeline():
+        logger.info("Starting SSH Service pot")
+        ssh_service = SSHService(port)
+        asyncio.run(ssh_service.run())
 
 
-def start_http_service(port: int):
-    logger.info("Starting HTTP Service pot")
-    http_service = HTTPService(port)
-    http_service.run()
+def start_tcp_service(listeners):
+    with log_pipeline():
+        logger.info("Starting TCP Service pots")
+        tcp_service = TCPService(listeners)
+        asyncio.run(tcp_service.run())
 
 
-def start_ssh_service(port: int):
-    logger.info("Starting SSH Service pot")
-    ssh_service = SSHService(port)
-    asyncio.run(ssh_service.run())
+def start_shipper_process(socket_path: str):
+    with log_pipeline():
+        logger.info("Starting incident shipper")
+        shipper_server = IncidentShipperServer(socket_path)
+        shipper_server.run()
+
+
+def start_metrics_exporter(host: str, port: int):
+    with log_pipeline():
+        logger.info("Starting metrics exporter")
+        # Snapshots older than a few dump intervals belong to dead processes
+        stale_after = max(60, 3 * CONFIG.get("METRICS_DUMP_INTERVAL"))
+        exporter = MetricsExporter(CONFIG.get("METRICS_DIR"), host, port, stale_after)
+        exporter.run()
+
+
+def forward_profile_signal(processes):
+    # `kill -USR1 <start.py pid>` makes every service dump its pipeline profile
+    services = [p for p in processes if p.name != "metrics-exporter"]
+
+    def forward(signum, frame):
+        for p in services:
+            if p.is_alive():
+                os.kill(p.pid, signum)
+
+    signal.signal(signal.SIGUSR1, forward)
+
 
 def print_banner():
     print("""
@@ -70,33 +94,80 @@ def print_banner():
     """)
 
 if __name__ == "__main__":
-    print_banner()
-    processes = []
-
-    try:
-        if CONFIG.get("SERVICE_HTTP_ENABLED"):
-            http_port = CONFIG.get("SERVICE_HTTP_PORT")
-            p = Process(target=start_http_service, args=(http_port,))
-            p.start()
-            processes.append(p)
-
-        if CONFIG.get("SERVICE_SSH_ENABLED"):
-            ssh_port = CONFIG.get("SERVICE_SSH_PORT")
-            p = Process(target=start_ssh_service, args=(ssh_port,))
-            p.start()
-            processes.append(p)
-
-        # wait for all processes to finish
-        for p in processes:
-            p.join()
-
-    except KeyboardInterrupt:
-        logger.info("Caught keyboard interrupt. Gracefully terminating services...")
-
-        # Stop all running processes
-        for p in processes:
-            p.terminate()
-            p.join()
-
-        logger.info("All services terminated. Exiting...")
-        sys.exit(0)
+    with log_pipeline():
+        print_banner()
+        processes = []
+
+        try:
+            if CONFIG.get("METRICS_ENABLED"):
+                remove_snapshots(CONFIG.get("METRICS_DIR"))
+                p = Process(
+                    target=start_metrics_exporter,
+                    args=(CONFIG.get("METRICS_HOST"), CONFIG.get("METRICS_PORT")),
+                    name="metrics-exporter",
+                )
+                p.start()
+                processes.append(p)
+
+            # Started before the services, which retry until its socket is up
+            if shipper_process_enabled():
+                p = Process(
+                    target=start_shipper_process,
+                    args=(CONFIG.get("SHIPPER_SOCKET"),),
+                    name="incident-shipper",
+                )
+                p.start()
+                processes.append(p)
+
+            if CONFIG.get("SERVICE_HTTP_ENABLED"):
+                http_port = CONFIG.get("SERVICE_HTTP_PORT")
+                http_workers = get_http_workers()
+                # Workers share the port through SO_REUSEPORT and the kernel spreads
+                # connections across them, each worker keeps its own rate limits
+                for index in range(http_workers):
+                    name = "http-service" if http_workers == 1 else f"http-service-{index}"
+                    p = Process(
+                        target=start_http_service,
+                        args=(http_port, http_workers > 1),
+                        name=name,
+                    )
+                    p.start()
+                    processes.append(p)
+
+            if CONFIG.get("SERVICE_SSH_ENABLED"):
+                ssh_port = CONFIG.get("SERVICE_SSH_PORT")
+                p = Process(target=start_ssh_service, args=(ssh_port,), name="ssh-service")
+                p.start()
+                processes.append(p)
+
+            # Telnet, Redis, SMTP and banner pots share one process
+            tcp_listeners = configured_listeners()
+            if tcp_listeners:
+                p = Process(target=start_tcp_service, args=(tcp_listeners,), name="tcp-service")
+                p.start()
+                processes.append(p)
+
+            # Installed after forking so that services never inherit it
+            if CONFIG.get("PROFILE_ENABLED") and hasattr(signal, "SIGUSR1"):
+                forward_profile_signal(processes)
+
+            # wait for all processes to finish
+            for p in processes:
+                p.join()
+
+        except KeyboardInterrupt:
+            logger.info("Caught keyboard interrupt. Gracefully terminating services...")
+
+            # Ctrl+C reaches the whole process group, give the services a moment
+            # to flush their buffers and dump their profiles before terminating
+            deadline = time.monotonic() + SHUTDOWN_GRACE_PERIOD
+            for p in processes:
+                p.join(timeout=max(0, deadline - time.monotonic()))
+
+            # Stop all running processes
+            for p in processes:
+                p.terminate()
+                p.join()
+
+            logger.info("All services terminated. Exiting...")
+            sys.exit(0)
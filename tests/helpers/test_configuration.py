@@ -12,10 +12,106 @@ class TestConfiguration(unittest.TestCase):
             "COLLECTOR_ID": "ABCDEFGH-123",
             "LOGGING_LEVEL": "INFO",
             "LOGGING_ENABLED": True,
+            "LOGGING_ASYNC": True,
+            "LOGGING_FORMAT": "text",
+            "LOGGING_QUEUE_SIZE": 10000,
+            "LOGGING_RATE_LIMIT": 20,
             "SERVICE_HTTP_ENABLED": True,
             "SERVICE_HTTP_PORT": 8080,
             "SERVICE_SSH_ENABLED": False,
             "SERVICE_SSH_PORT": 22,
+            "API_BATCH_SIZE": 100,
+            "API_FLUSH_INTERVAL_MS": 1000,
+            "API_POOL_SIZE": 10,
+            "API_BATCH_FORMAT": "ndjson",
+            "API_BATCH_RETRY_INTERVAL": 3600,
+            "API_COMPRESSION": "gzip",
+            "API_COMPRESSION_LEVEL": 6,
+            "API_TIMEOUT_MS": 5000,
+            "API_RETRIES": 2,
+            "API_RETRY_BACKOFF_MS": 200,
+            "API_LATENCY_TARGET_MS": 1000,
+            "API_BREAKER_FAILURES": 5,
+            "API_BREAKER_COOLDOWN_MS": 1000,
+            "API_BREAKER_MAX_COOLDOWN_MS": 60000,
+            "INCIDENT_QUEUE_SIZE": 10000,
+            "INCIDENT_QUEUE_WORKERS": 100,
+            "INCIDENT_QUEUE_POLICY": "fair_share",
+            "ENRICHMENT_ENABLED": False,
+            "ENRICHMENT_DATABASES": [],
+            "ENRICHMENT_REVERSE_DNS": True,
+            "ENRICHMENT_DNS_TIMEOUT_MS": 1000,
+            "ENRICHMENT_DNS_WORKERS": 4,
+            "ENRICHMENT_CACHE_SIZE": 10000,
+            "ENRICHMENT_CACHE_TTL": 3600,
+            "ENRICHMENT_IPV4_PREFIX": 24,
+            "ENRICHMENT_IPV6_PREFIX": 48,
+            "SHIPPER_PROCESS_ENABLED": True,
+            "SHIPPER_SOCKET": "shipper.sock",
+            "SHIPPER_FORWARD_QUEUE": 10000,
+            "PAYLOAD_DEDUP_ENABLED": False,
+            "PAYLOAD_DEDUP_CACHE_SIZE": 10000,
+            "SPOOL_ENABLED": False,
+            "SPOOL_DIR": "spool",
+            "SPOOL_SEGMENT_BYTES": 16777216,
+            "SPOOL_MAX_SEGMENTS": 64,
+            "SPOOL_FSYNC_BATCH": 100,
+            "SPOOL_REPLAY_RATE": 500,
+            "STORE_ENABLED": False,
+            "STORE_PATH": "incidents.db",
+            "STORE_BATCH_SIZE": 500,
+            "STORE_FLUSH_INTERVAL_MS": 1000,
+            "STORE_RETENTION_DAYS": 30,
+            "SERVICE_TELNET_ENABLED": False,
+            "SERVICE_TELNET_PORT": 2323,
+            "SERVICE_REDIS_ENABLED": False,
+            "SERVICE_REDIS_PORT": 6379,
+            "SERVICE_SMTP_ENABLED": False,
+            "SERVICE_SMTP_PORT": 2525,
+            "SERVICE_BANNER_ENABLED": False,
+            "SERVICE_BANNER_PORT": 2121,
+            "SERVICE_BANNER_TEXT": "220 (vsFTPd 3.0.3)",
+            "TCP_MAX_CONNECTIONS": 20000,
+            "TCP_IDLE_TIMEOUT": 60,
+            "TCP_BACKLOG": 1024,
+            "SCAN_ENABLED": False,
+            "SCAN_PORTS": list(range(1, 1025)),
+            "SCAN_WINDOW": 60,
+            "SCAN_MAX_SAMPLES": 100,
+            "SCAN_PAYLOAD_BYTES": 64,
+            "SCAN_IDLE_TIMEOUT": 10,
+            "SSH_HOST_KEY_TYPES": ["rsa"],
+            "SERVICE_HTTP_WORKERS": 1,
+            "HTTP_DECOY_DIR": "decoys",
+            "HTTP_SIGNATURES_FILE": "signatures/http.rules",
+            "HTTP_SIGNATURES_BODY_BYTES": 8192,
+            "HTTP_BODY_CAPTURE_BYTES": 65536,
+            "HTTP_BODY_MAX_BYTES": 16777216,
+            "HTTP_RATE_LIMIT_RATE": 10,
+            "HTTP_RATE_LIMIT_BURST": 1000,
+            "HTTP_RATE_LIMIT_MAX_TRACKED": 100000,
+            "HTTP_RATE_LIMIT_IPV4_PREFIX": 32,
+            "HTTP_RATE_LIMIT_IPV6_PREFIX": 64,
+            "SSH_AGGREGATION_ENABLED": True,
+            "SSH_AGGREGATION_WINDOW": 60,
+            "SSH_AGGREGATION_MAX_CREDENTIALS": 100,
+            "SSH_MAX_CONNECTIONS": 1000,
+            "SSH_MAX_CONNECTIONS_PER_IP": 10,
+            "SSH_TARPIT_ENABLED": False,
+            "SSH_TARPIT_THRESHOLD": 10,
+            "SSH_TARPIT_DELAY_MS": 1000,
+            "SSH_TARPIT_MAX_DELAY_MS": 10000,
+            "SSH_TARPIT_WINDOW": 3600,
+            "METRICS_ENABLED": False,
+            "METRICS_HOST": "127.0.0.1",
+            "METRICS_PORT": 9108,
+            "METRICS_DIR": "metrics",
+            "METRICS_DUMP_INTERVAL": 5,
+            "PROFILE_ENABLED": False,
+            "PROFILE_SAMPLE_RATE": 100,
+            "PROFILE_TRACEMALLOC": False,
+            "PROFILE_DUMP_INTERVAL": 0,
+            "PROFILE_DIR": "profiles",
         }
 
         # Define a few invalid configurations for testing
@@ -28,6 +124,9 @@ class TestConfiguration(unittest.TestCase):
         self.invalid_service_http_port_config = self.valid_config.copy()
         self.invalid_service_http_port_config["SERVICE_HTTP_PORT"] = "not an integer"
 
+        self.invalid_service_http_workers_config = self.valid_config.copy()
+        self.invalid_service_http_workers_config["SERVICE_HTTP_WORKERS"] = 0
+
     def test_validate_config(self):
         # Test validating a valid configuration
         Configuration.validate_config(self.valid_config)
@@ -44,6 +143,20 @@ class TestConfiguration(unittest.TestCase):
         with self.assertRaises(ValueError):
             Configuration.validate_config(self.invalid_service_http_port_config)
 
+        # Test validating an invalid configuration with no HTTP workers
+        with self.assertRaises(ValueError):
+            Configuration.validate_config(self.invalid_service_http_workers_config)
+
+    def test_parse_port_ranges(self):
+        self.assertEqual(Configuration.parse_port_ranges("25,21-23,22"), [21, 22, 23, 25])
+        self.assertEqual(Configuration.parse_port_ranges(""), [])
+        self.assertIsNone(Configuration.parse_port_ranges("21-ftp"))
+
+        config = self.valid_config.copy()
+        config["SCAN_PORTS"] = [0, 80]
+        with self.assertRaises(ValueError):
+            Configuration.validate_config(config)
+
 
 if __name__ == "__main__":
     unittest.main()
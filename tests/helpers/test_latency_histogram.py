@@ -0,0 +1,27 @@
+import unittest
+from src.helpers.metrics.latency_histogram import LatencyHistogram
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_observe(self):
+        histogram = LatencyHistogram(buckets=(0.01, 0.1, 1.0))
+        for value in (0.005, 0.05, 0.05, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.sum, 2.605)
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(1.0), float("inf"))
+
+    def test_summary(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.summary(), "no observations")
+
+        histogram.observe(0.02)
+        self.assertIn("count=1", histogram.summary())
+        self.assertIn("<=25ms 1", histogram.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import logging
+import queue
+import unittest
+from unittest.mock import patch
+from src.helpers.logs.log_pipeline import (
+    ColoredFormatter,
+    DroppingQueueHandler,
+    JsonFormatter,
+    RateLimitFilter,
+)
+
+
+def make_record(msg="Login attempt from %s", args=("127.0.0.1",), lineno=10):
+    return logging.LogRecord("root", logging.INFO, "ssh_server.py", lineno, msg, args, None)
+
+
+class TestLogPipeline(unittest.TestCase):
+    @patch("src.helpers.logs.log_pipeline.time.monotonic")
+    def test_rate_limit_per_call_site(self, monotonic):
+        monotonic.return_value = 100.0
+        rate_limit = RateLimitFilter(2)
+
+        self.assertTrue(rate_limit.filter(make_record()))
+        self.assertTrue(rate_limit.filter(make_record()))
+        self.assertFalse(rate_limit.filter(make_record()))
+        self.assertFalse(rate_limit.filter(make_record()))
+        # Other logging calls have their own budget
+        self.assertTrue(rate_limit.filter(make_record(lineno=20)))
+
+        monotonic.return_value = 101.0
+        record = make_record()
+        self.assertTrue(rate_limit.filter(record))
+        self.assertEqual(
+            record.getMessage(), "Login attempt from 127.0.0.1 (2 similar messages suppressed)"
+        )
+
+    def test_colored_formatter_does_not_change_the_record(self):
+        record = make_record()
+        output = ColoredFormatter("[%(levelname)s] %(message)s").format(record)
+
+        self.assertEqual(output, "[\033[32mINFO\033[0m] Login attempt from 127.0.0.1")
+        self.assertEqual(record.levelname, "INFO")
+
+    def test_json_formatter(self):
+        entry = json.loads(JsonFormatter().format(make_record()))
+
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["message"], "Login attempt from 127.0.0.1")
+
+    def test_queue_handler_drops_when_full(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        dropped = handler.dropped.value
+
+        handler.handle(make_record())
+        handler.handle(make_record())
+
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(handler.dropped.value, dropped + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
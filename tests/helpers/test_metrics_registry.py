@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from src.helpers.metrics.metrics_exporter import MetricsExporter
+from src.helpers.metrics.metrics_registry import (
+    GAUGE,
+    MetricsDumper,
+    MetricsRegistry,
+    render_prometheus,
+)
+
+
+def find(snapshot, name):
+    return next(metric for metric in snapshot["metrics"] if metric["name"] == name)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_counters_are_shared_by_name_and_labels(self):
+        registry = MetricsRegistry()
+        first = registry.counter("test_events_total", "Events", kind="a")
+        second = registry.counter("test_events_total", "Events", kind="a")
+        other = registry.counter("test_events_total", "Events", kind="b")
+
+        first.inc()
+        second.inc(2)
+        other.inc()
+
+        self.assertIs(first, second)
+        samples = find(registry.snapshot(), "test_events_total")["samples"]
+        self.assertIn({"labels": {"kind": "a"}, "value": 3}, samples)
+        self.assertIn({"labels": {"kind": "b"}, "value": 1}, samples)
+
+    def test_type_conflict(self):
+        MetricsRegistry().counter("test_conflict", "Conflict")
+        with self.assertRaises(ValueError):
+            MetricsRegistry().gauge("test_conflict", "Conflict")
+
+    def test_callback_is_read_at_snapshot_time(self):
+        queue = []
+        MetricsRegistry().callback("test_queue_depth", GAUGE, "Depth", lambda: len(queue))
+        queue.extend([1, 2])
+
+        samples = find(MetricsRegistry().snapshot(), "test_queue_depth")["samples"]
+        self.assertEqual(samples, [{"labels": {}, "value": 2}])
+
+    def test_render_prometheus(self):
+        histogram = MetricsRegistry().histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        MetricsRegistry().counter("test_rendered_total", "Rendered", path='a"b').inc()
+
+        text = render_prometheus([MetricsRegistry().snapshot()])
+        process = MetricsRegistry().snapshot()["process"]
+
+        self.assertIn("# TYPE test_latency_seconds histogram", text)
+        self.assertIn(f'test_latency_seconds_bucket{{process="{process}",le="0.1"}} 1', text)
+        self.assertIn(f'test_latency_seconds_bucket{{process="{process}",le="1.0"}} 2', text)
+        self.assertIn(f'test_latency_seconds_bucket{{process="{process}",le="+Inf"}} 3', text)
+        self.assertIn(f'test_latency_seconds_count{{process="{process}"}} 3', text)
+        self.assertIn(f'test_rendered_total{{path="a\\"b",process="{process}"}} 1', text)
+
+
+class TestMetricsExporter(unittest.TestCase):
+    def test_dumped_snapshots_are_served_until_stale(self):
+        MetricsRegistry().counter("test_dumped_total", "Dumped").inc()
+        with tempfile.TemporaryDirectory() as directory:
+            MetricsDumper(directory, 5).dump()
+            with open(os.path.join(directory, "stale.json"), "w", encoding="utf-8") as file:
+                json.dump({"process": "gone", "updated_at": time.time() - 600, "metrics": []}, file)
+
+            snapshots = MetricsExporter(directory, stale_after=60).load_snapshots()
+
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(find(snapshots[0], "test_dumped_total")["samples"][0]["value"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.helpers.configuration.configuration import Configuration
+from src.helpers.metrics.stage_profiler import NULL_STAGE, StageProfiler
+
+
+class TestStageProfiler(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.multiple(
+            StageProfiler(), enabled=True, sample_rate=2, trace_memory=False, calls={}, stats={}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_disabled(self):
+        profiler = StageProfiler()
+        profiler.enabled = False
+        self.assertIs(profiler.trace("http"), NULL_STAGE)
+        self.assertIs(profiler.stage("validate"), NULL_STAGE)
+
+    def test_sampling_and_nesting(self):
+        profiler = StageProfiler()
+        for _ in range(4):
+            with profiler.trace("http"):
+                with profiler.stage("create_payload"):
+                    with profiler.stage("is_malformed"):
+                        pass
+                # A nested trace is just another stage of the sampled one
+                with profiler.trace("incident"):
+                    pass
+
+        self.assertEqual(
+            {path: entry[0] for path, entry in profiler.stats.items()},
+            {
+                ("http",): 2,
+                ("http", "create_payload"): 2,
+                ("http", "create_payload", "is_malformed"): 2,
+                ("http", "incident"): 2,
+            },
+        )
+
+    def test_stages_outside_of_traces_are_ignored(self):
+        profiler = StageProfiler()
+        with profiler.stage("validate"):
+            pass
+        self.assertEqual(profiler.stats, {})
+
+    def test_collapsed_uses_self_time(self):
+        profiler = StageProfiler()
+        profiler.record(("http",), 10_000_000, 0)
+        profiler.record(("http", "create_payload"), 4_000_000, 0)
+        profiler.record(("http", "create_payload", "is_malformed"), 1_000_000, 0)
+
+        self.assertEqual(
+            profiler.collapsed().splitlines(),
+            ["http 6000", "http;create_payload 3000", "http;create_payload;is_malformed 1000"],
+        )
+        self.assertIn("is_malformed", profiler.summary())
+
+    def test_stages_survive_awaits(self):
+        profiler = StageProfiler()
+        profiler.sample_rate = 1
+
+        async def handle(name):
+            with profiler.trace(name):
+                with profiler.stage("send"):
+                    await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(handle("a"), handle("b"))
+
+        asyncio.run(main())
+        self.assertEqual(
+            sorted(profiler.stats), [("a",), ("a", "send"), ("b",), ("b", "send")]
+        )
+        self.assertGreaterEqual(profiler.stats[("a", "send")][1], 10_000_000)
+
+    def test_detached_tasks_start_their_own_trace(self):
+        profiler = StageProfiler()
+        profiler.sample_rate = 1
+
+        async def flush():
+            with profiler.trace("ship"):
+                pass
+
+        async def main():
+            with profiler.trace("incident"):
+                with profiler.detach():
+                    task = asyncio.create_task(flush())
+            await task
+
+        asyncio.run(main())
+        self.assertEqual(sorted(profiler.stats), [("incident",), ("ship",)])
+
+    def test_dump(self):
+        profiler = StageProfiler()
+        profiler.record(("ship",), 2_000_000, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            Configuration.set_config_item("PROFILE_DIR", directory)
+            try:
+                collapsed_path, summary_path = profiler.dump()
+                with open(collapsed_path, "r", encoding="utf-8") as file:
+                    self.assertEqual(file.read(), "ship 2000\n")
+                self.assertTrue(os.path.exists(summary_path))
+            finally:
+                Configuration.set_config_item("PROFILE_DIR", "profiles")
+
+
+if __name__ == "__main__":
+    unittest.main()
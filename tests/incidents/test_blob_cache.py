@@ -0,0 +1,52 @@
+import json
+import unittest
+from src.incidents.blob_cache import BlobCache
+from src.incidents.incident_record import IncidentRecord
+
+
+def record(payload):
+    return IncidentRecord(
+        "127.0.0.1",
+        "BH-HTTP",
+        "2023-07-28T17:32:19.336395",
+        {"path": "/", "headers": {"Host": "localhost"}, "payload": payload},
+    )
+
+
+class TestBlobCache(unittest.TestCase):
+    def test_blobs_are_referenced_once_acknowledged(self):
+        cache = BlobCache(max_entries=10)
+
+        first = cache.encode(record("${jndi:ldap://x}"))
+        metadata = json.loads(first)["metadata"]
+        self.assertEqual(metadata["payload"], "${jndi:ldap://x}")
+        self.assertEqual(set(metadata["blobs"]), {"payload", "headers"})
+
+        # Not acknowledged yet, so it is sent in full again
+        metadata = json.loads(cache.encode(record("${jndi:ldap://x}")))["metadata"]
+        self.assertEqual(metadata["payload"], "${jndi:ldap://x}")
+
+        cache.acknowledge(first)
+        metadata = json.loads(cache.encode(record("${jndi:ldap://x}")))["metadata"]
+        self.assertIsNone(metadata["payload"])
+        self.assertIsNone(metadata["headers"])
+        self.assertEqual(metadata["blob_refs"], json.loads(first)["metadata"]["blobs"])
+        self.assertNotIn("blobs", metadata)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 4))
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+        self.assertGreater(stats["bytes_saved"], 0)
+
+    def test_cache_is_bounded(self):
+        cache = BlobCache(max_entries=2, fields=("payload",))
+        for payload in ("a", "b", "c"):
+            cache.acknowledge(cache.encode(record(payload)))
+
+        self.assertEqual(len(cache.acknowledged), 2)
+        self.assertEqual(json.loads(cache.encode(record("a")))["metadata"]["payload"], "a")
+        self.assertIsNone(json.loads(cache.encode(record("c")))["metadata"]["payload"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,239 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from aiohttp import web
+from src.helpers.configuration.configuration import Configuration
+from src.incidents.delivery_controller import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitOpenError,
+    DeliveryController,
+)
+from src.incidents.incident_record import IncidentRecord
+from src.incidents.incident_shipper import IncidentShipper
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def controller(clock, **kwargs):
+    settings = dict(
+        max_concurrency=4,
+        latency_target=1,
+        failures=3,
+        cooldown=10,
+        max_cooldown=40,
+        retry_backoff=0.1,
+        clock=clock,
+    )
+    settings.update(kwargs)
+    return DeliveryController(**settings)
+
+
+class TestDeliveryController(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    async def fail(self, delivery, times):
+        for _ in range(times):
+            delivery.release(await delivery.acquire(), False)
+
+    async def test_circuit_opens_and_recovers(self):
+        delivery = controller(self.clock)
+        await self.fail(delivery, 3)
+        self.assertEqual(delivery.state, OPEN)
+        self.assertTrue(5 <= delivery.retry_in() <= 10)
+        with self.assertRaises(CircuitOpenError):
+            await delivery.acquire()
+
+        # A single probe once the cooldown is over
+        self.clock.now += 10
+        started = await delivery.acquire()
+        self.assertEqual(delivery.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            await delivery.acquire()
+
+        delivery.release(started, True)
+        self.assertEqual(delivery.state, CLOSED)
+        # Starting over slowly after an outage
+        self.assertEqual(delivery.limit, 1)
+        self.assertEqual(delivery.rejected, 2)
+
+    async def test_cooldown_doubles_while_probes_fail(self):
+        with patch("random.uniform", lambda low, high: high):
+            delivery = controller(self.clock)
+            await self.fail(delivery, 3)
+            cooldowns = [delivery.retry_in()]
+            for _ in range(3):
+                self.clock.now += delivery.retry_in()
+                await self.fail(delivery, 1)
+                cooldowns.append(delivery.retry_in())
+        self.assertEqual(cooldowns, [10, 20, 40, 40])
+        self.assertEqual(delivery.opened_total, 4)
+
+    async def test_backoff_is_jittered(self):
+        delivery = controller(self.clock)
+        delays = [delivery.backoff(3) for _ in range(100)]
+        self.assertTrue(all(0 <= delay <= 0.8 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    async def test_limit_is_additive_increase_multiplicative_decrease(self):
+        delivery = controller(self.clock, max_concurrency=8)
+        # A failure and a slow answer for requests sent together count once
+        first = await delivery.acquire()
+        second = await delivery.acquire()
+        self.clock.now += 2
+        delivery.release(first, False)
+        delivery.release(second, True)
+        self.assertEqual(delivery.limit, 4)
+
+        # About one more per window of `limit` answers
+        for _ in range(4):
+            delivery.release(await delivery.acquire(), True)
+        self.assertAlmostEqual(delivery.limit, 5, delta=0.1)
+
+        self.clock.now += 1
+        delivery.release(await delivery.acquire(), False)
+        self.assertAlmostEqual(delivery.limit, 2.5, delta=0.05)
+        self.assertEqual(delivery.state, CLOSED)
+
+    async def test_requests_wait_for_a_slot(self):
+        delivery = controller(self.clock, max_concurrency=2)
+        first = await delivery.acquire()
+        await delivery.acquire()
+        waiting = asyncio.create_task(delivery.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+
+        delivery.release(first, True)
+        await waiting
+        self.assertEqual(delivery.in_flight, 2)
+
+    async def test_waiting_requests_fail_fast_when_the_circuit_opens(self):
+        delivery = controller(self.clock, max_concurrency=1, failures=1)
+        started = await delivery.acquire()
+        waiting = asyncio.create_task(delivery.acquire())
+        await asyncio.sleep(0)
+
+        delivery.release(started, False)
+        with self.assertRaises(CircuitOpenError):
+            await waiting
+        self.assertEqual(delivery.in_flight, 0)
+
+
+class FaultInjectingAPI:
+    # Local stand in for the API answering with the statuses in `statuses`,
+    # then `status`, after `delay` seconds
+    def __init__(self):
+        self.statuses = []
+        self.status = 201
+        self.delay = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await request.read()
+            await asyncio.sleep(self.delay)
+            status = self.statuses.pop(0) if self.statuses else self.status
+            return web.Response(status=status)
+        finally:
+            self.in_flight -= 1
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/incidents", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/incidents"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class TestDeliveryAgainstFaultyAPI(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.api = FaultInjectingAPI()
+        await self.api.start()
+        settings = {
+            "API_POST_URL": self.api.url,
+            "API_TOKEN": "token",
+            "API_RETRY_BACKOFF_MS": 1,
+            "API_BREAKER_FAILURES": 3,
+            "API_LATENCY_TARGET_MS": 50,
+            "API_POOL_SIZE": 8,
+        }
+        config = Configuration().get_config()
+        for key, value in settings.items():
+            self.addCleanup(Configuration.set_config_item, key, config.get(key))
+            Configuration.set_config_item(key, value)
+        patcher = patch.object(IncidentShipper(), "batch_encoder", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.shipper = IncidentShipper()
+        self.shipper.start()
+
+    async def asyncTearDown(self):
+        await self.shipper.close()
+        await self.api.stop()
+
+    def payloads(self, count):
+        return [
+            IncidentRecord(f"10.0.0.{i}", "BH-SSH", "2023-07-28T17:32:19.336395", {}).to_json()
+            for i in range(count)
+        ]
+
+    async def test_transient_errors_are_retried(self):
+        self.api.statuses = [503, 502]
+        failed = await self.shipper.send_batch(self.payloads(1))
+        self.assertEqual(failed, [])
+        self.assertEqual(self.api.requests, 3)
+
+    async def test_client_errors_are_not_retried(self):
+        self.api.status = 422
+        failed = await self.shipper.send_batch(self.payloads(1))
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(self.api.requests, 1)
+
+    async def test_outage_opens_the_circuit(self):
+        self.api.status = 500
+        failed = await self.shipper.send_batch(self.payloads(20))
+        self.assertEqual(len(failed), 20)
+        self.assertEqual(self.shipper.delivery.state, OPEN)
+        # Most incidents failed fast instead of hammering the API
+        self.assertLess(self.api.requests, 20)
+        self.assertGreater(self.shipper.delivery.rejected, 0)
+
+        requests = self.api.requests
+        self.assertEqual(len(await self.shipper.send_batch(self.payloads(5))), 5)
+        self.assertEqual(self.api.requests, requests)
+
+    async def test_slow_api_gets_fewer_requests_in_flight(self):
+        self.api.delay = 0.1
+        failed = await self.shipper.send_batch(self.payloads(16))
+        self.assertEqual(failed, [])
+        self.assertEqual(self.api.max_in_flight, 8)
+        self.assertLess(self.shipper.delivery.limit, 8)
+
+        self.api.max_in_flight = 0
+        await self.shipper.send_batch(self.payloads(16))
+        self.assertLessEqual(self.api.max_in_flight, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,25 @@
+import json
 from typing import Any, Dict
 import unittest
 from unittest.mock import patch, MagicMock
 from aiohttp.test_utils import make_mocked_coro
 from src.incidents.incident import Incident
+from src.incidents.incident_shipper import IncidentShipper
 from src.helpers.configuration.configuration import Configuration
 
 config: Dict[str, Any] = Configuration().get_config()
 
 
 class TestIncident(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # These tests cover the single incident POST, not batch uploads
+        patcher = patch.object(IncidentShipper(), "batch_encoder", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # and ship from this process rather than through the shipper process
+        Configuration.set_config_item("SHIPPER_PROCESS_ENABLED", False)
+        self.addCleanup(Configuration.set_config_item, "SHIPPER_PROCESS_ENABLED", True)
+
     @patch("aiohttp.ClientSession.post")
     async def test_incident_send_to_api(self, mock_post):
         # Mock the HTTP response from aiohttp.ClientSession.post
@@ -25,12 +36,22 @@ class TestIncident(unittest.IsolatedAsyncioTestCase):
         incident = Incident(data)
         Configuration.set_config_item("API_ENABLED", True)
         await incident.create()
+        await IncidentShipper().close()
 
         # Ensure that aiohttp.ClientSession.post was called with the expected arguments
-        mock_post.assert_called_once_with(
-            url=config.get("API_POST_URL"),
-            headers={"authorization": f"Bearer {config.get('API_TOKEN')}"},
-            json=data,
+        mock_post.assert_called_once()
+        kwargs = mock_post.call_args.kwargs
+        self.assertEqual(kwargs["url"], config.get("API_POST_URL"))
+        self.assertEqual(
+            kwargs["headers"],
+            {
+                "authorization": f"Bearer {config.get('API_TOKEN')}",
+                "content-type": "application/json",
+            },
+        )
+        self.assertEqual(
+            json.loads(kwargs["data"]),
+            {**data, "collector_name": config.get("COLLECTOR_ID")},
         )
 
     @patch("logging.error")
@@ -49,6 +70,7 @@ class TestIncident(unittest.IsolatedAsyncioTestCase):
         incident = Incident(data)
         Configuration.set_config_item("API_ENABLED", True)
         await incident.create()
+        await IncidentShipper().close()
 
         # Ensure that logging.error was called with the expected arguments
         mock_log_error.assert_called_with("Failed to send incident to API, status code: %s", 404)
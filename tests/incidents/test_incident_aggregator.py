@@ -0,0 +1,42 @@
+import asyncio
+import unittest
+from src.incidents.incident_aggregator import IncidentAggregator
+
+
+class TestIncidentAggregator(unittest.IsolatedAsyncioTestCase):
+    async def test_attempts_are_folded_per_ip_and_type(self):
+        emitted = []
+        aggregator = IncidentAggregator(window=0.05, max_samples=2, emit=emitted.append)
+
+        aggregator.add("10.0.0.1", "BH-SSH", ("root", "root"), "2023-07-28T17:32:19")
+        aggregator.add("10.0.0.1", "BH-SSH", ("root", "123456"))
+        aggregator.add("10.0.0.1", "BH-SSH", ("root", "root"))
+        aggregator.add("10.0.0.1", "BH-SSH", ("admin", "admin"), "2023-07-28T17:32:25")
+        aggregator.add("10.0.0.2", "BH-SSH", ("root", "root"))
+        self.assertEqual(emitted, [])
+
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(len(emitted), 2)
+        bucket = emitted[0]
+        self.assertEqual(bucket.ip_address, "10.0.0.1")
+        self.assertEqual(bucket.attempts, 4)
+        self.assertEqual(bucket.first_seen, "2023-07-28T17:32:19")
+        self.assertEqual(bucket.last_seen, "2023-07-28T17:32:25")
+        self.assertEqual(bucket.samples, {("root", "root"): 2, ("root", "123456"): 1})
+        self.assertEqual(bucket.dropped_samples, 1)
+        self.assertEqual(aggregator.buckets, {})
+
+    async def test_flush_emits_open_buckets(self):
+        emitted = []
+        aggregator = IncidentAggregator(window=60, max_samples=10, emit=emitted.append)
+        aggregator.add("10.0.0.1", "BH-SSH", ("root", "root"))
+
+        aggregator.flush()
+
+        self.assertEqual(len(emitted), 1)
+        self.assertEqual(aggregator.buckets, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from src.helpers.configuration.configuration import Configuration
+from src.incidents.incident_forwarder import FRAME_HEADER, INCIDENTS_DROPPED, IncidentForwarder
+from src.incidents.incident_record import IncidentRecord
+from src.incidents.incident_shipper import IncidentShipper
+from src.incidents.incident_shipper_server import IncidentShipperServer
+
+
+def record(ip_address):
+    return IncidentRecord(ip_address, "BH-SSH", "2023-07-28T17:32:19.336395", {})
+
+
+class TestIncidentForwarder(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = os.path.join(directory.name, "shipper.sock")
+        Configuration.set_config_item("SHIPPER_SOCKET", self.socket_path)
+        self.addCleanup(Configuration.set_config_item, "SHIPPER_SOCKET", "shipper.sock")
+
+    async def asyncTearDown(self):
+        await IncidentForwarder().close()
+
+    async def test_incidents_are_framed_in_order(self):
+        frames = []
+        received = asyncio.Event()
+
+        async def handle(reader, writer):
+            while len(frames) < 3:
+                (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                frames.append(json.loads(await reader.readexactly(length)))
+            received.set()
+            writer.close()
+
+        server = await asyncio.start_unix_server(handle, self.socket_path)
+        try:
+            forwarder = IncidentForwarder()
+            for index in range(3):
+                forwarder.enqueue(record(f"127.0.0.{index}"))
+            await asyncio.wait_for(received.wait(), 5)
+        finally:
+            server.close()
+
+        self.assertEqual(
+            [frame["ip_address"] for frame in frames], ["127.0.0.0", "127.0.0.1", "127.0.0.2"]
+        )
+
+    async def test_oldest_incidents_are_dropped_when_full(self):
+        Configuration.set_config_item("SHIPPER_FORWARD_QUEUE", 2)
+        self.addCleanup(Configuration.set_config_item, "SHIPPER_FORWARD_QUEUE", 10000)
+        dropped = INCIDENTS_DROPPED.value
+
+        forwarder = IncidentForwarder()
+        for index in range(3):
+            forwarder.enqueue(record(f"127.0.0.{index}"))
+
+        self.assertEqual(INCIDENTS_DROPPED.value, dropped + 1)
+        self.assertEqual(
+            [json.loads(payload)["ip_address"] for payload in forwarder.queue],
+            ["127.0.0.1", "127.0.0.2"],
+        )
+
+    async def test_close_drops_what_the_shipper_did_not_take(self):
+        dropped = INCIDENTS_DROPPED.value
+        forwarder = IncidentForwarder()
+        forwarder.enqueue(record("127.0.0.1"))
+        await forwarder.close()
+
+        self.assertEqual(INCIDENTS_DROPPED.value, dropped + 1)
+        self.assertEqual(len(forwarder.queue), 0)
+
+
+class TestIncidentShipperServer(unittest.IsolatedAsyncioTestCase):
+    async def test_frames_are_handed_to_the_shipper(self):
+        shipper = MagicMock(blob_cache=None)
+        shipper.backlogged.return_value = False
+        reader = asyncio.StreamReader()
+        for payload in (b'{"ip_address": "127.0.0.1"}', b'{"ip_address": "127.0.0.2"}'):
+            reader.feed_data(FRAME_HEADER.pack(len(payload)) + payload)
+        reader.feed_eof()
+
+        with patch("src.incidents.incident_shipper_server.IncidentShipper", return_value=shipper):
+            with self.assertRaises(asyncio.IncompleteReadError):
+                await IncidentShipperServer("shipper.sock").read_frames(reader)
+
+        self.assertEqual(
+            [call.args[0] for call in shipper.enqueue_payload.call_args_list],
+            [b'{"ip_address": "127.0.0.1"}', b'{"ip_address": "127.0.0.2"}'],
+        )
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_reader_pauses_while_delivery_stalls(self, mock_post):
+        api = asyncio.Event()
+
+        async def respond(*args, **kwargs):
+            await api.wait()
+            response = MagicMock()
+            response.status = 201
+            return response
+
+        mock_post.return_value.__aenter__.side_effect = respond
+
+        shipper = IncidentShipper()
+        reader = asyncio.StreamReader()
+        for i in range(10):
+            payload = json.dumps({"ip_address": f"127.0.0.{i}"}).encode("utf-8")
+            reader.feed_data(FRAME_HEADER.pack(len(payload)) + payload)
+        reader.feed_eof()
+
+        server = IncidentShipperServer("shipper.sock")
+        received = server.received.value
+        Configuration.set_config_item("API_BATCH_SIZE", 1)
+        with patch.object(shipper, "batch_encoder", None), patch.object(shipper, "blob_cache", None):
+            try:
+                task = asyncio.create_task(server.read_frames(reader))
+                await asyncio.sleep(0.05)
+                # One batch per request the delivery controller allows
+                self.assertEqual(server.received.value - received, int(shipper.delivery.limit))
+                self.assertFalse(task.done())
+
+                api.set()
+                with self.assertRaises(asyncio.IncompleteReadError):
+                    await task
+                self.assertEqual(server.received.value - received, 10)
+            finally:
+                Configuration.set_config_item("API_BATCH_SIZE", 100)
+                await shipper.close()
+
+    async def test_oversized_frames_are_rejected(self):
+        reader = asyncio.StreamReader()
+        reader.feed_data(FRAME_HEADER.pack(2**31))
+
+        with patch("src.incidents.incident_shipper_server.IncidentShipper"):
+            with self.assertRaises(ValueError):
+                await IncidentShipperServer("shipper.sock").read_frames(reader)
+
+
+if __name__ == "__main__":
+    unittest.main()
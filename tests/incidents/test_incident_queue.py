@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+from src.incidents.incident_queue import DROP_NEWEST, DROP_OLDEST, FAIR_SHARE, IncidentQueue
+
+
+class TestIncidentQueue(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.created = []
+        self.release = asyncio.Event()
+
+    async def create(self, name):
+        await self.release.wait()
+        self.created.append(name)
+
+    def queued(self, incident_queue):
+        return [args[0] for queue in incident_queue.queues.values() for _, args in queue]
+
+    async def test_workers_cap_concurrency(self):
+        incident_queue = IncidentQueue("test", size=10, workers=2, policy=DROP_NEWEST)
+        for index in range(5):
+            incident_queue.submit("127.0.0.1", self.create, index)
+        await asyncio.sleep(0)
+
+        self.assertEqual(incident_queue.active, 2)
+        self.assertEqual(incident_queue.length, 3)
+
+        self.release.set()
+        await incident_queue.close()
+        self.assertEqual(sorted(self.created), [0, 1, 2, 3, 4])
+        self.assertEqual(incident_queue.active, 0)
+
+    async def test_drop_newest(self):
+        incident_queue = IncidentQueue("test", size=2, workers=1, policy=DROP_NEWEST)
+        rejected = incident_queue.rejected.value
+        incident_queue.submit("127.0.0.1", self.create, 0)
+        await asyncio.sleep(0)
+        results = [incident_queue.submit("127.0.0.1", self.create, index) for index in range(1, 4)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(self.queued(incident_queue), [1, 2])
+        self.assertEqual(incident_queue.rejected.value, rejected + 1)
+        self.release.set()
+        await incident_queue.close()
+
+    async def test_drop_oldest(self):
+        incident_queue = IncidentQueue("test", size=2, workers=1, policy=DROP_OLDEST)
+        evicted = incident_queue.evicted.value
+        incident_queue.submit("127.0.0.1", self.create, 0)
+        await asyncio.sleep(0)
+        for index in range(1, 5):
+            incident_queue.submit("127.0.0.1", self.create, index)
+
+        self.assertEqual(self.queued(incident_queue), [3, 4])
+        self.assertEqual(incident_queue.evicted.value, evicted + 2)
+        self.release.set()
+        await incident_queue.close()
+
+    async def test_fair_share(self):
+        incident_queue = IncidentQueue("test", size=4, workers=1, policy=FAIR_SHARE)
+        incident_queue.submit("10.0.0.1", self.create, "busy")
+        await asyncio.sleep(0)
+        for index in range(4):
+            incident_queue.submit("10.0.0.1", self.create, f"busy-{index}")
+        # The busy IP already holds the whole queue, a new IP evicts from it
+        self.assertTrue(incident_queue.submit("10.0.0.2", self.create, "quiet"))
+        self.assertEqual(len(incident_queue.queues["10.0.0.1"]), 3)
+
+        # Over its share of the queue, the busy IP is rejected
+        self.assertFalse(incident_queue.submit("10.0.0.1", self.create, "busy-4"))
+
+        # Waiting IPs are served round-robin
+        self.release.set()
+        await incident_queue.close()
+        self.assertEqual(self.created[:3], ["busy", "busy-1", "quiet"])
+
+    async def test_close_sheds_what_is_left(self):
+        incident_queue = IncidentQueue("test", size=10, workers=1, policy=DROP_NEWEST)
+        abandoned = incident_queue.abandoned.value
+        for index in range(3):
+            incident_queue.submit("127.0.0.1", self.create, index)
+        await incident_queue.close(timeout=0.01)
+
+        self.assertEqual(incident_queue.abandoned.value, abandoned + 2)
+        self.assertFalse(incident_queue.submit("127.0.0.1", self.create, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+from datetime import datetime
+import json
+import unittest
+from unittest.mock import patch
+from src.incidents import incident_record
+from src.incidents.incident_record import IncidentRecord
+
+
+class TestIncidentRecord(unittest.TestCase):
+    def test_validation(self):
+        happened_at = datetime(2023, 7, 28, 17, 32, 19, 336395)
+        IncidentRecord("127.0.0.1", "BH-HTTP", happened_at, {})
+        IncidentRecord("::1", "BH-SSH", "2023-07-28T17:32:19.336395", {})
+
+        with self.assertRaisesRegex(ValueError, "Invalid IP address format."):
+            IncidentRecord("not an ip", "BH-HTTP", happened_at, {})
+        with self.assertRaisesRegex(ValueError, "Invalid IP address format."):
+            IncidentRecord(None, "BH-HTTP", happened_at, {})
+        with self.assertRaisesRegex(ValueError, "Invalid incident type."):
+            IncidentRecord("127.0.0.1", "BH-FTP", happened_at, {})
+        with self.assertRaisesRegex(ValueError, "Invalid date format."):
+            IncidentRecord("127.0.0.1", "BH-HTTP", "yesterday", {})
+
+    def test_from_dict_reports_missing_keys(self):
+        with self.assertRaisesRegex(ValueError, "metadata, happened_at"):
+            IncidentRecord.from_dict({"ip_address": "127.0.0.1", "incident_type": "BH-HTTP"})
+
+    def test_to_json(self):
+        record = IncidentRecord(
+            "127.0.0.1",
+            "BH-HTTP",
+            datetime(2023, 7, 28, 17, 32, 19, 336395),
+            {"path": "/", "payload": None},
+            "ABCDEFG-123",
+        )
+        expected = {
+            "ip_address": "127.0.0.1",
+            "incident_type": "BH-HTTP",
+            "happened_at": "2023-07-28T17:32:19.336395",
+            "metadata": {"path": "/", "payload": None},
+            "collector_name": "ABCDEFG-123",
+        }
+
+        self.assertEqual(json.loads(record.to_json()), expected)
+        with patch.object(incident_record, "orjson", None):
+            self.assertEqual(json.loads(record.to_json()), expected)
+
+        self.assertEqual(IncidentRecord.from_dict(expected).to_dict(), expected)
+
+    def test_to_json_with_str_subclass_keys(self):
+        class HeaderName(str):
+            pass
+
+        record = IncidentRecord(
+            "127.0.0.1", "BH-HTTP", datetime(2023, 7, 28), {"headers": {HeaderName("Host"): "a"}}
+        )
+        self.assertEqual(json.loads(record.to_json())["metadata"], {"headers": {"Host": "a"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
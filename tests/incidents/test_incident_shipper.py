@@ -0,0 +1,148 @@
+import asyncio
+import gzip
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+from src.incidents.batch_encoder import BatchEncoder
+from src.incidents.incident_record import IncidentRecord
+from src.incidents.incident_shipper import IncidentShipper
+from src.helpers.configuration.configuration import Configuration
+
+
+def record(ip_address):
+    return IncidentRecord(ip_address, "BH-SSH", "2023-07-28T17:32:19.336395", {})
+
+
+class TestIncidentShipper(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = patch.object(IncidentShipper(), "batch_encoder", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await IncidentShipper().close()
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_flush_when_batch_is_full(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.status = 201
+        mock_post.return_value.__aenter__.return_value = mock_response
+
+        Configuration.set_config_item("API_BATCH_SIZE", 3)
+        try:
+            shipper = IncidentShipper()
+            shipper.enqueue(record("127.0.0.1"))
+            shipper.enqueue(record("127.0.0.2"))
+            await asyncio.sleep(0)
+            mock_post.assert_not_called()
+
+            shipper.enqueue(record("127.0.0.3"))
+            await asyncio.sleep(0)
+            await asyncio.gather(*shipper.flush_tasks)
+            self.assertEqual(mock_post.call_count, 3)
+            self.assertEqual(shipper.buffer, [])
+        finally:
+            Configuration.set_config_item("API_BATCH_SIZE", 100)
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_session_is_reused_between_flushes(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.status = 201
+        mock_post.return_value.__aenter__.return_value = mock_response
+
+        shipper = IncidentShipper()
+        shipper.enqueue(record("127.0.0.1"))
+        await shipper.flush()
+        session = shipper.session
+
+        shipper.enqueue(record("127.0.0.2"))
+        await shipper.flush()
+
+        self.assertIs(shipper.session, session)
+        self.assertEqual(mock_post.call_count, 2)
+
+
+class TestIncidentShipperBatches(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        shipper = IncidentShipper()
+        patcher = patch.multiple(
+            shipper, batch_encoder=BatchEncoder("gzip"), batch_retry_at=0.0
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await IncidentShipper().close()
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_batch_is_sent_as_compressed_ndjson(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.status = 201
+        mock_post.return_value.__aenter__.return_value = mock_response
+
+        shipper = IncidentShipper()
+        shipper.enqueue(record("127.0.0.1"))
+        shipper.enqueue(record("127.0.0.2"))
+        failed = await shipper.flush()
+
+        self.assertEqual(failed, 0)
+        mock_post.assert_called_once()
+        kwargs = mock_post.call_args.kwargs
+        self.assertEqual(kwargs["headers"]["content-type"], "application/x-ndjson")
+        self.assertEqual(kwargs["headers"]["content-encoding"], "gzip")
+        lines = gzip.decompress(kwargs["data"]).splitlines()
+        self.assertEqual(
+            [json.loads(line)["ip_address"] for line in lines], ["127.0.0.1", "127.0.0.2"]
+        )
+        self.assertEqual(shipper.batch_encoder.stats()["batches"], 1)
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_fallback_to_single_posts(self, mock_post):
+        statuses = iter([415, 201, 201])
+
+        def respond(*args, **kwargs):
+            response = MagicMock()
+            response.status = next(statuses)
+            context = MagicMock()
+            context.__aenter__.return_value = response
+            return context
+
+        mock_post.side_effect = respond
+
+        shipper = IncidentShipper()
+        shipper.enqueue(record("127.0.0.1"))
+        shipper.enqueue(record("127.0.0.2"))
+        failed = await shipper.flush()
+
+        self.assertEqual(failed, 0)
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(
+            mock_post.call_args.kwargs["headers"]["content-type"], "application/json"
+        )
+        self.assertGreater(shipper.batch_retry_at, shipper.loop.time())
+
+
+class TestBatchEncoder(unittest.TestCase):
+    def test_compression_stats(self):
+        encoder = BatchEncoder("gzip", 9)
+        batch = [record("127.0.0.1").to_json()] * 50
+        body = encoder.encode(batch)
+
+        self.assertEqual(gzip.decompress(body), b"\n".join(batch) + b"\n")
+        stats = encoder.stats()
+        self.assertEqual(stats["raw_bytes"], len(b"\n".join(batch)) + 1)
+        self.assertEqual(stats["encoded_bytes"], len(body))
+        self.assertGreater(stats["compression_ratio"], 10)
+
+    def test_uncompressed_batches(self):
+        encoder = BatchEncoder("none")
+        self.assertIsNone(encoder.content_encoding)
+        self.assertEqual(encoder.encode([b"{}", b"{}"]), b"{}\n{}\n")
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            BatchEncoder("brotli")
+
+
+if __name__ == "__main__":
+    unittest.main()
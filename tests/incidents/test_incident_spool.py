@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from src.incidents.incident_shipper import create_delivery_controller
+from src.incidents.incident_spool import IncidentSpool, IncidentSpoolReplayer
+
+
+def encode(data):
+    return json.dumps(data).encode("utf-8")
+
+
+def ids(records):
+    return [json.loads(record)["id"] for record in records]
+
+
+class FakeShipper:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.shipped = []
+        self.delivery = create_delivery_controller()
+
+    async def send_batch(self, batch):
+        if self.fail:
+            return list(batch)
+        self.shipped.extend(batch)
+        return []
+
+    def notify_capacity(self):
+        pass
+
+
+class TestIncidentSpool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_and_commit(self):
+        spool = IncidentSpool(self.directory)
+        for i in range(5):
+            spool.append(encode({"id": i}))
+
+        records, cursor = spool.read_batch(3)
+        self.assertEqual(ids(records), [0, 1, 2])
+        spool.commit(cursor)
+
+        records, cursor = spool.read_batch(10)
+        self.assertEqual(ids(records), [3, 4])
+        spool.close()
+
+    def test_pending_records_survive_restart(self):
+        spool = IncidentSpool(self.directory)
+        for i in range(4):
+            spool.append(encode({"id": i}))
+        records, cursor = spool.read_batch(2)
+        spool.commit(cursor)
+        spool.close()
+
+        spool = IncidentSpool(self.directory)
+        spool.append(encode({"id": 4}))
+        records, _ = spool.read_batch(10)
+        self.assertEqual(ids(records), [2, 3, 4])
+        spool.close()
+
+    def test_segments_rotate_and_are_removed_once_delivered(self):
+        spool = IncidentSpool(self.directory, segment_bytes=64)
+        for i in range(20):
+            spool.append(encode({"id": i, "padding": "x" * 16}))
+        self.assertGreater(len(spool.list_segments()), 1)
+
+        records, cursor = spool.read_batch(100)
+        self.assertEqual(len(records), 20)
+        spool.commit(cursor)
+        self.assertEqual(spool.list_segments(), [spool.write_seq])
+        spool.close()
+
+    def test_torn_write_is_skipped(self):
+        spool = IncidentSpool(self.directory)
+        spool.append(encode({"id": 0}))
+        spool.close()
+        with open(spool.segment_path(0), "ab") as segment:
+            segment.write(b'{"id": 1')
+
+        spool = IncidentSpool(self.directory)
+        spool.append(encode({"id": 2}))
+        records, _ = spool.read_batch(10)
+        self.assertEqual(ids(records), [0, 2])
+        spool.close()
+
+    def test_oldest_segments_are_dropped_when_full(self):
+        spool = IncidentSpool(self.directory, segment_bytes=16, max_segments=3)
+        for i in range(10):
+            spool.append(encode({"id": i}))
+        self.assertLessEqual(len(spool.list_segments()), 3)
+        self.assertEqual(spool.lag(), 2)
+
+        records, _ = spool.read_batch(100)
+        # Two records per segment, the newest (empty) segment is the write segment
+        self.assertEqual(ids(records), [6, 7, 8, 9])
+        spool.close()
+
+
+class TestIncidentSpoolReplayer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def run_replayer(self, replayer):
+        task = asyncio.create_task(replayer.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_replayer_drains_spool(self):
+        spool = IncidentSpool(self.tmp.name)
+        for i in range(3):
+            spool.append(encode({"id": i}))
+
+        shipper = FakeShipper()
+        await self.run_replayer(IncidentSpoolReplayer(spool, shipper))
+
+        self.assertEqual(ids(shipper.shipped), [0, 1, 2])
+        self.assertEqual(spool.read_batch(10)[0], [])
+        spool.close()
+
+    async def test_replayer_keeps_records_while_api_is_down(self):
+        spool = IncidentSpool(self.tmp.name)
+        spool.append(encode({"id": 0}))
+
+        await self.run_replayer(IncidentSpoolReplayer(spool, FakeShipper(fail=True)))
+
+        records, _ = spool.read_batch(10)
+        self.assertEqual(ids(records), [0])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "cursor")))
+        spool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
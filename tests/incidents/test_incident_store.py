@@ -0,0 +1,183 @@
+import contextlib
+from datetime import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from query import main
+from src.helpers.configuration.configuration import Configuration
+from src.incidents.incident import Incident
+from src.incidents.incident_forwarder import get_shipper
+from src.incidents.incident_store import IncidentDatabase, IncidentStore, extract_credentials
+
+
+def row(happened_at, ip_address, incident_type="BH-SSH", **metadata):
+    return (happened_at, ip_address, incident_type, metadata)
+
+
+class TestIncidentDatabase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "incidents.db")
+        self.database = IncidentDatabase(self.path)
+        self.addCleanup(self.database.close)
+        self.database.insert(
+            [
+                row("2023-07-27T10:00:00.000000", "10.0.0.1", username="root", password="root"),
+                row("2023-07-28T10:00:00.000000", "10.0.0.1", username="root", password="root"),
+                row("2023-07-28T11:00:00.000000", "10.0.0.1", "BH-HTTP", path="/"),
+                row(
+                    "2023-07-28T12:00:00.000000",
+                    "10.0.0.2",
+                    attempts=3,
+                    credentials=[
+                        {"username": "admin", "password": "admin", "count": 2},
+                        {"username": "root", "password": "root", "count": 1},
+                    ],
+                ),
+            ]
+        )
+
+    def test_extract_credentials(self):
+        self.assertEqual(extract_credentials({"username": "a", "password": "b"}), [("a", "b", 1)])
+        self.assertEqual(
+            extract_credentials({"credentials": [{"username": "a", "password": "b", "count": 3}]}),
+            [("a", "b", 3)],
+        )
+        self.assertEqual(extract_credentials({"path": "/"}), [])
+
+    def test_top_ips(self):
+        self.assertEqual(self.database.top_ips(), [("10.0.0.1", 3), ("10.0.0.2", 1)])
+        self.assertEqual(
+            self.database.top_ips(since="2023-07-28", incident_type="BH-SSH"),
+            [("10.0.0.1", 1), ("10.0.0.2", 1)],
+        )
+        self.assertEqual(self.database.top_ips(limit=1, until="2023-07-27"), [("10.0.0.1", 1)])
+
+    def test_top_credentials(self):
+        self.assertEqual(
+            self.database.top_credentials(),
+            [("root", "root", 3), ("admin", "admin", 2)],
+        )
+        self.assertEqual(
+            self.database.top_credentials(since="2023-07-28", limit=1), [("admin", "admin", 2)]
+        )
+
+    def test_daily_counts(self):
+        self.assertEqual(
+            self.database.daily_counts(),
+            [
+                ("2023-07-27", "BH-SSH", 1, 1),
+                ("2023-07-28", "BH-HTTP", 1, 1),
+                ("2023-07-28", "BH-SSH", 2, 2),
+            ],
+        )
+
+    def test_incidents_are_filtered_newest_first(self):
+        incidents = self.database.incidents(ip_address="10.0.0.1")
+        self.assertEqual(
+            [incident[0][:13] for incident in incidents],
+            ["2023-07-28T11", "2023-07-28T10", "2023-07-27T10"],
+        )
+        self.assertEqual(incidents[0][3], {"path": "/"})
+
+        incidents = self.database.incidents(since="2023-07-28T10:30:00", until="2023-07-28T12:00:00")
+        self.assertEqual([incident[2] for incident in incidents], ["BH-HTTP"])
+
+    def test_compact_deletes_past_the_retention(self):
+        deleted = self.database.compact(1, now=datetime(2023, 7, 29, 10, 30))
+        self.assertEqual(deleted, 2)
+        self.assertEqual(len(self.database.incidents()), 2)
+        # Rollups are kept by the day
+        self.assertEqual(self.database.top_ips(), [("10.0.0.1", 2), ("10.0.0.2", 1)])
+        self.assertEqual(self.database.compact(1, now=datetime(2023, 7, 29, 10, 30)), 0)
+
+
+class TestQuery(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "incidents.db")
+        database = IncidentDatabase(self.path)
+        database.insert(
+            [
+                row("2023-07-28T10:00:00.000000", "10.0.0.1", username="root", password="root"),
+                row("2023-07-28T11:00:00.000000", "10.0.0.2", "BH-HTTP", path="/"),
+            ]
+        )
+        database.close()
+
+    def test_json_output_is_only_json_lines(self):
+        root = os.path.join(os.path.dirname(__file__), "../..")
+        result = subprocess.run(
+            [sys.executable, "query.py", "--db", self.path, "--json", "incidents"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        rows = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual([row["ip_address"] for row in rows], ["10.0.0.2", "10.0.0.1"])
+        self.assertEqual(rows[0]["metadata"], {"path": "/"})
+
+    def test_invalid_dates_are_usage_errors(self):
+        for argv in (
+            ["incidents", "--since", "garbage"],
+            ["top-ips", "--until", "2023-13-01"],
+        ):
+            with self.assertRaises(SystemExit) as exit, contextlib.redirect_stderr(io.StringIO()):
+                main(["--db", self.path] + argv)
+            self.assertEqual(exit.exception.code, 2)
+
+
+class TestIncidentStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "incidents.db")
+        settings = {
+            "API_ENABLED": False,
+            "STORE_ENABLED": True,
+            "STORE_PATH": self.path,
+            "STORE_BATCH_SIZE": 2,
+        }
+        config = Configuration().get_config()
+        for key, value in settings.items():
+            self.addCleanup(Configuration.set_config_item, key, config.get(key))
+            Configuration.set_config_item(key, value)
+
+    async def test_incidents_are_stored_when_the_api_is_disabled(self):
+        self.assertIs(get_shipper(), IncidentStore())
+        for index in range(3):
+            incident = Incident(
+                {
+                    "ip_address": f"10.0.0.{index}",
+                    "incident_type": "BH-SSH",
+                    "happened_at": "2023-07-28T17:32:19.336395",
+                    "metadata": {"username": "root", "password": "toor"},
+                }
+            )
+            await incident.create()
+        await IncidentStore().close()
+        self.assertEqual(IncidentStore().buffer, [])
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(["--db", self.path, "--json", "credentials"])
+        self.assertEqual(
+            json.loads(output.getvalue()),
+            {"username": "root", "password": "toor", "attempts": 3},
+        )
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(["--db", self.path, "top-ips", "--limit", "1"])
+        self.assertEqual(output.getvalue().split(), ["ip_address", "incidents", "10.0.0.0", "1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
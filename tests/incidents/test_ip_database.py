@@ -0,0 +1,52 @@
+import ipaddress
+import os
+import unittest
+from src.incidents.ip_database import CidrTable, normalize, open_ip_database
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "../fixtures/enrichment/networks.csv")
+
+
+class TestCidrTable(unittest.TestCase):
+    def setUp(self):
+        with self.assertLogs(level="WARNING"):
+            self.table = open_ip_database(FIXTURE)
+
+    def test_lookup(self):
+        self.assertIsInstance(self.table, CidrTable)
+        self.assertEqual(
+            self.table.get(ipaddress.ip_address("8.8.8.8")),
+            {"asn": 15169, "as_org": "GOOGLE", "country": "US"},
+        )
+        self.assertEqual(
+            self.table.get(ipaddress.ip_address("203.0.113.10")),
+            {"asn": 64500, "as_org": "EXAMPLE-NET"},
+        )
+        self.assertEqual(
+            self.table.get(ipaddress.ip_address("2001:db8::1"))["as_org"], "DOCUMENTATION"
+        )
+
+    def test_addresses_outside_of_every_network(self):
+        for address in ("0.0.0.1", "8.8.9.1", "203.0.113.200", "255.255.255.255", "::1"):
+            self.assertIsNone(self.table.get(ipaddress.ip_address(address)), address)
+
+    def test_prefix_len_of_the_answer(self):
+        for address, prefix_len in (
+            ("203.0.113.5", 25),
+            # Between 203.0.113.0/25 and the end of the IPv4 space
+            ("203.0.113.200", 25),
+            ("8.8.9.1", 24),
+            ("0.0.0.1", 8),
+            ("2001:db8::1", 32),
+        ):
+            self.assertEqual(
+                self.table.get_with_prefix_len(ipaddress.ip_address(address))[1], prefix_len, address
+            )
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize({"asn": "not a number", "country": {"iso_code": "US"}, "other": "x"}), {}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from src.helpers.configuration.configuration import Configuration
+from src.incidents.incident_record import IncidentRecord
+from src.incidents.ip_enricher import MISSING, IPEnricher, TTLCache
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "../fixtures/enrichment/networks.csv")
+
+
+def record(ip_address):
+    return IncidentRecord(ip_address, "BH-SSH", "2023-07-28T17:32:19.336395", {})
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_expiry_and_eviction(self):
+        now = [0.0]
+        cache = TTLCache("test", max_size=2, ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", None)
+        # Cached failures are hits too
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+        # "b" is now the least recently used
+        cache.set("c", 3)
+        self.assertIs(cache.get("b"), MISSING)
+
+        now[0] = 11.0
+        self.assertIs(cache.get("a"), MISSING)
+
+
+class TestIPEnricher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        Configuration.set_config_item("ENRICHMENT_DATABASES", [FIXTURE])
+        self.addCleanup(Configuration.set_config_item, "ENRICHMENT_DATABASES", [])
+        IPEnricher._instance = None
+        self.addCleanup(setattr, IPEnricher, "_instance", None)
+        with self.assertLogs(level="WARNING"):
+            self.enricher = IPEnricher()
+
+    def tearDown(self):
+        self.enricher.close()
+
+    async def test_enrich(self):
+        def getnameinfo(address, flags):
+            self.assertEqual(flags, socket.NI_NAMEREQD)
+            return "dns.google", "0"
+
+        incident = record("8.8.8.8")
+        with patch("socket.getnameinfo", side_effect=getnameinfo):
+            await self.enricher.enrich(incident)
+
+        self.assertEqual(
+            incident.metadata["enrichment"],
+            {"asn": 15169, "as_org": "GOOGLE", "country": "US", "reverse_dns": "dns.google"},
+        )
+
+    async def test_networks_smaller_than_the_cache_prefix(self):
+        # 203.0.113.0/25 is in the fixture, the upper half of the /24 is not
+        self.assertEqual(
+            self.enricher.lookup_network(ipaddress.ip_address("203.0.113.5")),
+            {"asn": 64500, "as_org": "EXAMPLE-NET"},
+        )
+        self.assertEqual(self.enricher.lookup_network(ipaddress.ip_address("203.0.113.200")), {})
+        self.assertEqual(
+            self.enricher.lookup_network(ipaddress.ip_address("203.0.113.6")),
+            {"asn": 64500, "as_org": "EXAMPLE-NET"},
+        )
+
+        # Networks covering the whole prefix are still cached once for it
+        hits = self.enricher.networks.hits.value
+        self.enricher.lookup_network(ipaddress.ip_address("8.8.8.8"))
+        self.enricher.lookup_network(ipaddress.ip_address("8.8.8.4"))
+        self.assertEqual(self.enricher.networks.hits.value, hits + 1)
+
+    async def test_reverse_dns_is_shared_and_cached(self):
+        calls = []
+
+        def getnameinfo(address, flags):
+            calls.append(address)
+            time.sleep(0.01)
+            raise socket.gaierror("no PTR record")
+
+        with patch("socket.getnameinfo", side_effect=getnameinfo):
+            results = await asyncio.gather(
+                *(self.enricher.reverse_dns("198.51.100.1") for _ in range(3))
+            )
+            self.assertIsNone(await self.enricher.reverse_dns("198.51.100.1"))
+
+        self.assertEqual(results, [None, None, None])
+        self.assertEqual(calls, [("198.51.100.1", 0)])
+
+    async def test_reverse_dns_timeout(self):
+        self.enricher.dns_timeout = 0.01
+        timeouts = self.enricher.dns_timeouts.value
+
+        release = threading.Event()
+
+        def getnameinfo(address, flags):
+            release.wait(1)
+            return "slow.example", "0"
+
+        with patch("socket.getnameinfo", side_effect=getnameinfo):
+            self.assertIsNone(await self.enricher.reverse_dns("198.51.100.2"))
+            release.set()
+        self.assertEqual(self.enricher.dns_timeouts.value, timeouts + 1)
+
+    async def test_reverse_dns_is_skipped_while_the_resolver_is_busy(self):
+        self.enricher.dns_timeout = 0.01
+        self.enricher.dns_workers = 1
+        skipped = self.enricher.dns_skipped.value
+        release = threading.Event()
+
+        def getnameinfo(address, flags):
+            release.wait(1)
+            raise socket.gaierror("no PTR record")
+
+        with patch("socket.getnameinfo", side_effect=getnameinfo):
+            # Times out, the lookup keeps its thread
+            self.assertIsNone(await self.enricher.reverse_dns("198.51.100.3"))
+            started = time.monotonic()
+            self.assertIsNone(await self.enricher.reverse_dns("198.51.100.4"))
+            self.assertLess(time.monotonic() - started, 0.01)
+            self.assertEqual(self.enricher.dns_skipped.value, skipped + 1)
+
+            release.set()
+            while self.enricher.dns_busy:
+                await asyncio.sleep(0.001)
+        # Not cached, so it is looked up next time
+        self.assertIs(self.enricher.hostnames.peek("198.51.100.4"), MISSING)
+
+    async def test_private_addresses_are_not_resolved(self):
+        incident = record("127.0.0.1")
+        with patch("socket.getnameinfo") as getnameinfo:
+            await self.enricher.enrich(incident)
+        getnameinfo.assert_not_called()
+        self.assertNotIn("enrichment", incident.metadata)
+
+
+if __name__ == "__main__":
+    unittest.main()
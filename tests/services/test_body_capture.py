@@ -0,0 +1,59 @@
+import base64
+import hashlib
+import unittest
+from unittest.mock import Mock
+from aiohttp import StreamReader
+from src.services.http.body_capture import CapturedBody, capture_body
+
+
+def make_stream(*chunks):
+    stream = StreamReader(Mock(_reading_paused=False), 2**16)
+    for chunk in chunks:
+        stream.feed_data(chunk)
+    stream.feed_eof()
+    return stream
+
+
+class TestBodyCapture(unittest.IsolatedAsyncioTestCase):
+    async def test_body_under_the_cap_is_kept(self):
+        body = await capture_body(make_stream(b"user=admin", b"&pass=admin"), 1024, 4096)
+
+        self.assertEqual(body.data, b"user=admin&pass=admin")
+        self.assertEqual(len(body), 21)
+        self.assertFalse(body.truncated)
+        self.assertEqual(body.to_metadata()["payload"], "user=admin&pass=admin")
+
+    async def test_only_the_head_is_kept_but_everything_is_hashed(self):
+        chunks = [b"a" * 1000, b"b" * 1000, b"c" * 1000]
+        body = await capture_body(make_stream(*chunks), 1500, 1 << 20)
+
+        self.assertEqual(body.data, b"a" * 1000 + b"b" * 500)
+        self.assertEqual(body.length, 3000)
+        self.assertTrue(body.truncated)
+        self.assertTrue(body.complete)
+        self.assertEqual(body.sha256, hashlib.sha256(b"".join(chunks)).hexdigest())
+
+    async def test_reading_stops_at_max_bytes(self):
+        body = await capture_body(make_stream(b"x" * 100, b"y" * 100), 10, 150)
+
+        self.assertEqual(body.length, 150)
+        self.assertFalse(body.complete)
+
+    async def test_empty_body(self):
+        self.assertIsNone(await capture_body(make_stream(), 1024, 4096))
+
+    def test_text_cut_by_the_cap_stays_text(self):
+        metadata = CapturedBody.from_bytes("héllo".encode("utf-8"), 2).to_metadata()
+
+        self.assertEqual(metadata["payload_encoding"], "utf-8")
+        self.assertEqual(metadata["payload"], "h")
+
+    def test_binary_body_is_base64_encoded(self):
+        metadata = CapturedBody.from_bytes(b"\x00\xff\xfe", 1024).to_metadata()
+
+        self.assertEqual(metadata["payload_encoding"], "base64")
+        self.assertEqual(base64.b64decode(metadata["payload"]), b"\x00\xff\xfe")
+
+
+if __name__ == "__main__":
+    unittest.main()
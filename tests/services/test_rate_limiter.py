@@ -0,0 +1,58 @@
+import unittest
+from src.services.http.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_burst_then_refill(self):
+        limiter = RateLimiter(rate=2, burst=3, max_tracked=10, clock=self.clock)
+        self.assertEqual([limiter.allow("10.0.0.1") for _ in range(4)], [True, True, True, False])
+        self.assertEqual(limiter.rejected, 1)
+
+        # A returning client is let through again once tokens refilled
+        self.clock.now = 1.0
+        self.assertEqual([limiter.allow("10.0.0.1") for _ in range(3)], [True, True, False])
+
+    def test_tracked_networks_are_capped(self):
+        limiter = RateLimiter(rate=1, burst=1, max_tracked=2, clock=self.clock)
+        limiter.allow("10.0.0.1")
+        limiter.allow("10.0.0.2")
+        limiter.allow("10.0.0.1")
+        limiter.allow("10.0.0.3")
+
+        self.assertEqual(limiter.tracked, 2)
+        # 10.0.0.2 was the least recently seen and got evicted
+        self.assertTrue(limiter.allow("10.0.0.2"))
+        self.assertFalse(limiter.allow("10.0.0.3"))
+
+    def test_prefix_aggregation(self):
+        limiter = RateLimiter(
+            rate=1, burst=2, max_tracked=10, ipv4_prefix=24, ipv6_prefix=64, clock=self.clock
+        )
+        self.assertTrue(limiter.allow("192.0.2.1"))
+        self.assertTrue(limiter.allow("192.0.2.200"))
+        self.assertFalse(limiter.allow("192.0.2.77"))
+        self.assertTrue(limiter.allow("192.0.3.1"))
+
+        self.assertTrue(limiter.allow("2001:db8::1"))
+        self.assertTrue(limiter.allow("2001:db8::ffff"))
+        self.assertFalse(limiter.allow("2001:db8::1234"))
+        self.assertTrue(limiter.allow("2001:db8:0:1::1"))
+
+    def test_invalid_prefix(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=1, burst=1, max_tracked=1, ipv4_prefix=33)
+
+
+if __name__ == "__main__":
+    unittest.main()
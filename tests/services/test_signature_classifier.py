@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from src.services.http.signature_classifier import SignatureClassifier, split_alternatives
+
+RULES = r"""
+# id  severity  fields  pattern
+traversal   high    url|body    \.\./
+passwd      high    url         /etc/passwd
+scanner     low     user_agent  sqlmap|nikto
+shellshock  critical headers    \(\)\s*\{
+"""
+
+
+class TestSignatureClassifier(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "http.rules")
+        with open(self.path, "w") as file:
+            file.write(RULES)
+        self.classifier = SignatureClassifier()
+        self.classifier.load(self.path)
+
+    def test_rules_match_their_fields(self):
+        self.assertEqual(self.classifier.classify("/", {"User-Agent": "Mozilla/5.0"}), ([], None))
+        self.assertEqual(
+            self.classifier.classify("/index.html", {"User-Agent": "sqlmap/1.7"}),
+            (["scanner"], "low"),
+        )
+        # The user agent is not matched against url rules
+        self.assertEqual(self.classifier.classify("/", {"User-Agent": "../"}), ([], None))
+        self.assertEqual(
+            self.classifier.classify("/", {"Referer": "() { :; }; echo"}, b"a=../x"),
+            (["traversal", "shellshock"], "critical"),
+        )
+
+    def test_overlapping_matches_are_all_found(self):
+        # /etc/passwd starts inside the traversal match
+        self.assertEqual(
+            self.classifier.classify("/cgi-bin/../../etc/passwd", {}),
+            (["traversal", "passwd"], "high"),
+        )
+
+    def test_matching_ignores_case(self):
+        self.assertEqual(self.classifier.classify("/ETC/PASSWD", {}), (["passwd"], "high"))
+
+    def test_only_the_start_of_the_body_is_matched(self):
+        classifier = SignatureClassifier(max_body_bytes=8)
+        classifier.load(self.path)
+        self.assertEqual(classifier.classify("/", {}, b"12345../"), (["traversal"], "high"))
+        self.assertEqual(classifier.classify("/", {}, b"123456../"), ([], None))
+
+    def test_branches_are_split_at_the_top_level(self):
+        self.assertEqual(
+            split_alternatives(r"a\|b|c[|)]d|(e|f)|[]|]x|z"),
+            [r"a\|b", "c[|)]d", "(e|f)", "[]|]x", "z"],
+        )
+        # Global flags apply to every branch
+        self.classifier.add("flags", "low", frozenset(["url"]), "(?a)a\\wb|c")
+        self.classifier.compile()
+        self.assertEqual(len(self.classifier.rules[-1][3]), 1)
+        self.assertEqual(self.classifier.classify("/c", {}), (["flags"], "low"))
+
+    def test_invalid_rules_are_skipped(self):
+        with open(self.path, "a") as file:
+            file.write("bad-severity urgent url x\nbad-field high cookie x\nbad-pattern high url (\n")
+        classifier = SignatureClassifier()
+        with self.assertLogs(level="ERROR") as logs:
+            classifier.load(self.path)
+        self.assertEqual(len(logs.output), 3)
+        self.assertEqual(len(classifier.rules), 4)
+
+    def test_shipped_signatures_load(self):
+        classifier = SignatureClassifier()
+        with self.assertNoLogs(level="ERROR"):
+            classifier.load("signatures/http.rules")
+        self.assertGreater(len(classifier.rules), 10)
+
+    def test_missing_file_classifies_nothing(self):
+        classifier = SignatureClassifier()
+        with self.assertLogs(level="WARNING"):
+            classifier.load(self.path + ".missing")
+        self.assertEqual(classifier.classify("/../etc/passwd", {}), ([], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
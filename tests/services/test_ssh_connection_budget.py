@@ -0,0 +1,33 @@
+import unittest
+from src.services.ssh.ssh_connection_budget import GLOBAL, PER_IP, ConnectionBudget
+
+
+class TestConnectionBudget(unittest.TestCase):
+    def test_per_ip_budget(self):
+        budget = ConnectionBudget(total=10, per_ip=2)
+        self.assertEqual([budget.acquire("10.0.0.1") for _ in range(3)], [True, True, False])
+        self.assertTrue(budget.acquire("10.0.0.2"))
+        self.assertEqual(budget.rejected, {PER_IP: 1, GLOBAL: 0})
+
+        budget.release("10.0.0.1")
+        self.assertTrue(budget.acquire("10.0.0.1"))
+
+    def test_global_budget(self):
+        budget = ConnectionBudget(total=2, per_ip=2)
+        self.assertTrue(budget.acquire("10.0.0.1"))
+        self.assertTrue(budget.acquire("10.0.0.2"))
+        self.assertFalse(budget.acquire("10.0.0.3"))
+        self.assertEqual(budget.rejected, {PER_IP: 0, GLOBAL: 1})
+
+    def test_release_forgets_idle_sources(self):
+        budget = ConnectionBudget(total=2, per_ip=2)
+        budget.acquire("10.0.0.1")
+        budget.release("10.0.0.1")
+        # Releasing more than was acquired is ignored
+        budget.release("10.0.0.1")
+        self.assertEqual(budget.connections, {})
+        self.assertEqual(budget.active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
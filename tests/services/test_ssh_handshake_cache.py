@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+import paramiko
+from src.services.ssh.ssh_handshake_cache import SSHHandshakeCache
+
+
+class TestSSHHandshakeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        paramiko.RSAKey.generate(1024).write_private_key_file(
+            os.path.join(self.tmp.name, "id_rsa")
+        )
+        paramiko.ECDSAKey.generate().write_private_key_file(
+            os.path.join(self.tmp.name, "id_ecdsa")
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_loads_every_available_host_key_once(self):
+        cache = SSHHandshakeCache(self.tmp.name, ["ed25519", "ecdsa", "rsa"])
+        self.assertEqual(
+            [key.get_name() for key in cache.host_keys],
+            ["ecdsa-sha2-nistp256", "ssh-rsa"],
+        )
+        self.assertIsNotNone(cache.hostname)
+
+        transport = Mock()
+        cache.setup_transport(transport)
+        cache.setup_transport(Mock())
+        self.assertEqual(transport.add_server_key.call_count, 2)
+
+    def test_invalid_key_types(self):
+        with self.assertRaises(ValueError):
+            SSHHandshakeCache(self.tmp.name, ["dsa"])
+
+        with self.assertRaises(ValueError):
+            SSHHandshakeCache(self.tmp.name, ["ed25519"])
+
+
+if __name__ == "__main__":
+    unittest.main()
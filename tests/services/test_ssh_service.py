@@ -1,6 +1,9 @@
 import asyncio
 import unittest
 from unittest.mock import patch
+from src.incidents.incident import Incident
+from src.incidents.incident_aggregator import AggregateBucket
+from src.services.ssh.ssh_server import SSHServer
 from src.services.ssh.ssh_service import SSHService
 
 
@@ -20,5 +23,29 @@ class TestSSHService(unittest.TestCase):
             mock_run.assert_called_once()
 
 
+class TestSSHServer(unittest.TestCase):
+    def test_create_aggregated_payload(self):
+        bucket = AggregateBucket("127.0.0.1", "BH-SSH", "2023-07-28T17:32:19.336395")
+        bucket.attempts = 3
+        bucket.last_seen = "2023-07-28T17:32:21.000000"
+        bucket.samples = {("root", "root"): 2, ("admin", "admin"): 1}
+        bucket.dropped_samples = 4
+
+        payload = SSHServer.create_aggregated_payload(bucket)
+        Incident(payload).validate()
+
+        self.assertEqual(payload.happened_at, "2023-07-28T17:32:19.336395")
+        self.assertEqual(payload.metadata["username"], "root")
+        self.assertEqual(payload.metadata["attempts"], 3)
+        self.assertEqual(payload.metadata["credentials_dropped"], 4)
+        self.assertEqual(
+            payload.metadata["credentials"],
+            [
+                {"username": "root", "password": "root", "count": 2},
+                {"username": "admin", "password": "admin", "count": 1},
+            ],
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import socket
+import unittest
+from src.services.ssh.ssh_tarpit import Tarpit, TarpitRelay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTarpit(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tarpit = Tarpit(threshold=3, delay=1, max_delay=5, window=60, clock=self.clock)
+
+    def record(self, ip_address, attempts):
+        for _ in range(attempts):
+            self.tarpit.record(ip_address)
+
+    def test_delay_grows_with_attempts(self):
+        self.record("10.0.0.1", 2)
+        self.assertEqual(self.tarpit.delay("10.0.0.1"), 0)
+        self.record("10.0.0.1", 1)
+        self.assertEqual(self.tarpit.delay("10.0.0.1"), 1)
+        self.record("10.0.0.1", 3)
+        self.assertEqual(self.tarpit.delay("10.0.0.1"), 2)
+        self.record("10.0.0.1", 30)
+        self.assertEqual(self.tarpit.delay("10.0.0.1"), 5)
+        self.assertEqual(self.tarpit.delay("10.0.0.2"), 0)
+
+    def test_quiet_sources_are_forgiven(self):
+        self.record("10.0.0.1", 3)
+        self.clock.now = 61
+        self.assertEqual(self.tarpit.delay("10.0.0.1"), 0)
+        # Counting starts over
+        self.record("10.0.0.1", 1)
+        self.assertEqual(self.tarpit.delay("10.0.0.1"), 0)
+
+    def test_tracked_sources_are_capped(self):
+        tarpit = Tarpit(threshold=1, delay=1, max_delay=1, window=60, max_tracked=2)
+        for ip_address in ("10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.3"):
+            tarpit.record(ip_address)
+        self.assertEqual(tarpit.tracked, 2)
+        self.assertEqual(tarpit.delay("10.0.0.2"), 0)
+        self.assertEqual(tarpit.delay("10.0.0.1"), 1)
+
+
+class TestTarpitRelay(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.loop = asyncio.get_running_loop()
+        self.attacker, accepted = socket.socketpair()
+        self.attacker.setblocking(False)
+        self.delay = 0.05
+        self.held = 0
+        self.relay = TarpitRelay(self.loop, lambda: self.delay, self.count_held)
+        self.paramiko = await self.relay.start(accepted)
+        self.paramiko.setblocking(False)
+
+    def count_held(self):
+        self.held += 1
+
+    async def asyncTearDown(self):
+        self.relay.close()
+        self.attacker.close()
+        self.paramiko.close()
+
+    async def read(self, sock, size):
+        data = b""
+        while len(data) < size:
+            chunk = await self.loop.sock_recv(sock, size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    async def test_responses_are_held_back_in_order(self):
+        started = self.loop.time()
+        await self.loop.sock_sendall(self.paramiko, b"SSH-2.0-")
+        await asyncio.sleep(0.01)
+        self.delay = 0
+        # Not overtaking the delayed chunk even without a delay of its own
+        await self.loop.sock_sendall(self.paramiko, b"OpenSSH\r\n")
+
+        self.assertEqual(await self.read(self.attacker, 17), b"SSH-2.0-OpenSSH\r\n")
+        self.assertGreaterEqual(self.loop.time() - started, 0.05)
+
+    async def test_client_data_is_not_delayed(self):
+        await self.loop.sock_sendall(self.attacker, b"SSH-2.0-libssh\r\n")
+        data = await asyncio.wait_for(self.read(self.paramiko, 16), 0.04)
+        self.assertEqual(data, b"SSH-2.0-libssh\r\n")
+
+    async def test_pending_data_is_sent_before_closing(self):
+        await self.loop.sock_sendall(self.paramiko, b"bye")
+        self.paramiko.close()
+        self.assertEqual(await self.read(self.attacker, 10), b"bye")
+
+    async def test_source_crossing_the_threshold_mid_session_is_slowed(self):
+        tarpit = Tarpit(threshold=2, delay=0.05, max_delay=1, window=60)
+        self.delay = 0
+        self.relay.delay = lambda: tarpit.delay("10.0.0.1")
+
+        started = self.loop.time()
+        await self.loop.sock_sendall(self.paramiko, b"first")
+        self.assertEqual(await self.read(self.attacker, 5), b"first")
+        self.assertLess(self.loop.time() - started, 0.05)
+        self.assertFalse(self.relay.held)
+
+        tarpit.record("10.0.0.1")
+        tarpit.record("10.0.0.1")
+        started = self.loop.time()
+        await self.loop.sock_sendall(self.paramiko, b"second")
+        self.assertEqual(await self.read(self.attacker, 6), b"second")
+        self.assertGreaterEqual(self.loop.time() - started, 0.05)
+        self.assertTrue(self.relay.held)
+        self.assertEqual(self.held, 1)
+
+    async def test_drain_delivers_held_responses_before_closing(self):
+        await self.loop.sock_sendall(self.paramiko, b"last message")
+        self.paramiko.close()
+        await self.relay.drain(1)
+        self.relay.close()
+        self.assertEqual(await self.read(self.attacker, 20), b"last message")
+
+    async def test_drain_is_bounded(self):
+        self.delay = 10
+        await self.loop.sock_sendall(self.paramiko, b"never")
+        self.paramiko.close()
+        started = self.loop.time()
+        await self.relay.drain(0.05)
+        self.relay.close()
+        self.assertLess(self.loop.time() - started, 1)
+        self.assertEqual(await asyncio.wait_for(self.read(self.attacker, 5), 1), b"")
+
+    async def test_client_disconnect_closes_paramiko_side(self):
+        self.attacker.close()
+        self.assertEqual(await asyncio.wait_for(self.read(self.paramiko, 1), 1), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
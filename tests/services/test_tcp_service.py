@@ -0,0 +1,198 @@
+import asyncio
+import base64
+import socket
+import unittest
+from unittest.mock import patch
+from src.incidents.incident_record import IncidentRecord
+from src.services.tcp.redis_protocol import RedisProtocol
+from src.services.tcp.scan_protocol import ScanProtocol
+from src.services.tcp.smtp_protocol import SMTPProtocol
+from src.services.tcp.tcp_service import CONFIG, TCPService, configured_listeners
+from src.services.tcp.telnet_protocol import TelnetProtocol, strip_telnet_commands
+
+
+class TestTCPService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.reports = []
+        patcher = patch.object(
+            TCPService,
+            "report",
+            lambda service, ip_address, incident_type, metadata: self.reports.append(
+                (incident_type, metadata)
+            ),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = TCPService([(TelnetProtocol, 0), (RedisProtocol, 0), (SMTPProtocol, 0)])
+        self.task = asyncio.create_task(self.service.run())
+        while len(self.service.servers) < 3:
+            await asyncio.sleep(0.01)
+
+    async def asyncTearDown(self):
+        self.task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await self.task
+
+    def port(self, index):
+        # Port 0 binds IPv4 and IPv6 to different ports
+        for sock in self.service.servers[index].sockets:
+            if sock.family == socket.AF_INET:
+                return sock.getsockname()[1]
+
+    async def connect(self, index):
+        return await asyncio.open_connection("127.0.0.1", self.port(index))
+
+    async def wait_for_reports(self, count):
+        for _ in range(100):
+            if len(self.reports) >= count:
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_telnet(self):
+        reader, writer = await self.connect(0)
+        self.assertIn(b"login: ", await reader.readuntil(b"login: "))
+        writer.write(b"\xff\xfd\x01root\r\n")
+        await reader.readuntil(b"Password: ")
+        writer.write(b"123456\r\n")
+        await reader.readuntil(b"login: ")
+        self.assertEqual(self.service.connections_active["telnet"].value, 1)
+        writer.close()
+
+        await self.wait_for_reports(1)
+        incident_type, metadata = self.reports[0]
+        self.assertEqual(incident_type, "BH-TELNET")
+        self.assertEqual(metadata["username"], "root")
+        self.assertEqual(metadata["password"], "123456")
+        self.assertEqual(metadata["port"], self.port(0))
+
+    async def test_redis(self):
+        reader, writer = await self.connect(1)
+        writer.write(b"*2\r\n$4\r\nAUTH\r\n$6\r\nsecret\r\nCONFIG GET dir\r\nQUIT\r\n")
+        self.assertTrue((await reader.readline()).startswith(b"-WRONGPASS"))
+        self.assertTrue((await reader.readline()).startswith(b"-NOAUTH"))
+        self.assertEqual(await reader.readline(), b"+OK\r\n")
+        self.assertEqual(await reader.read(), b"")
+
+        await self.wait_for_reports(1)
+        incident_type, metadata = self.reports[0]
+        self.assertEqual(incident_type, "BH-REDIS")
+        self.assertEqual(metadata["commands"], ["AUTH secret", "CONFIG GET dir", "QUIT"])
+        self.assertEqual(metadata["credentials"], [{"username": "default", "password": "secret"}])
+
+    async def test_smtp(self):
+        reader, writer = await self.connect(2)
+        self.assertTrue((await reader.readline()).startswith(b"220 "))
+        plain = base64.b64encode(b"\x00admin\x00hunter2")
+        writer.write(b"EHLO bot\r\nAUTH PLAIN " + plain + b"\r\nMAIL FROM:<a@b.c>\r\nQUIT\r\n")
+        response = await reader.read()
+        self.assertIn(b"535 5.7.8", response)
+        self.assertTrue(response.endswith(b"221 2.0.0 Bye\r\n"))
+
+        await self.wait_for_reports(1)
+        incident_type, metadata = self.reports[0]
+        self.assertEqual(incident_type, "BH-SMTP")
+        self.assertEqual(metadata["helo"], "bot")
+        self.assertEqual(metadata["mail_from"], "FROM:<a@b.c>")
+        self.assertEqual(metadata["credentials"], [{"username": "admin", "password": "hunter2"}])
+
+    async def test_connection_limit(self):
+        self.service.max_connections = 0
+        reader, writer = await self.connect(0)
+        self.assertEqual(await reader.read(), b"")
+        writer.close()
+        self.assertEqual(self.service.connections, set())
+
+    async def test_idle_connections_are_closed(self):
+        self.service.idle_timeout = 0
+        with patch("src.services.tcp.tcp_service.SWEEP_INTERVAL", 0.01):
+            # The sweep started with the service, restart it with the patched interval
+            sweep = asyncio.create_task(self.service.sweep())
+            reader, _ = await self.connect(1)
+            self.assertEqual(await asyncio.wait_for(reader.read(), 1), b"")
+            sweep.cancel()
+
+
+class TestScanSensor(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.reports = []
+        patcher = patch.object(
+            TCPService,
+            "report",
+            lambda service, ip_address, incident_type, metadata: self.reports.append(
+                (ip_address, incident_type, metadata)
+            ),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = TCPService([(ScanProtocol, 0), (ScanProtocol, 0)])
+        self.task = asyncio.create_task(self.service.run())
+        while len(self.service.servers) < 2:
+            await asyncio.sleep(0.01)
+        self.ports = [server.sockets[0].getsockname()[1] for server in self.service.servers]
+
+    async def asyncTearDown(self):
+        self.task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await self.task
+
+    async def test_connections_are_aggregated_per_source(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.ports[0])
+        writer.write(b"GET / HTTP/1.0\r\n\r\n" + b"x" * 1000)
+        # Closed by the sensor after the first bytes
+        self.assertEqual(await reader.read(), b"")
+        writer.close()
+        _, writer = await asyncio.open_connection("127.0.0.1", self.ports[1])
+        writer.close()
+        while self.service.connections or not self.service.aggregator.buckets:
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.reports, [])
+
+        self.service.aggregator.flush()
+        self.assertEqual(len(self.reports), 1)
+        ip_address, incident_type, metadata = self.reports[0]
+        self.assertEqual(ip_address, "127.0.0.1")
+        self.assertEqual(incident_type, "BH-SCAN")
+        self.assertEqual(metadata["ports"], sorted(self.ports))
+        self.assertEqual(metadata["connections"], 2)
+        self.assertEqual(metadata["rate"], 2)
+        self.assertEqual(len(metadata["payloads"]), 1)
+        self.assertEqual(metadata["payloads"][0]["port"], self.ports[0])
+        self.assertEqual(len(metadata["payloads"][0]["payload"]), CONFIG["SCAN_PAYLOAD_BYTES"])
+
+    def test_configured_listeners_skip_service_ports(self):
+        with patch.dict(
+            CONFIG,
+            {
+                "SCAN_ENABLED": True,
+                "SCAN_PORTS": [22, 23, 2323, 8080],
+                "SERVICE_TELNET_ENABLED": True,
+                "SERVICE_TELNET_PORT": 2323,
+                "SERVICE_HTTP_ENABLED": True,
+                "SERVICE_HTTP_PORT": 8080,
+                "SERVICE_SSH_ENABLED": False,
+            },
+        ):
+            listeners = configured_listeners()
+        self.assertIn((TelnetProtocol, 2323), listeners)
+        self.assertEqual(
+            [port for protocol, port in listeners if protocol is ScanProtocol], [22, 23]
+        )
+
+
+class TestTelnetCommands(unittest.TestCase):
+    def test_strip_telnet_commands(self):
+        self.assertEqual(strip_telnet_commands(b"\xff\xfb\x01root"), b"root")
+        self.assertEqual(strip_telnet_commands(b"\xff\xfa\x18\x00xterm\xff\xf0admin"), b"admin")
+        self.assertEqual(strip_telnet_commands(b"a\xff\xffb"), b"a\xffb")
+
+
+class TestIncidentTypes(unittest.TestCase):
+    def test_tcp_incident_types_are_valid(self):
+        for incident_type in ("BH-TELNET", "BH-REDIS", "BH-SMTP", "BH-TCP", "BH-SCAN"):
+            IncidentRecord("127.0.0.1", incident_type, "2023-07-28T17:32:19.336395", {})
+
+
+if __name__ == "__main__":
+    unittest.main()